@@ -0,0 +1 @@
+# Benchmarks — run from apps/rag, e.g. python -m bench.bench_save_chunks
@@ -0,0 +1,77 @@
+"""Throughput vs latency of the query embedding micro-batcher.
+
+Simulates concurrent /rag/query callers, each encoding one sentence at a
+time, with batching off and at several max-wait / max-batch settings. The
+embedding cache is bypassed so every request hits the model.
+
+Usage (from apps/rag):
+    python -m bench.bench_embedding_batcher --callers 16 --requests 400
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from rag.embedding_batcher import EmbeddingBatcher
+from rag.embeddings import _encode
+
+CONFIGS = [
+    # (max_wait_ms, max_batch); None = no batching
+    None,
+    (1, 8),
+    (2, 16),
+    (5, 32),
+    (10, 64),
+]
+
+
+def run(encode_one, callers: int, total: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    per_caller = total // callers
+
+    def worker(cid: int):
+        for i in range(per_caller):
+            start = time.perf_counter()
+            encode_one(f"caller {cid} asks question number {i} about the midsem timetable")
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in range(callers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    _encode(["warm up"])
+    print(f"{'config':>16} {'enc/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for config in CONFIGS:
+        if config is None:
+            label = "unbatched"
+            encode_one = lambda text: _encode([text])[0]
+        else:
+            wait_ms, max_batch = config
+            label = f"wait={wait_ms}ms n={max_batch}"
+            encode_one = EmbeddingBatcher(_encode, max_batch=max_batch, max_wait_ms=wait_ms).encode
+        r = run(encode_one, args.callers, args.requests)
+        print(f"{label:>16} {r['per_sec']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Parity, throughput and memory of the torch vs ONNX Runtime embedding engines.
+
+Each engine runs in a fresh process that loads the model, encodes the same
+texts and reports load time, texts/sec and peak RSS growth. Vectors are
+compared against the torch engine per text: the run fails (exit 1) if any
+ONNX vector's cosine agreement falls below the threshold, so it doubles as
+the parity check before switching EMBEDDING_ENGINE.
+
+Usage (from apps/rag, needs sentence-transformers and onnxruntime; downloads
+the model on first run):
+    python -m bench.bench_embedding_engines --texts 2000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+from rag.embedding_engines import MODEL_NAME
+
+ENGINES = [("torch", False), ("onnx", False), ("onnx", True)]
+
+TEMPLATES = [
+    "When is the {} exam for the {} course?",
+    "The {} lab is open from 9am to 5pm on weekdays, except during {}.",
+    "Students must submit the {} form to the department office before the {} deadline.",
+    "Room {} is booked for the {} seminar this Friday afternoon.",
+    "The thesis carries {} credits and is evaluated by a panel in {}.",
+]
+WORDS = ["midsem", "compiler", "networks", "ML", "project", "LT1", "graduation", "registration", "December", "summer"]
+
+
+def make_texts(n: int) -> list[str]:
+    rng = np.random.default_rng(0)
+    texts = []
+    for i in range(n):
+        template = TEMPLATES[i % len(TEMPLATES)]
+        sentence = template.format(*rng.choice(WORDS, size=2))
+        # Mix of query-length and chunk-length inputs
+        texts.append(" ".join([sentence] * int(rng.integers(1, 8))))
+    return texts
+
+
+def current_rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def run_engine(engine: str, quantize: bool, texts: list[str], results):
+    from rag.embedding_engines import load_engine
+
+    baseline = current_rss_kb()
+    start = time.perf_counter()
+    model = load_engine(engine, MODEL_NAME, quantize)
+    load_seconds = time.perf_counter() - start
+
+    model.encode(texts[:32])  # Warm-up
+    start = time.perf_counter()
+    vectors = np.asarray(model.encode(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    peak_mb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline, 0) / 1024
+    results.put((model.name, load_seconds, len(texts) / elapsed, peak_mb, vectors))
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--min-cosine", type=float, default=0.999, help="Threshold for onnx fp32")
+    parser.add_argument("--min-cosine-int8", type=float, default=0.98, help="Threshold for onnx int8")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for engine, quantize in ENGINES:
+        results = ctx.Queue()
+        proc = ctx.Process(target=run_engine, args=(engine, quantize, texts, results))
+        proc.start()
+        runs.append((quantize, *results.get()))
+        proc.join()
+
+    reference = runs[0][-1]
+    failed = False
+    print(f"{'engine':<52} {'load s':>7} {'texts/s':>8} {'peak MB':>8} {'min cos':>8} {'mean cos':>9}")
+    for quantize, name, load_seconds, rate, peak_mb, vectors in runs:
+        agreement = cosine(reference, vectors)
+        print(f"{name:<52} {load_seconds:>7.2f} {rate:>8.1f} {peak_mb:>8.1f} "
+              f"{agreement.min():>8.4f} {agreement.mean():>9.5f}")
+        threshold = args.min_cosine_int8 if quantize else args.min_cosine
+        if agreement.min() < threshold:
+            print(f"  parity FAILED: min cosine {agreement.min():.4f} < {threshold}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Booking intent router: accuracy on a labelled corpus, and throughput.
+
+Accuracy: intent precision/recall for the old keyword-substring check and for
+the compiled matcher, per-slot accuracy of extract_booking, and how many
+booking messages skip the LLM (all slots found, a plain request, not in the
+past) — with how many of those skips had every slot right.
+
+Throughput: messages/sec for the old check, the compiled intent check, and
+full slot extraction, plus the cost of building the room list text per
+message (the old prompt path) vs reading it off the cached catalogue.
+
+Corpus is JSONL, one message per line, labelled against the seed rooms and a
+fixed "today" (--today):
+    {"message": "Book LT1 tomorrow 2pm to 4pm for a quiz", "booking": true,
+     "slots": {"room_name": "LT1", "date": "2026-10-19", "start_time": "14:00",
+               "end_time": "16:00", "reason": "a quiz"}}
+Slots the message does not give are null; non-booking messages have no slots.
+Booking messages that must not skip the LLM even with every slot present
+(cancellations, negations, past dates, alternatives, recurring or several
+bookings) carry "direct": false.
+
+Usage (from apps/rag, no database needed):
+    python -m bench.bench_intent_router
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, time as clock
+from pathlib import Path
+
+from rag.intent import REQUIRED_SLOTS, direct_booking, extract_booking, is_booking_intent, missing_slots
+from rag.rooms import RoomCatalogue
+
+# Same rooms as packages/db/seed.ts
+SEED_ROOMS = [
+    {"id": "r1", "name": "LT1", "location": "C side", "capacity": 150},
+    {"id": "r2", "name": "A604", "location": "A side", "capacity": 60},
+    {"id": "r3", "name": "C401", "location": "C side", "capacity": 60},
+    {"id": "r4", "name": "Reading Room", "location": "CC lab", "capacity": 75},
+    {"id": "r5", "name": "LT2", "location": "C side", "capacity": 150},
+]
+
+# The check this replaced (rag/query.py before the compiled matcher)
+LEGACY_KEYWORDS = [
+    "book", "reserve", "booking", "reservation",
+    "schedule", "i want to book", "can i book",
+    "book lab", "book room", "book seminar"
+]
+
+
+def legacy_intent(message: str) -> bool:
+    msg = message.lower()
+    return any(keyword in msg for keyword in LEGACY_KEYWORDS)
+
+
+def legacy_rooms_text(rooms: list[dict]) -> str:
+    return "\n".join([
+        f"- {r['name']} (ID: {r['id']}, Location: {r['location']}, Capacity: {r['capacity']})"
+        for r in rooms
+    ])
+
+
+def same(expected, got) -> bool:
+    if expected is None or got is None:
+        return expected is got
+    return " ".join(str(expected).split()).lower() == " ".join(str(got).split()).lower()
+
+
+def intent_scores(cases: list[dict], check) -> dict:
+    tp = sum(1 for c in cases if c["booking"] and check(c["message"]))
+    fp = sum(1 for c in cases if not c["booking"] and check(c["message"]))
+    fn = sum(1 for c in cases if c["booking"] and not check(c["message"]))
+    return {
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "false_positives": [c["message"] for c in cases if not c["booking"] and check(c["message"])],
+        "false_negatives": [c["message"] for c in cases if c["booking"] and not check(c["message"])],
+    }
+
+
+def per_sec(fn, messages: list[str], seconds: float) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for m in messages:
+            fn(m)
+        count += len(messages)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=str(Path(__file__).parent / "data" / "booking_intents.jsonl"))
+    parser.add_argument("--today", default="2026-10-18", help="Date the corpus labels were written against")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time per throughput measurement")
+    parser.add_argument("--verbose", action="store_true", help="Print every slot mismatch")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    today = date.fromisoformat(args.today)
+    now = datetime.combine(today, clock.min)
+    catalogue = RoomCatalogue(SEED_ROOMS, version=1)
+    bookings = [c for c in cases if c["booking"]]
+    print(f"{len(cases)} messages ({len(bookings)} booking), today={today}\n")
+
+    print("Intent             precision  recall")
+    for name, check in (("keywords (old)", legacy_intent), ("compiled", is_booking_intent)):
+        s = intent_scores(cases, check)
+        print(f"  {name:<16} {s['precision']:>9.3f} {s['recall']:>7.3f}")
+        for m in s["false_positives"]:
+            print(f"      false positive: {m}")
+        for m in s["false_negatives"]:
+            print(f"      missed:         {m}")
+
+    correct = dict.fromkeys(REQUIRED_SLOTS, 0)
+    skipped = skipped_right = should_skip = wrong_skips = 0
+    for c in bookings:
+        got = extract_booking(c["message"], catalogue, today)
+        expected = c["slots"]
+        for slot in REQUIRED_SLOTS:
+            if same(expected[slot], got[slot]):
+                correct[slot] += 1
+            elif args.verbose:
+                print(f"  {slot}: expected {expected[slot]!r}, got {got[slot]!r} — {c['message']}")
+        direct = c.get("direct", not missing_slots(expected))
+        should_skip += direct
+        if direct_booking(c["message"], catalogue, now) is not None:
+            skipped += 1
+            skipped_right += direct and all(same(expected[s], got[s]) for s in REQUIRED_SLOTS)
+            if not direct:
+                wrong_skips += 1
+                print(f"  skipped but should not: {c['message']}")
+
+    print("\nSlot accuracy (booking messages)")
+    for slot in REQUIRED_SLOTS:
+        print(f"  {slot:<12} {correct[slot] / len(bookings):.3f}")
+    print(f"\nLLM skipped for {skipped}/{len(bookings)} booking messages "
+          f"({should_skip} should); {skipped_right}/{skipped} skips fully correct, {wrong_skips} should have asked")
+
+    messages = [c["message"] for c in cases]
+    print("\nThroughput (messages/sec)")
+    print(f"  intent, keywords (old)     {per_sec(legacy_intent, messages, args.seconds):>12,.0f}")
+    print(f"  intent, compiled           {per_sec(is_booking_intent, messages, args.seconds):>12,.0f}")
+    print(f"  slot extraction            {per_sec(lambda m: extract_booking(m, catalogue, today), messages, args.seconds):>12,.0f}")
+    print(f"  room list, built per call  {per_sec(lambda m: legacy_rooms_text(SEED_ROOMS), messages, args.seconds):>12,.0f}")
+    print(f"  room list, cached          {per_sec(lambda m: catalogue.text, messages, args.seconds):>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""LLM gateway vs the plain SDK client, against the fake server.
+
+Starts bench/fake_llm_server.py in-process and runs each scenario with:
+  sdk       AsyncGroq with its defaults, called directly (the old path)
+  gateway   rag.llm_gateway with deadline, retries, breaker and fallback
+  hedged    the same, with hedging after the p95 delay
+
+Scenarios (primary = first model, fallback = second):
+  healthy         every request ~200 ms
+  rate_limited    30% of primary requests get 429 with Retry-After 0.2
+  slow_tail       3% of requests take 4 s
+  primary_down    the primary answers 503 to everything
+  primary_hanging the primary takes 30 s to answer
+
+Reports success rate, p50/p95/p99/max latency and the gateway counters.
+Requests still running after --cap seconds count as failures.
+
+Usage (from apps/rag, no Groq key or database needed):
+    python -m bench.bench_llm_gateway --requests 100 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+
+from bench.fake_llm_server import configure, free_port, start_fake_server
+from rag.llm_gateway import LLMGateway
+
+PRIMARY = "llama-3.3-70b-versatile"
+FALLBACK = "llama-3.1-8b-instant"
+MESSAGES = [{"role": "user", "content": "What is the attendance policy?"}]
+
+SCENARIOS = {
+    "healthy": {},
+    "rate_limited": {PRIMARY: {"rate_limit_rate": 0.3, "retry_after": 0.2}},
+    "slow_tail": {"default": {"tail_rate": 0.03, "tail_ms": 4000}},
+    "primary_down": {PRIMARY: {"down": True}},
+    "primary_hanging": {PRIMARY: {"latency_ms": 30000}},
+}
+
+
+def make_gateway(hedge: bool) -> LLMGateway:
+    return LLMGateway(
+        models=[PRIMARY, FALLBACK],
+        deadline=10,
+        attempt_timeout=2,
+        max_retries=2,
+        backoff_base=0.1,
+        backoff_max=1,
+        hedge=hedge,
+        hedge_min_delay=0.1,
+        breaker_failures=5,
+        breaker_reset=30,
+    )
+
+
+async def run(call, requests: int, concurrency: int, cap: float) -> tuple[list[float], int]:
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(call(), cap)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, failures
+
+
+def pct(values: list[float], q: float) -> float:
+    return sorted(values)[int(q * (len(values) - 1))] * 1000 if values else float("nan")
+
+
+async def main_async(args):
+    from groq import AsyncGroq
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_fake_server(port)
+    sdk = AsyncGroq(api_key="fake", base_url=base_url)  # SDK defaults: 2 retries, 60 s timeout
+    bare = AsyncGroq(api_key="fake", base_url=base_url, max_retries=0)
+
+    print(f"{args.requests} requests per run, concurrency {args.concurrency}, cap {args.cap:.0f} s\n")
+    print(f"{'scenario':<16} {'variant':<8} {'ok':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+          f" {'att/req':>8} {'fallbk':>7} {'hedges':>7}")
+    for name, scenario in SCENARIOS.items():
+        if args.scenario and name not in args.scenario:
+            continue
+        for variant in ("sdk", "gateway", "hedged"):
+            configure(base_url, {})
+            gateway = make_gateway(hedge=variant == "hedged")
+            if variant == "sdk":
+                call = lambda: sdk.chat.completions.create(model=PRIMARY, messages=MESSAGES)
+            else:
+                call = lambda: gateway.acomplete(bare.chat.completions.create, messages=MESSAGES)
+                # Healthy warm-up fills the p95 window the hedging delay is based on
+                await run(call, 40, args.concurrency, args.cap)
+                gateway.counters = dict.fromkeys(gateway.counters, 0)
+            configure(base_url, scenario)
+            latencies, failures = await run(call, args.requests, args.concurrency, args.cap)
+            ok = len(latencies) / args.requests
+            c = gateway.counters
+            per_req = f"{c['attempts'] / c['calls']:.2f}" if variant != "sdk" and c["calls"] else "-"
+            print(
+                f"{name:<16} {variant:<8} {ok:>6.0%} {pct(latencies, .5):>8.0f} {pct(latencies, .95):>8.0f}"
+                f" {pct(latencies, .99):>8.0f} {max(latencies, default=0) * 1000:>8.0f} {per_req:>8}"
+                f" {c['fallbacks'] if variant != 'sdk' else '-':>7} {c['hedges'] if variant != 'sdk' else '-':>7}"
+            )
+    server.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--cap", type=float, default=12, help="Seconds before a request counts as failed")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Run only these (repeatable)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
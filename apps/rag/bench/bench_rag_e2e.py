@@ -0,0 +1,356 @@
+"""End-to-end RAG benchmark on a synthetic corpus, with results as JSON.
+
+1. Generates a synthetic department corpus (bench/synthetic_corpus.py:
+   PDF handouts, DOCX policies, TXT notices, with labelled questions).
+2. Ingests every file through rag.ingest.ingest_file into the configured
+   database, under document ids starting with "bench-" (removed before and
+   after the run unless --keep).
+3. Replays the questions through query_rag, with the LLM served by
+   bench/fake_llm_server.py in-process (fixed --llm-latency-ms, no Groq key).
+4. Measures recall@k: a question is a hit at k when one of the first k
+   retrieved chunks comes from its document and contains the answer.
+
+Reports ingest throughput and per-stage time, query p50/p95/p99 and mean
+time per stage (from rag.metrics), recall@k and MRR, and RSS / peak RSS.
+Everything is written to --out as JSON; --baseline compares against an
+earlier result file and exits 1 when a metric regresses past the tolerances.
+
+Vectors are always written to Postgres; --backend memory serves searches
+from the in-process index (VECTOR_BACKEND=memory) instead of pgvector.
+The answer cache is off and the embedding cache lives in a temp dir, so
+every run starts cold and repeated runs are comparable.
+
+Usage (from apps/rag, needs DATABASE_URL with pgvector and migrations applied):
+    python -m bench.bench_rag_e2e --docs 60 --out bench/results/e2e.json
+    python -m bench.bench_rag_e2e --docs 60 --baseline bench/results/e2e.json --out /tmp/e2e-new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from bench.fake_llm_server import configure, free_port, start_fake_server
+from bench.synthetic_corpus import CorpusGenerator, write_corpus
+
+KS = (1, 3, 5, 10)
+QUERY_STAGES = ("embed", "answer_cache", "retrieve", "rerank", "context", "llm", "total")
+INGEST_STAGES = ("parse", "chunk", "diff", "embed", "save")
+
+# (path in the result JSON, True when higher is better)
+TRACKED = [
+    ("ingest.chunks_per_sec", True),
+    ("query.p50_ms", False),
+    ("query.p95_ms", False),
+    ("query.p99_ms", False),
+    *((f"recall.at_{k}", True) for k in KS),
+    ("recall.mrr", True),
+    ("memory.peak_rss_mb", False),
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else float("nan")
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def configure_env(args, tmp: str, llm_base_url: str):
+    # Settings are read once at import, so this runs before any rag module is loaded
+    os.environ["VECTOR_BACKEND"] = args.backend
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "embedding_cache.sqlite3")
+    os.environ["LLM_BASE_URL"] = llm_base_url
+    os.environ["LLM_FALLBACK_MODELS"] = ""
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+
+
+def stage_means(histogram: str, stages: tuple[str, ...], before: dict) -> dict:
+    from prometheus_client import REGISTRY
+
+    out = {}
+    for stage in stages:
+        total = REGISTRY.get_sample_value(f"{histogram}_sum", {"stage": stage}) or 0.0
+        count = REGISTRY.get_sample_value(f"{histogram}_count", {"stage": stage}) or 0.0
+        total -= before.get(stage, (0.0, 0.0))[0]
+        count -= before.get(stage, (0.0, 0.0))[1]
+        if count:
+            out[stage] = {"count": int(count), "total_s": round(total, 4), "mean_ms": round(total / count * 1000, 3)}
+    return out
+
+
+def stage_snapshot(histogram: str, stages: tuple[str, ...]) -> dict:
+    from prometheus_client import REGISTRY
+
+    return {
+        s: (REGISTRY.get_sample_value(f"{histogram}_sum", {"stage": s}) or 0.0,
+            REGISTRY.get_sample_value(f"{histogram}_count", {"stage": s}) or 0.0)
+        for s in stages
+    }
+
+
+def cleanup(prefix: str) -> int:
+    from db.session import get_connection, release_connection
+    from rag.vector_store import delete_documents
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT document_id FROM rag.documents WHERE document_id LIKE %s", (prefix + "-%",))
+        ids = [r[0] for r in cur.fetchall()]
+        cur.close()
+    finally:
+        release_connection(conn)
+    return delete_documents(ids) if ids else 0
+
+
+def run_ingest(docs, paths) -> dict:
+    from rag.ingest import ingest_file
+
+    before = stage_snapshot("rag_ingest_stage_seconds", INGEST_STAGES)
+    by_type: dict[str, dict] = {}
+    total_bytes = chunks = 0
+    start = time.perf_counter()
+    for doc, path in zip(docs, paths):
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        t = time.perf_counter()
+        result = ingest_file(
+            file_bytes, doc.mime_type, doc.document_id,
+            metadata={"source_filename": doc.filename, "tags": ["bench", doc.kind]},
+        )
+        entry = by_type.setdefault(doc.ext, {"documents": 0, "chunks": 0, "seconds": 0.0})
+        entry["documents"] += 1
+        entry["chunks"] += result["chunks"]
+        entry["seconds"] += time.perf_counter() - t
+        total_bytes += len(file_bytes)
+        chunks += result["chunks"]
+    elapsed = time.perf_counter() - start
+    for entry in by_type.values():
+        entry["seconds"] = round(entry["seconds"], 3)
+    return {
+        "documents": len(docs),
+        "chunks": chunks,
+        "megabytes": round(total_bytes / 2**20, 3),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(len(docs) / elapsed, 3),
+        "chunks_per_sec": round(chunks / elapsed, 3),
+        "mb_per_sec": round(total_bytes / 2**20 / elapsed, 3),
+        "by_type": by_type,
+        "stages": stage_means("rag_ingest_stage_seconds", INGEST_STAGES, before),
+    }
+
+
+def is_hit(chunk: dict, case: dict) -> bool:
+    text = chunk["chunk_text"].lower()
+    return chunk["document_id"] in case["document_ids"] and any(s.lower() in text for s in case["snippets"])
+
+
+def run_recall(questions: list[dict]) -> dict:
+    from rag.embeddings import embed_query
+    from rag.query import candidate_count
+    from rag.rerank import reranker
+    from rag.retrieval import retrieve
+
+    # The same candidates and reranking query_rag uses, cut at each k
+    depth = max(KS)
+    hits = {k: 0 for k in KS}
+    reciprocal_ranks = []
+    for case in questions:
+        results = retrieve(case["question"], embed_query(case["question"]), top_k=max(depth, candidate_count()))
+        if reranker is not None:
+            results = reranker.rerank(case["question"], results, depth)
+        rank = next((i + 1 for i, r in enumerate(results[:depth]) if is_hit(r, case)), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in KS:
+            hits[k] += rank is not None and rank <= k
+    n = len(questions)
+    return {
+        "questions": n,
+        **{f"at_{k}": round(hits[k] / n, 4) for k in KS},
+        "mrr": round(sum(reciprocal_ranks) / n, 4),
+    }
+
+
+def run_queries(questions: list[dict], warmup: int) -> dict:
+    from rag.query import query_rag
+
+    for case in questions[:warmup]:
+        query_rag(case["question"])
+
+    before = stage_snapshot("rag_query_stage_seconds", QUERY_STAGES)
+    latencies, cited = [], 0
+    for case in questions:
+        start = time.perf_counter()
+        response = query_rag(case["question"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        cited += any(c["document_id"] in case["document_ids"] for c in response.get("citations", []))
+    n = len(latencies)
+    return {
+        "queries": n,
+        "warmup": warmup,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / n, 3),
+        "max_ms": round(max(latencies), 3),
+        "qps": round(n / (sum(latencies) / 1000), 3),
+        "answer_document_cited": round(cited / n, 4),
+        "stages": stage_means("rag_query_stage_seconds", QUERY_STAGES, before),
+    }
+
+
+def lookup(result: dict, path: str):
+    for key in path.split("."):
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float, recall_tolerance: float) -> list[str]:
+    # Numbers are only comparable for the same corpus and load
+    for key in ("docs", "pages", "seed", "queries", "backend", "llm_latency_ms"):
+        old, new = baseline["run"]["args"].get(key), result["run"]["args"][key]
+        if old != new:
+            print(f"warning: baseline ran with --{key.replace('_', '-')} {old}, this run with {new}")
+    regressions = []
+    print(f"\n{'metric':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for path, higher_is_better in TRACKED:
+        old, new = lookup(baseline, path), lookup(result, path)
+        if old is None or new is None:
+            continue
+        if path.startswith("recall."):
+            worse = (old - new if higher_is_better else new - old) > recall_tolerance
+            change = f"{new - old:+.3f}"
+        else:
+            delta = (new - old) / old if old else 0.0
+            worse = (-delta if higher_is_better else delta) > tolerance
+            change = f"{delta:+.1%}"
+        print(f"{path:<24} {old:>10.3f} {new:>10.3f} {change:>8}{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(path)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=4, help="Pages per document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=0, help="Replay at most this many questions (0 = all)")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed queries before measuring")
+    parser.add_argument("--backend", choices=["pgvector", "memory"], default="pgvector")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Fake LLM response time")
+    parser.add_argument("--out", default=None, help="Result JSON (default bench/results/e2e-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown / throughput drop")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02, help="Allowed absolute recall / MRR drop")
+    parser.add_argument("--keep", action="store_true", help="Leave the bench documents in the database")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    out = args.out or os.path.join("bench", "results", f"e2e-{started:%Y%m%d-%H%M%S}.json")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        configure_env(args, tmp, base_url)
+        server = start_fake_server(port)
+        configure(base_url, {"default": {"latency_ms": args.llm_latency_ms, "jitter_ms": 0}})
+
+        from core.config import settings
+        from rag.embeddings import generate_embeddings
+        from rag.vector_backends import get_backend
+
+        rss_start = rss_mb()
+        generate_embeddings(["warm-up"])  # Model load is not part of ingest throughput
+        rss_model = rss_mb()
+
+        docs = CorpusGenerator(seed=args.seed, pages_per_doc=args.pages).generate(args.docs)
+        paths = write_corpus(docs, os.path.join(tmp, "corpus"))
+        questions = [q for d in docs for q in d.questions]
+        if args.queries:
+            questions = questions[:args.queries]
+
+        removed = cleanup("bench")
+        if removed:
+            print(f"removed {removed} chunks left by an earlier run")
+        get_backend().load()
+
+        print(f"ingesting {len(docs)} documents ({args.backend} backend)...")
+        ingest = run_ingest(docs, paths)
+        rss_ingest = rss_mb()
+        print(f"measuring recall over {len(questions)} questions...")
+        recall = run_recall(questions)
+        print(f"replaying {len(questions)} queries...")
+        query = run_queries(questions, min(args.warmup, len(questions)))
+        rss_query = rss_mb()
+
+        if not args.keep:
+            cleanup("bench")
+        server.should_exit = True
+
+    result = {
+        "run": {
+            "started_at": started.isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "args": vars(args),
+            "settings": {
+                key: getattr(settings, key)
+                for key in ("vector_backend", "retrieval_mode", "embedding_engine", "embedding_onnx_quantize",
+                            "rerank_enabled", "context_token_budget", "ingest_embed_batch_size")
+            },
+        },
+        "ingest": ingest,
+        "query": query,
+        "recall": recall,
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_after_model_mb": round(rss_model, 1),
+            "rss_after_ingest_mb": round(rss_ingest, 1),
+            "rss_after_queries_mb": round(rss_query, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        },
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(
+        f"\ningest  {ingest['documents']} docs, {ingest['chunks']} chunks in {ingest['seconds']:.2f} s "
+        f"({ingest['chunks_per_sec']:.1f} chunks/s, {ingest['mb_per_sec']:.2f} MB/s)"
+    )
+    print(f"query   p50 {query['p50_ms']:.1f} ms  p95 {query['p95_ms']:.1f} ms  p99 {query['p99_ms']:.1f} ms")
+    print("recall  " + "  ".join(f"@{k} {recall[f'at_{k}']:.3f}" for k in KS) + f"  mrr {recall['mrr']:.3f}")
+    print(f"memory  peak {result['memory']['peak_rss_mb']:.0f} MB")
+    print(f"wrote {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.recall_tolerance)
+        if regressions:
+            raise SystemExit(f"regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare the per-row INSERT loop against the batched save_chunks path.
+
+Usage (from apps/rag, needs DATABASE_URL with the rag schema):
+    python -m bench.bench_save_chunks --sizes 100 1000 10000
+"""
+import argparse
+import random
+import time
+import uuid
+
+from db.session import get_connection, release_connection
+from rag.vector_store import save_chunks
+
+DIM = 384
+
+
+def legacy_save_chunks(document_id: str, chunks: list[str], embeddings: list[list[float]]):
+    # The original write path: one INSERT and one string-built vector per chunk
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM rag.embeddings WHERE document_id = %s", (document_id,))
+        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+            embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
+            cur.execute(
+                """
+                INSERT INTO rag.embeddings (document_id, chunk_index, chunk_text, embedding)
+                VALUES (%s, %s, %s, %s::vector)
+                """,
+                (document_id, idx, chunk, embedding_str)
+            )
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
+def cleanup(document_id: str):
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM rag.embeddings WHERE document_id = %s", (document_id,))
+        conn.commit()
+        cur.close()
+    finally:
+        release_connection(conn)
+
+
+def make_rows(n: int) -> tuple[list[str], list[list[float]]]:
+    chunks = [f"benchmark chunk {i} " + "lorem ipsum " * 40 for i in range(n)]
+    embeddings = [[random.uniform(-1, 1) for _ in range(DIM)] for _ in range(n)]
+    return chunks, embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'loop rows/s':>12} {'bulk rows/s':>12} {'speedup':>8}")
+    for n in args.sizes:
+        chunks, embeddings = make_rows(n)
+        document_id = f"bench-{uuid.uuid4()}"
+        try:
+            start = time.perf_counter()
+            legacy_save_chunks(document_id, chunks, embeddings)
+            loop_rate = n / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            save_chunks(document_id, chunks, embeddings)
+            bulk_rate = n / (time.perf_counter() - start)
+        finally:
+            cleanup(document_id)
+        print(f"{n:>8} {loop_rate:>12.1f} {bulk_rate:>12.1f} {bulk_rate / loop_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Peak memory and time of whole-file vs streaming PDF parse + chunk.
+
+Generates PDFs of increasing page count and runs each mode in a fresh
+process, reporting the growth in peak RSS over the process's idle baseline:
+
+- whole: read the upload into memory, concatenate every page into one
+  string, split it at once (the previous ingest path)
+- streaming: open the file by path, chunk pages as they are read and spool
+  chunks to disk (what ingest jobs do now)
+
+Streaming peak memory should stay flat as pages grow; whole-file grows with
+the document.
+
+Usage (from apps/rag, no database or model needed):
+    python -m bench.bench_streaming_ingest --pages 100 1000 3000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import fitz
+
+from rag.chunker import get_chunks
+from rag.extract import spool_chunks
+
+LINES_PER_PAGE = 45
+
+
+def make_pdf(path: str, pages: int):
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        text = "\n".join(
+            f"Page {n + 1} line {i}: course handout text about labs, exams, credits and rooms."
+            for i in range(LINES_PER_PAGE)
+        )
+        page.insert_text((40, 40), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def current_rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def run_whole(path: str) -> int:
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    text = ""
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        for page in doc:
+            text += page.get_text()
+    return len(get_chunks(text.strip()))
+
+
+def run_streaming(path: str) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        return spool_chunks(path, "application/pdf", os.path.join(tmp, "chunks.jsonl"))
+
+
+def measure(mode: str, path: str, results):
+    baseline = current_rss_kb()
+    start = time.perf_counter()
+    chunks = (run_whole if mode == "whole" else run_streaming)(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((chunks, elapsed, max(peak - baseline, 0) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000, 3000])
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'pages':>6} {'mode':<10} {'chunks':>7} {'seconds':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"{pages}.pdf")
+            make_pdf(path, pages)
+            for mode in ("whole", "streaming"):
+                results = ctx.Queue()
+                proc = ctx.Process(target=measure, args=(mode, path, results))
+                proc.start()
+                chunks, elapsed, peak_mb = results.get()
+                proc.join()
+                print(f"{pages:>6} {mode:<10} {chunks:>7} {elapsed:>8.2f} {peak_mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
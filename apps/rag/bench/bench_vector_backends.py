@@ -0,0 +1,63 @@
+"""recall@k and p50/p99 search latency for the pgvector and memory backends.
+
+Ground truth is an exact cosine scan over every row in rag.embeddings. Query
+vectors are stored chunk embeddings with a little noise added, so each query
+has close neighbours like a real question would.
+
+Usage (from apps/rag, needs DATABASE_URL with an ingested corpus):
+    python -m bench.bench_vector_backends --queries 200 --k 5
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from rag.vector_backends import MemoryBackend, PgVectorBackend
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    memory = MemoryBackend()
+    memory.load()
+    texts, matrix = memory._index["texts"], memory._index["matrix"]
+    if not texts:
+        raise SystemExit("rag.embeddings is empty — ingest some documents first")
+
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(texts), size=min(args.queries, len(texts)), replace=False)
+    queries = [matrix[i] + rng.normal(0, args.noise, matrix.shape[1]).astype(np.float32) for i in picks]
+
+    # Exact top-k by chunk text (texts identify rows across both backends)
+    truth = []
+    for q in queries:
+        scores = matrix @ (q / np.linalg.norm(q))
+        truth.append({texts[i] for i in np.argsort(-scores)[:args.k]})
+
+    print(f"rows={len(texts)} queries={len(queries)} k={args.k}")
+    print(f"{'backend':>10} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for backend in (PgVectorBackend(), memory):
+        latencies, recalls = [], []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results = backend.search(q.tolist(), args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len({r["chunk_text"] for r in results} & expected) / len(expected))
+        print(
+            f"{backend.name:>10} {statistics.mean(recalls):>9.3f} "
+            f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
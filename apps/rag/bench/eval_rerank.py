@@ -0,0 +1,88 @@
+"""Answer-context precision with and without cross-encoder reranking.
+
+For each labelled question, builds the context the prompt would get two ways:
+the first-stage top CONTEXT_TOP_K (cosine / hybrid), and the cross-encoder's
+top CONTEXT_TOP_K out of RERANK_CANDIDATES over-fetched chunks. A context
+chunk counts as relevant when its document_id is listed or its text contains
+one of the expected snippets (case-insensitive).
+
+Dataset is JSONL, one question per line:
+    {"question": "When is the midsem exam?", "snippets": ["mid-semester"], "document_ids": []}
+
+Usage (from apps/rag, needs DATABASE_URL with an ingested corpus):
+    python -m bench.eval_rerank --dataset eval/questions.jsonl
+"""
+import argparse
+import json
+import statistics
+import time
+
+from core.config import settings
+from rag.embeddings import embed_query
+from rag.query import CONTEXT_TOP_K, is_relevant
+from rag.rerank import Reranker
+from rag.retrieval import retrieve
+
+
+def is_hit(chunk: dict, case: dict) -> bool:
+    if chunk["document_id"] in case.get("document_ids", []):
+        return True
+    text = chunk["chunk_text"].lower()
+    return any(s.lower() in text for s in case.get("snippets", []))
+
+
+def score_context(context: list[dict], case: dict) -> dict:
+    hits = sum(is_hit(c, case) for c in context)
+    return {
+        "precision": hits / len(context) if context else 0.0,
+        "hit": hits > 0,
+        "size": len(context),
+    }
+
+
+def summarize(name: str, rows: list[dict], latencies: list[float]):
+    print(
+        f"{name:<10} precision={statistics.mean(r['precision'] for r in rows):.3f} "
+        f"hit_rate={statistics.mean(r['hit'] for r in rows):.3f} "
+        f"avg_context={statistics.mean(r['size'] for r in rows):.2f} "
+        f"p50_ms={statistics.median(latencies):.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", required=True)
+    parser.add_argument("--candidates", type=int, default=settings.rerank_candidates)
+    args = parser.parse_args()
+
+    with open(args.dataset, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    # No budget here — the eval measures quality, latency is reported separately
+    reranker = Reranker(settings.rerank_model, budget_ms=0)
+    reranker.load()  # Keep model loading out of the timings
+    baseline, reranked = [], []
+    baseline_ms, rerank_ms = [], []
+
+    for case in cases:
+        question = case["question"]
+        embedding = embed_query(question)
+
+        start = time.perf_counter()
+        results = retrieve(question, embedding, top_k=CONTEXT_TOP_K)
+        baseline_ms.append((time.perf_counter() - start) * 1000)
+        baseline.append(score_context([r for r in results if is_relevant(r)], case))
+
+        start = time.perf_counter()
+        candidates = retrieve(question, embedding, top_k=max(CONTEXT_TOP_K, args.candidates))
+        results = reranker.rerank(question, candidates, CONTEXT_TOP_K)
+        rerank_ms.append((time.perf_counter() - start) * 1000)
+        reranked.append(score_context([r for r in results if is_relevant(r)], case))
+
+    print(f"{len(cases)} questions, top {CONTEXT_TOP_K}, {args.candidates} rerank candidates")
+    summarize("baseline", baseline, baseline_ms)
+    summarize("reranked", reranked, rerank_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Fake OpenAI-compatible chat completions server for exercising the LLM gateway.
+
+Serves POST /openai/v1/chat/completions (the path the Groq SDK uses, so
+LLM_BASE_URL=http://127.0.0.1:<port> works) and /v1/chat/completions, with
+JSON and streaming (SSE) responses. Replies are plain text, no tool calls.
+
+Behaviour is set per model, with a "default" entry for every other model:
+    latency_ms, jitter_ms   normal response time
+    tail_rate, tail_ms      share of requests that take tail_ms instead
+    rate_limit_rate         share answered 429 with Retry-After: retry_after
+    error_rate              share answered 503
+    down                    every request answered 503
+Change it at runtime with POST /control {"default": {...}, "models": {"name": {...}}};
+GET /stats returns request counts per model and status.
+
+Usage (from apps/rag):
+    python -m bench.fake_llm_server --port 8089 --latency-ms 300 --rate-limit-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_BEHAVIOUR = {
+    "latency_ms": 200.0,
+    "jitter_ms": 50.0,
+    "tail_rate": 0.0,
+    "tail_ms": 3000.0,
+    "rate_limit_rate": 0.0,
+    "retry_after": 1.0,
+    "error_rate": 0.0,
+    "down": False,
+}
+
+app = FastAPI(title="Fake LLM")
+state = {"default": dict(DEFAULT_BEHAVIOUR), "models": {}}
+counts: Counter = Counter()
+
+
+def behaviour(model: str) -> dict:
+    return {**state["default"], **state["models"].get(model, {})}
+
+
+@app.post("/control")
+async def control(body: dict):
+    if "default" in body:
+        state["default"] = {**DEFAULT_BEHAVIOUR, **body["default"]}
+    if "models" in body:
+        state["models"] = body["models"]
+    counts.clear()
+    return state
+
+
+@app.get("/stats")
+async def stats():
+    return {f"{model} {status}": n for (model, status), n in counts.items()}
+
+
+def _error(model: str, status: int, message: str, headers: dict | None = None) -> JSONResponse:
+    counts[(model, status)] += 1
+    return JSONResponse(
+        {"error": {"message": message, "type": "fake_error", "code": status}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "")
+    b = behaviour(model)
+    roll = random.random()
+    if b["down"] or roll < b["error_rate"]:
+        await asyncio.sleep(0.01)
+        return _error(model, 503, f"{model} is unavailable")
+    if roll < b["error_rate"] + b["rate_limit_rate"]:
+        return _error(model, 429, "rate limit reached", {"retry-after": str(b["retry_after"])})
+
+    if random.random() < b["tail_rate"]:
+        delay = b["tail_ms"]
+    else:
+        delay = max(random.gauss(b["latency_ms"], b["jitter_ms"]), 0.0)
+    await asyncio.sleep(delay / 1000)
+    counts[(model, 200)] += 1
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    answer = f"Answer from {model}."
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }
+
+    async def events():
+        for i, word in enumerate(answer.split(" ")):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(0.01)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_server(port: int):
+    # For benchmarks that run the server in-process; stop it with server.should_exit = True
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise SystemExit("fake LLM server did not start")
+        time.sleep(0.05)
+    return server
+
+
+def configure(base_url: str, scenario: dict):
+    models = {k: v for k, v in scenario.items() if k != "default"}
+    httpx.post(f"{base_url}/control", json={"default": scenario.get("default", {}), "models": models}).raise_for_status()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    for key, value in DEFAULT_BEHAVIOUR.items():
+        flag = "--" + key.replace("_", "-")
+        if isinstance(value, bool):
+            parser.add_argument(flag, action="store_true")
+        else:
+            parser.add_argument(flag, type=float, default=value)
+    args = parser.parse_args()
+    state["default"] = {key: getattr(args, key) for key in DEFAULT_BEHAVIOUR}
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
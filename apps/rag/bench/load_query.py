@@ -0,0 +1,70 @@
+"""Concurrent load test for POST /rag/query against a running service.
+
+Fires the same number of requests at increasing concurrency levels. With a
+non-blocking pipeline, throughput should grow with concurrency instead of
+staying flat at the single-request rate.
+
+Usage (service running on :8000, INTERNAL_SECRET in env/.env):
+    python -m bench.load_query --requests 40 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from core.config import settings
+
+QUESTIONS = [
+    "When is the midsem exam?",
+    "Who is the head of the CS department?",
+    "What are the lab timings?",
+    "How many credits is the thesis?",
+]
+
+
+async def run_level(url: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def one(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                res = await client.post(
+                    f"{url}/rag/query",
+                    json={"message": QUESTIONS[i % len(QUESTIONS)]},
+                    headers={"x-internal-secret": settings.internal_secret},
+                )
+                res.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "req_per_sec": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for level in args.concurrency:
+        r = asyncio.run(run_level(args.url, args.requests, level))
+        print(f"{r['concurrency']:>5} {r['req_per_sec']:>8.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Import-time and cold-start report for the RAG service.
+
+1. Imports `main` in a fresh interpreter with `-X importtime` and lists the
+   cumulative import time of every service module plus the slowest
+   third-party packages.
+2. Starts uvicorn on a free port and measures time until /health answers,
+   then until /ready reports every warm-up component loaded, with the
+   per-component timings from /ready.
+
+Usage (from apps/rag; uses .env like the service does):
+    python -m bench.startup_report
+"""
+import argparse
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVICE_PACKAGES = ("main", "routers", "rag", "db", "core")
+LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)")
+
+
+def import_times() -> list[tuple[str, float]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import main failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            cumulative, module = match.groups()
+            rows.append((module, int(cumulative) / 1000))
+    return rows
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float, want_ok: bool) -> tuple[float | None, dict | None]:
+    start = time.perf_counter()
+    body = None
+    while time.perf_counter() < deadline:
+        try:
+            res = httpx.get(url, timeout=1.0)
+            body = res.json()
+            if not want_ok or res.status_code == 200:
+                return time.perf_counter() - start, body
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    return None, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ready-timeout", type=float, default=180)
+    parser.add_argument("--top", type=int, default=10, help="Third-party packages to list")
+    args = parser.parse_args()
+
+    rows = import_times()
+    total = next(ms for module, ms in rows if module == "main")
+    print(f"import main: {total:.0f} ms\n")
+    print("Service modules (cumulative ms):")
+    for module, ms in sorted(rows, key=lambda r: -r[1]):
+        if module.split(".")[0] in SERVICE_PACKAGES:
+            print(f"  {module:<32} {ms:>8.1f}")
+    print("\nSlowest third-party packages (cumulative ms):")
+    third_party = {}
+    for module, ms in rows:
+        top = module.split(".")[0]
+        if top not in SERVICE_PACKAGES and "." not in module:
+            third_party[top] = max(third_party.get(top, 0), ms)
+    for module, ms in sorted(third_party.items(), key=lambda r: -r[1])[:args.top]:
+        print(f"  {module:<32} {ms:>8.1f}")
+
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + args.ready_timeout
+        health_s, _ = wait_for(f"http://127.0.0.1:{port}/health", deadline, want_ok=True)
+        ready_s, body = wait_for(f"http://127.0.0.1:{port}/ready", deadline, want_ok=True)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print("\nCold start:")
+    print(f"  process start -> /health 200   {health_s:.2f} s" if health_s is not None else "  /health never answered")
+    if ready_s is not None:
+        print(f"  process start -> /ready 200    {health_s + ready_s:.2f} s")
+    else:
+        print(f"  /ready not 200 after {args.ready_timeout:.0f} s")
+    for name, component in ((body or {}).get("components") or {}).items():
+        detail = f"{component.get('seconds', '-')} s" if "seconds" in component else ""
+        error = f"  ({component['error']})" if component.get("error") else ""
+        print(f"    {name:<18} {component['status']:<8} {detail}{error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Deterministic synthetic department corpus with labelled questions.
+
+Three kinds of documents, one per supported file type:
+  handout (PDF)   a course handout: instructor, credits, room, evaluation
+  policy (DOCX)   a department policy with a few numeric rules
+  notice (TXT)    an event notice: date, time and venue
+
+Each document states a handful of facts among filler paragraphs that every
+document draws from, so retrieval has to find the right chunk rather than
+any chunk about the topic. Every fact becomes a question labelled with the
+document that answers it and the answer text, in the eval_rerank.py format:
+    {"question": "...", "snippets": ["<answer>"], "document_ids": ["<id>"]}
+
+The same seed always gives the same files and questions.
+
+Usage (from apps/rag, no database or model needed):
+    python -m bench.synthetic_corpus --docs 60 --out /tmp/corpus
+"""
+import argparse
+import json
+import os
+import random
+from dataclasses import dataclass, field
+
+import fitz
+from docx import Document
+
+MIME_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "txt": "text/plain",
+}
+KINDS = (("handout", "pdf"), ("policy", "docx"), ("notice", "txt"))
+
+FIRST_NAMES = ["Anita", "Rahul", "Meera", "Vikram", "Sneha", "Arjun", "Kavya", "Nikhil", "Priya", "Rohan",
+               "Divya", "Karthik", "Neha", "Siddharth", "Lakshmi", "Aditya", "Ishita", "Manoj", "Pooja", "Varun"]
+LAST_NAMES = ["Sharma", "Iyer", "Kulkarni", "Menon", "Rao", "Desai", "Pillai", "Naik", "Joshi", "Bhat",
+              "Hegde", "Kamath", "Shetty", "Gupta", "Verma", "Reddy", "Nair", "Patil", "Das", "Sen"]
+SUBJECTS = ["Compilers", "Networks", "Databases", "Operating Systems", "Graphics", "Cryptography",
+            "Machine Learning", "Distributed Systems", "Algorithms", "Robotics", "Information Retrieval",
+            "Computer Architecture", "Software Testing", "Formal Methods", "Data Mining", "Computer Vision"]
+QUALIFIERS = ["Principles of", "Advanced", "Topics in", "Foundations of", "Applied", "Practical", "Modern"]
+ROOMS = ["LT1", "LT2", "LT3", "C301", "C302", "D201", "D204", "Lab 1", "Lab 2", "Seminar Hall"]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+POLICY_TOPICS = ["Lab Access", "Attendance", "Makeup Examination", "Project Submission", "Equipment Loan",
+                 "Teaching Assistantship", "Thesis Registration", "Plagiarism", "Hostel Computing", "Leave"]
+EVENTS = ["Hackathon", "Research Colloquium", "Alumni Talk", "Placement Workshop", "Coding Contest",
+          "Open House", "Poster Session", "Industry Panel", "Reading Group", "Tech Quiz"]
+MONTHS = ["January", "February", "March", "April", "August", "September", "October", "November"]
+
+FILLER = [
+    "Students are expected to check the course page regularly for announcements and updated material.",
+    "All communication regarding the course will take place through the official department mailing list.",
+    "Questions about grading should first be raised with the teaching assistants during their office hours.",
+    "The department encourages students to form study groups and discuss concepts, but not solutions.",
+    "Laptops may be used in class for note taking and programming exercises only.",
+    "Lecture slides are shared after each class and do not replace the prescribed reading.",
+    "Late submissions are not accepted unless prior permission has been obtained in writing.",
+    "Students with a documented medical condition should contact the academic office in advance.",
+    "The timetable division may revise room allocations at short notice; the notice board has the latest version.",
+    "Feedback on assignments is returned within two weeks of the submission deadline.",
+    "Participation in tutorials is strongly recommended and helps in preparing for the examinations.",
+    "Any changes to the evaluation scheme will be announced at least one week in advance.",
+    "The department library keeps reference copies of all prescribed textbooks.",
+    "Students must carry their identity cards to every examination and laboratory session.",
+    "Requests for re-evaluation must be submitted within three working days of the results.",
+    "Use of generative tools in assignments must be declared in the submission.",
+]
+
+
+@dataclass
+class SyntheticDocument:
+    document_id: str
+    kind: str
+    ext: str
+    title: str
+    pages: list[list[str]]  # Paragraphs per page
+    questions: list[dict] = field(default_factory=list)
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.ext]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.document_id}.{self.ext}"
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 0, pages_per_doc: int = 4, paragraphs_per_page: int = 6, prefix: str = "bench"):
+        self.rng = random.Random(seed)
+        self.pages_per_doc = pages_per_doc
+        self.paragraphs_per_page = paragraphs_per_page
+        self.prefix = prefix
+        # Names are drawn without replacement so every answer identifies one document
+        self.pools = {
+            "people": [f"Dr. {f} {m}. {l}" for f in FIRST_NAMES for m in "ABCDEGHKMNPRSTV" for l in LAST_NAMES],
+            "titles": [f"{q} {s}{n}" for q in QUALIFIERS for s in SUBJECTS for n in ("", " II", " III", " IV")],
+            "codes": [f"{d} F{n}" for d in ("CS", "IS", "EEE", "MATH") for n in range(111, 500)],
+            "policies": [(t, major, minor) for t in POLICY_TOPICS for major in range(1, 10) for minor in range(10)],
+            "events": [(e, y, n) for e in EVENTS for y in range(2024, 2028) for n in range(1, 100)],
+        }
+        for pool in self.pools.values():
+            self.rng.shuffle(pool)
+
+    def _take(self, pool: str):
+        if not self.pools[pool]:
+            raise ValueError(f"Synthetic corpus ran out of unique {pool}; use fewer documents")
+        return self.pools[pool].pop()
+
+    def _filler(self, n: int) -> list[str]:
+        return [self.rng.choice(FILLER) for _ in range(n)]
+
+    def _spread(self, facts: list[str]) -> list[list[str]]:
+        # Facts land on random pages among filler, not all on the first one
+        pages = [self._filler(self.paragraphs_per_page) for _ in range(self.pages_per_doc)]
+        for fact in facts:
+            page = self.rng.choice(pages)
+            page.insert(self.rng.randrange(len(page) + 1), fact)
+        return pages
+
+    def handout(self, document_id: str) -> SyntheticDocument:
+        code, title, instructor = self._take("codes"), self._take("titles"), self._take("people")
+        credits, room = self.rng.randint(2, 5), self.rng.choice(ROOMS)
+        midsem = self.rng.choice([20, 25, 30, 35])
+        day, hour = self.rng.choice(WEEKDAYS), self.rng.randint(9, 17)
+        facts = [
+            (f"The instructor in charge of {code} {title} is {instructor}.",
+             f"Who is the instructor in charge of {code}?", instructor),
+            (f"{code} {title} is a {credits}-unit course and lectures are held in {room}.",
+             f"How many units is {title}?", f"{credits}-unit"),
+            (f"The mid-semester examination of {code} carries {midsem}% of the total marks.",
+             f"What is the weightage of the midsem exam in {code}?", f"{midsem}%"),
+            (f"Office hours for {title} are on {day} at {hour}:00 in the instructor's chamber.",
+             f"When are the office hours for {title}?", f"{day} at {hour}:00"),
+        ]
+        return self._document(document_id, "handout", "pdf", f"{code} {title} — Course Handout", facts)
+
+    def policy(self, document_id: str) -> SyntheticDocument:
+        topic, major, minor = self._take("policies")
+        name = f"{topic} Policy v{major}.{minor}"
+        percent, days, contact = self.rng.randint(60, 90), self.rng.randint(2, 21), self._take("people")
+        facts = [
+            (f"Under the {name}, students need at least {percent} percent compliance to remain eligible.",
+             f"What minimum compliance does the {name} require?", f"{percent} percent"),
+            (f"Requests under the {name} must be filed within {days} days of the event.",
+             f"How many days do I have to file a request under the {name}?", f"{days} days"),
+            (f"The coordinator responsible for the {name} is {contact}.",
+             f"Who coordinates the {name}?", contact),
+        ]
+        return self._document(document_id, "policy", "docx", name, facts)
+
+    def notice(self, document_id: str) -> SyntheticDocument:
+        name, year, n = self._take("events")
+        event = f"{name} {year}-{n:02d}"
+        date = f"{self.rng.randint(1, 28)} {self.rng.choice(MONTHS)}"
+        room, hour, host = self.rng.choice(ROOMS), self.rng.randint(9, 18), self._take("people")
+        facts = [
+            (f"The {event} will be held on {date} in {room}.",
+             f"When is the {event}?", date),
+            (f"The {event} starts at {hour}:00 and registration closes an hour earlier.",
+             f"What time does the {event} start?", f"{hour}:00"),
+            (f"The {event} is hosted by {host}.",
+             f"Who is hosting the {event}?", host),
+        ]
+        return self._document(document_id, "notice", "txt", f"Notice: {event}", facts)
+
+    def _document(self, document_id: str, kind: str, ext: str, title: str, facts: list[tuple]) -> SyntheticDocument:
+        doc = SyntheticDocument(document_id, kind, ext, title, self._spread([f for f, _, _ in facts]))
+        doc.questions = [
+            {"question": q, "snippets": [answer], "document_ids": [document_id]}
+            for _, q, answer in facts
+        ]
+        return doc
+
+    def generate(self, docs: int) -> list[SyntheticDocument]:
+        out = []
+        for i in range(docs):
+            kind, _ = KINDS[i % len(KINDS)]
+            out.append(getattr(self, kind)(f"{self.prefix}-{kind}-{i:04d}"))
+        return out
+
+
+def write_pdf(doc: SyntheticDocument, path: str):
+    pdf = fitz.open()
+    for n, paragraphs in enumerate(doc.pages):
+        page = pdf.new_page()
+        body = "\n\n".join(paragraphs)
+        if n == 0:
+            body = f"{doc.title}\n\n{body}"
+        page.insert_textbox(fitz.Rect(40, 40, 555, 800), body, fontsize=9)
+    pdf.save(path)
+    pdf.close()
+
+
+def write_docx(doc: SyntheticDocument, path: str):
+    document = Document()
+    document.add_heading(doc.title, level=1)
+    for n, paragraphs in enumerate(doc.pages):
+        if n:
+            document.add_page_break()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_txt(doc: SyntheticDocument, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(doc.title + "\n\n")
+        f.write("\n\n".join(p for page in doc.pages for p in page) + "\n")
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+
+def write_corpus(docs: list[SyntheticDocument], out_dir: str) -> list[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for doc in docs:
+        path = os.path.join(out_dir, doc.filename)
+        WRITERS[doc.ext](doc, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=4, help="Pages per document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="Directory for the files and questions.jsonl")
+    args = parser.parse_args()
+
+    docs = CorpusGenerator(seed=args.seed, pages_per_doc=args.pages).generate(args.docs)
+    write_corpus(docs, args.out)
+    with open(os.path.join(args.out, "questions.jsonl"), "w", encoding="utf-8") as f:
+        for doc in docs:
+            for q in doc.questions:
+                f.write(json.dumps(q) + "\n")
+    print(f"{len(docs)} documents, {sum(len(d.questions) for d in docs)} questions in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
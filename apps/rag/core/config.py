@@ -10,6 +10,101 @@ class Settings(BaseSettings):
     google_service_account_json: str = ""
     cors_origins: str = ""  # Comma-separated, e.g. https://app.vercel.app,http://localhost:3000
 
+    metrics_public: bool = False  # Serve /metrics without x-internal-secret (for a scraper on a private network)
+    otel_enabled: bool = False  # OpenTelemetry spans; exporter settings come from the standard OTEL_* env vars
+    otel_exporter: str = "otlp"  # "otlp" (HTTP) or "console"
+    otel_service_name: str = "smartassist-rag"
+
+    warmup_on_startup: bool = True  # Load model/clients/pools in the background; /ready waits for it
+    warmup_retry_seconds: float = 30
+    # Sync Postgres pool (ingest, jobs, sync paths)
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_pool_timeout_seconds: float = 10  # Wait for a free connection before raising PoolTimeout
+    db_pool_ping_after_seconds: float = 30  # Ping connections idle longer than this on checkout
+    db_pool_max_idle_seconds: float = 240  # Replace connections idle longer than this (Neon closes idle ones)
+    db_pool_max_lifetime_seconds: float = 3600
+
+    # LLM gateway — see rag/llm_gateway.py
+    llm_model: str = "llama-3.3-70b-versatile"
+    llm_fallback_models: str = "llama-3.1-8b-instant"  # Comma-separated, tried in order when the primary fails
+    llm_base_url: str = ""  # "" = Groq; point at an OpenAI-compatible server (e.g. bench/fake_llm_server.py)
+    llm_deadline_seconds: float = 20  # Whole call, including retries and fallbacks
+    llm_attempt_timeout_seconds: float = 10
+    llm_max_retries: int = 2  # Per model
+    llm_backoff_base_seconds: float = 0.25
+    llm_backoff_max_seconds: float = 4
+    llm_hedge_enabled: bool = False  # Second request when the first outlives the model's p95
+    llm_hedge_min_delay_ms: float = 500
+    llm_breaker_failures: int = 5  # Consecutive calls failing with timeouts/connection errors/429/5xx before a model is skipped
+    llm_breaker_reset_seconds: float = 30
+
+    async_db_pool_size: int = 10  # asyncpg connections used by /rag/query
+    vector_backend: str = "pgvector"  # "pgvector" or "memory" (in-process NumPy index)
+
+    # pgvector index management (rag/vector_index.py, migration 006)
+    vector_index_type: str = "auto"  # "auto", "hnsw" or "ivfflat"; auto picks from the row count
+    vector_index_hnsw_max_rows: int = 1_000_000  # auto builds ivfflat above this (HNSW build time/memory)
+    vector_index_hnsw_m: int = 16
+    vector_index_hnsw_ef_construction: int = 64
+    vector_index_min_rows: int = 1000  # Smaller tables get exact scans (an ivfflat index is dropped; HNSW kept)
+    vector_index_auto_rebuild: bool = True  # Check after ingest jobs; rebuild concurrently when needed
+    vector_index_rebuild_growth: float = 0.5  # Rebuild once the row count moved this much since the last build
+    vector_index_maintenance_work_mem: str = ""  # e.g. "512MB" for faster builds; "" = server default
+    vector_recall_target: float = 0.95  # ef_search / probes are the smallest calibrated value reaching this
+    vector_filtered_search_factor: int = 4  # ef_search / probes multiplier for filtered searches
+
+    # Retrieval — "vector" or "hybrid" (vector + full-text, reciprocal rank fusion)
+    retrieval_mode: str = "hybrid"
+    hybrid_candidates: int = 20  # Results fetched from each list before fusion
+    rrf_k: int = 60
+    lexical_min_score: float = 0.15  # Cosine floor for the top full-text hit when it is below CONFIDENCE_THRESHOLD
+
+    # Cross-encoder reranking of over-fetched candidates
+    rerank_enabled: bool = False
+    rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidates: int = 30  # Candidates fetched for the cross-encoder to rescore
+    rerank_budget_ms: float = 150  # Skip/trim reranking when the estimate exceeds this; 0 = no limit
+    rerank_min_score: float = 0.05  # Min cross-encoder relevance (0–1) to enter the prompt
+
+    context_token_budget: int = 1200  # Estimated prompt tokens for retrieved context
+
+    # Embedding engine — "torch" (sentence-transformers) or "onnx" (ONNX Runtime)
+    embedding_engine: str = "torch"
+    embedding_onnx_quantize: bool = False  # int8 dynamic quantization for the onnx engine
+    embedding_model_cache_dir: str = ""  # "" = the Hugging Face cache (~/.cache/huggingface)
+
+    # Embedding cache — LRU in memory, SQLite on disk ("" path disables the disk tier)
+    embedding_cache_enabled: bool = True
+    embedding_cache_memory_entries: int = 10_000  # float32 vectors, ~1.7 KB each at 384 dims
+    embedding_cache_path: str = "data/embedding_cache.sqlite3"
+    embedding_cache_max_rows: int = 200_000  # 0 = unbounded
+    embedding_cache_stats: bool = True  # Count memory/disk hits and misses
+
+    # Query embedding micro-batcher
+    embedding_batching_enabled: bool = True
+    embedding_batch_max_size: int = 32
+    embedding_batch_max_wait_ms: float = 5.0
+
+    # Background ingestion jobs — SQLite queue + on-disk upload spool
+    ingest_workers: int = 2  # Jobs run at the same time
+    ingest_parse_processes: int = 2  # Processes for PDF/DOCX parsing + chunking
+    ingest_jobs_path: str = "data/ingest_jobs.sqlite3"
+    ingest_job_heartbeat_seconds: float = 10  # Running jobs refresh their heartbeat this often
+    ingest_job_stale_seconds: float = 120  # Running jobs with an older heartbeat are requeued (worker died)
+    ingest_spool_dir: str = "data/spool"
+    ingest_embed_batch_size: int = 256  # Chunks embedded and written per batch
+
+    room_cache_ttl_seconds: float = 300  # Room catalogue reload interval; POST /rag/rooms/invalidate forces one
+
+    drive_sync_concurrency: int = 4  # Parallel Drive downloads
+
+    # Semantic answer cache for repeated questions
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95  # Min cosine similarity between questions
+    answer_cache_ttl_seconds: float = 3600
+    answer_cache_max_entries: int = 1000
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -0,0 +1,197 @@
+"""Thread-safe blocking connection pool for psycopg2.
+
+psycopg2's SimpleConnectionPool is not thread-safe and raises PoolError the
+moment maxconn connections are out. This pool:
+
+- blocks up to `timeout` seconds for a free connection, then raises PoolTimeout
+- runs on_connect (the pgvector type registration) once per physical connection
+- checks connections on the way out, outside the lock: idle ones are pinged, and ones past
+  max_idle / max_lifetime are replaced (Neon drops idle connections)
+- resets or discards connections on the way back in
+- keeps counters for wait time, checkouts, timeouts and in-use connections
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class BlockingConnectionPool:
+    def __init__(
+        self,
+        dsn: str,
+        minconn: int,
+        maxconn: int,
+        timeout: float,
+        max_idle: float,
+        max_lifetime: float,
+        ping_after: float,
+        on_connect: Callable | None = None,
+        on_wait: Callable[[float], None] | None = None,
+    ):
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.on_connect = on_connect
+        self.on_wait = on_wait  # Called with the seconds each checkout waited
+        self._idle: deque[tuple] = deque()  # (conn, created_at, returned_at), most recent on the right
+        self._created: dict[int, float] = {}  # id(conn) -> created_at for checked-out connections
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.counters = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "connections_created": 0,
+            "connections_recycled": 0,
+        }
+        for _ in range(minconn):
+            conn, created_at = self._connect()
+            with self._cond:
+                self._open += 1
+                self._idle.append((conn, created_at, time.monotonic()))
+
+    def _connect(self) -> tuple:
+        conn = psycopg2.connect(self.dsn)
+        try:
+            if self.on_connect is not None:
+                self.on_connect(conn)
+                conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        with self._cond:
+            self.counters["connections_created"] += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        # Caller holds the lock
+        self._open -= 1
+        self.counters["connections_recycled"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._cond.notify()
+
+    def _usable(self, conn, created_at: float, returned_at: float) -> bool:
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if self.max_idle and now - returned_at > self.max_idle:
+            return False
+        if self.ping_after and now - returned_at > self.ping_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def getconn(self, timeout: float | None = None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+                    if self._idle:
+                        conn, created_at, returned_at = self._idle.pop()
+                        break
+                    if self._open < self.maxconn:
+                        self._open += 1  # Reserve the slot, connect outside the lock
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["timeouts"] += 1
+                        raise PoolTimeout(f"no database connection free after {timeout:.1f}s ({self.maxconn} in use)")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn, created_at = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                break
+
+            # Checked outside the lock: a ping is a network round trip, and
+            # other threads keep checking out and returning meanwhile
+            if self._usable(conn, created_at, returned_at):
+                break
+            with self._cond:
+                self._discard(conn)
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._created[id(conn)] = created_at
+            self.counters["checkouts"] += 1
+            self.counters["wait_seconds_total"] += waited
+            self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], waited)
+        if self.on_wait is not None:
+            self.on_wait(waited)
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        # Leave no transaction open: roll back anything the caller did not commit
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+
+        with self._cond:
+            created_at = self._created.pop(id(conn), time.monotonic())
+            if close or conn.closed or self._closed:
+                self._discard(conn)
+                return
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            in_use = len(self._created)
+            checkouts = self.counters["checkouts"]
+            return {
+                **self.counters,
+                "wait_seconds_total": round(self.counters["wait_seconds_total"], 3),
+                "wait_seconds_avg": round(self.counters["wait_seconds_total"] / checkouts, 4) if checkouts else 0.0,
+                "wait_seconds_max": round(self.counters["wait_seconds_max"], 3),
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "open": self._open,
+                "max": self.maxconn,
+            }
@@ -1,26 +1,103 @@
-from psycopg2 import pool
+import asyncio
+import contextlib
+import re
+import threading
+import time
+
+import asyncpg
+from pgvector.asyncpg import register_vector as register_vector_async
 from pgvector.psycopg2 import register_vector
 
+from db.pool import BlockingConnectionPool
+
 _pool = None
+_pool_lock = threading.Lock()
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
 
-def get_pool():
+def get_pool() -> BlockingConnectionPool:
     global _pool
     if _pool is None:
-        from core.config import settings
-        _pool = pool.SimpleConnectionPool(
-            minconn=1,
-            maxconn=10,
-            dsn=settings.database_url
-        )
-        conn = _pool.getconn()
-        register_vector(conn)
-        _pool.putconn(conn)
+        with _pool_lock:
+            if _pool is None:
+                from core.config import settings
+                from rag.metrics import observe_pool_wait
+                _pool = BlockingConnectionPool(
+                    dsn=settings.database_url,
+                    minconn=settings.db_pool_min_size,
+                    maxconn=settings.db_pool_max_size,
+                    timeout=settings.db_pool_timeout_seconds,
+                    max_idle=settings.db_pool_max_idle_seconds,
+                    max_lifetime=settings.db_pool_max_lifetime_seconds,
+                    ping_after=settings.db_pool_ping_after_seconds,
+                    on_connect=register_vector,  # Once per physical connection
+                    on_wait=lambda seconds: observe_pool_wait("sync", seconds),
+                )
     return _pool
 
 def get_connection():
-    conn = get_pool().getconn()
-    register_vector(conn)
-    return conn
+    # Blocks up to DB_POOL_TIMEOUT_SECONDS when every connection is in use
+    return get_pool().getconn()
 
 def release_connection(conn):
-    get_pool().putconn(conn)
\ No newline at end of file
+    get_pool().putconn(conn)
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+def pool_stats() -> dict | None:
+    return _pool.stats() if _pool is not None else None
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    # asyncpg pool for the request path — the vector codec is registered once
+    # per physical connection via init
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                from core.config import settings
+                _async_pool = await asyncpg.create_pool(
+                    dsn=settings.database_url,
+                    min_size=1,
+                    max_size=settings.async_db_pool_size,
+                    init=register_vector_async,
+                )
+    return _async_pool
+
+
+@contextlib.asynccontextmanager
+async def async_connection():
+    # pool.acquire() plus the wait-time metric
+    from rag.metrics import observe_pool_wait
+
+    pool = await get_async_pool()
+    start = time.perf_counter()
+    async with pool.acquire() as conn:
+        observe_pool_wait("async", time.perf_counter() - start)
+        yield conn
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+def to_numbered(sql: str, params: dict) -> tuple[str, list]:
+    # psycopg2 %(name)s placeholders -> asyncpg $n, so one SQL string serves both
+    names = []
+
+    def number(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return re.sub(r"%\((\w+)\)s", number, sql), [params[n] for n in names]
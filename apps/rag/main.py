@@ -1,9 +1,42 @@
+import asyncio
+import contextlib
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routers import query, ingest
+from routers import query, ingest, rooms
 from core.config import settings
+from db.session import close_async_pool, close_pool
+from rag.jobs import start_workers, stop_workers
+from rag.metrics import render, set_corpus_counts
+from rag.tracing import init_tracing, shutdown_tracing
+from rag.vector_store import get_corpus_counts
+from rag.warmup import readiness, warm_up
 
-app = FastAPI(title="CSIS SmartAssist RAG Service")
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs in the background so /health answers right away;
+    # /ready reports when the model, clients and pools are loaded
+    init_tracing()
+    warmup_task = asyncio.create_task(warm_up()) if settings.warmup_on_startup else None
+    start_workers()
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warmup_task
+    stop_workers()
+    await close_async_pool()
+    close_pool()
+    shutdown_tracing()
+
+
+app = FastAPI(title="CSIS SmartAssist RAG Service", lifespan=lifespan)
 
 # CORS — only allow Next.js to call this
 origins = [o.strip() for o in settings.cors_origins.split(",") if o.strip()]
@@ -28,7 +61,9 @@ async def verify_internal_secret(request: Request, call_next):
         normalized_path = path
 
     # Paths that should bypass the internal secret check (health and docs).
-    allowed_paths = {"/health"}
+    allowed_paths = {"/health", "/ready"}
+    if settings.metrics_public:
+        allowed_paths.add("/metrics")
     for docs_path in (app.docs_url, app.openapi_url, app.redoc_url):
         if docs_path:
             allowed_paths.add(docs_path)
@@ -42,7 +77,25 @@ async def verify_internal_secret(request: Request, call_next):
 
 app.include_router(query.router, prefix="/rag")
 app.include_router(ingest.router, prefix="/rag")
+app.include_router(rooms.router, prefix="/rag")
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    try:
+        counts = await run_in_threadpool(get_corpus_counts)
+        set_corpus_counts(counts["total_chunks"], counts["total_documents"])
+    except Exception:
+        logger.exception("Could not read corpus counters")  # Everything else is still served
+    body, content_type = render()
+    return Response(body, media_type=content_type)
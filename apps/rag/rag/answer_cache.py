@@ -0,0 +1,118 @@
+"""Semantic answer cache for repeated questions.
+
+Entries are keyed on the query embedding: a lookup hits when an unexpired
+entry with the same scope (the request's metadata filters) has cosine
+similarity above the threshold. Entries are dropped as soon
+as a document they cite is re-ingested or removed.
+
+The cache is per process. Writes made by another process (a second API
+worker, the backfill) are noticed through the corpus generation that
+migration 007's triggers bump in rag.corpus_stats: callers pass the current
+generation to lookup() and store(), and entries from an older generation
+are dropped. Without migration 007 only the TTL bounds staleness across
+processes.
+"""
+import json
+import threading
+import time
+
+import numpy as np
+
+from core.config import settings
+
+
+class AnswerCache:
+    def __init__(self, enabled: bool, threshold: float, ttl_seconds: float, max_entries: int):
+        self.enabled = enabled and max_entries > 0
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: list[dict] = []
+        self._matrix = None  # Stacked unit vectors, rebuilt lazily after changes
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "saved_llm_seconds": 0.0}
+
+    def _drop(self, keep):
+        self._entries = [e for e in self._entries if keep(e)]
+        self._matrix = None
+
+    @staticmethod
+    def scope_key(filters: dict | None) -> str:
+        return json.dumps(filters or {}, sort_keys=True, default=str)
+
+    def lookup(self, embedding: list[float], filters: dict | None = None,
+               generation: int | None = None) -> dict | None:
+        if not self.enabled:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        with self._lock:
+            now = time.monotonic()
+            if any(e["expires_at"] <= now for e in self._entries):
+                self._drop(lambda e: e["expires_at"] > now)
+            if generation is not None and any(e["generation"] != generation for e in self._entries):
+                self._drop(lambda e: e["generation"] == generation)
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix = np.stack([e["vector"] for e in self._entries])
+                scores = self._matrix @ query
+                scope = self.scope_key(filters)
+                scores = np.where([e["scope"] == scope for e in self._entries], scores, -np.inf)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry = self._entries[best]
+                    self.counters["hits"] += 1
+                    self.counters["saved_llm_seconds"] += entry["llm_seconds"]
+                    return {"answer": entry["answer"], "citations": entry["citations"]}
+            self.counters["misses"] += 1
+            return None
+
+    def store(self, embedding: list[float], answer: str, citations: list[dict], llm_seconds: float,
+              filters: dict | None = None, generation: int | None = None):
+        if not self.enabled or not answer.strip():
+            return  # An empty answer would be replayed to every similar question
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._entries.append({
+                "vector": vector,
+                "scope": self.scope_key(filters),
+                "answer": answer,
+                "citations": citations,
+                "document_ids": {c["document_id"] for c in citations},
+                "llm_seconds": llm_seconds,
+                "generation": generation,  # As read at lookup, so a write during the LLM call drops it
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            })
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+            self._matrix = None
+
+    def invalidate_documents(self, document_ids):
+        # Answers without citations came from general knowledge — a new or
+        # changed document may now answer them better, so drop those too
+        document_ids = set(document_ids)
+        if not self.enabled or not document_ids:
+            return
+        with self._lock:
+            self._drop(lambda e: e["document_ids"] and not (e["document_ids"] & document_ids))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "hits": self.counters["hits"],
+                "misses": self.counters["misses"],
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                "saved_llm_seconds": round(self.counters["saved_llm_seconds"], 3),
+                "entries": len(self._entries),
+            }
+
+
+answer_cache = AnswerCache(
+    enabled=settings.answer_cache_enabled,
+    threshold=settings.answer_cache_threshold,
+    ttl_seconds=settings.answer_cache_ttl_seconds,
+    max_entries=settings.answer_cache_max_entries,
+)
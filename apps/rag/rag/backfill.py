@@ -0,0 +1,359 @@
+"""Bulk (re)indexing from a local directory or the Drive sync log.
+
+Used when the whole index has to be rebuilt — a new embedding model, or a
+wiped rag.embeddings table. Three stages overlap:
+
+- parse: a process pool runs the same extract_chunks as rag.ingest.ingest_file
+- embed: chunks from many documents are pooled into large encode batches
+- write: a writer thread applies each finished document through the
+  apply_chunk_diff bulk path and appends it to a checkpoint file
+
+Re-running with the same checkpoint skips documents already written, so an
+interrupted backfill resumes where it stopped. Checkpoint entries record the
+embedding engine, model and mode (--full or not); a run only skips documents
+written by a run with the same three.
+
+Model, DB and Drive modules are imported where they are used — parse processes
+import this module too and must stay light.
+
+Usage (from apps/rag):
+    python -m rag.backfill --dir ./docs
+    python -m rag.backfill --drive --full
+"""
+import argparse
+import json
+import logging
+import mimetypes
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from core.config import settings
+from rag.extract import SUPPORTED_TYPES, extract_chunks
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("parse", "embed", "write")
+
+
+def _parse(source: str | bytes, mime_type: str) -> tuple[list[str], list[int | None], float]:
+    start = time.perf_counter()
+    chunks, pages = extract_chunks(source, mime_type)
+    return chunks, pages, time.perf_counter() - start
+
+
+def run_key(full: bool) -> str:
+    from rag.embedding_engines import MODEL_NAME
+
+    quantized = "-int8" if settings.embedding_engine == "onnx" and settings.embedding_onnx_quantize else ""
+    return f"{settings.embedding_engine}{quantized}:{MODEL_NAME}:{'full' if full else 'diff'}"
+
+
+def load_checkpoint(path: str, run: str) -> dict[str, str]:
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line from an interrupted run
+                # Written by another engine/model/mode (or before runs were recorded): not done for this one
+                if entry.get("run") == run:
+                    done[entry["key"]] = entry["checksum"]
+    return done
+
+
+def directory_sources(root: str) -> list[dict]:
+    sources = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            mime_type, _ = mimetypes.guess_type(name)
+            if mime_type not in SUPPORTED_TYPES:
+                continue
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            stat = os.stat(path)
+            sources.append({
+                "key": rel,
+                "document_id": rel,
+                "mime_type": mime_type,
+                "checksum": f"{stat.st_size}:{stat.st_mtime_ns}",
+                "path": path,
+                "metadata": {"source_filename": name, "tags": rel.split("/")[:-1]},
+            })
+    return sources
+
+
+def drive_sources() -> list[dict]:
+    from rag.drive_sync import MIME_MAP, file_checksum, get_drive_service, list_drive_files, load_sync_log
+    from rag.filters import parse_drive_time
+
+    sync_log = load_sync_log()
+    listed = {f["id"]: f for f in list_drive_files(get_drive_service(), settings.google_drive_folder_id)}
+    missing = [file_id for file_id in sync_log if file_id not in listed]
+    if missing:
+        logger.warning("%d logged Drive files are no longer in the folder — run a sync to purge them", len(missing))
+
+    sources = []
+    for file_id in sync_log:
+        f = listed.get(file_id)
+        if f is None or f.get("mimeType") not in MIME_MAP:
+            continue
+        sources.append({
+            "key": file_id,
+            "document_id": file_id,
+            "mime_type": MIME_MAP[f["mimeType"]],
+            "checksum": file_checksum(f),
+            "drive_file": f,
+            "metadata": {
+                "source_filename": f["name"],
+                "drive_modified_at": parse_drive_time(f.get("modifiedTime")),
+                "tags": f["folders"],
+            },
+        })
+    return sources
+
+
+class Backfill:
+    def __init__(self, sources: list[dict], checkpoint_path: str, full: bool,
+                 processes: int, embed_batch: int, drive: bool):
+        self.sources = sources
+        self.checkpoint_path = checkpoint_path
+        self.full = full
+        self.processes = processes
+        self.embed_batch = embed_batch
+        self.drive = drive
+        self.run_key = run_key(full)
+        self.stats = {stage: {"docs": 0, "chunks": 0, "seconds": 0.0} for stage in STAGES}
+        self.failed: list[dict] = []
+        self._buffer: list[tuple[dict, int]] = []  # (document, chunk index) waiting for the encoder
+        self._writes: queue.Queue = queue.Queue(maxsize=8)
+        self._checkpoint_lock = threading.Lock()
+
+    def _record(self, stage: str, docs: int, chunks: int, seconds: float):
+        entry = self.stats[stage]
+        entry["docs"] += docs
+        entry["chunks"] += chunks
+        entry["seconds"] += seconds
+
+    def _checkpoint(self, source: dict, chunks: int):
+        with self._checkpoint_lock, open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "key": source["key"], "checksum": source["checksum"], "run": self.run_key, "chunks": chunks,
+            }) + "\n")
+
+    # Step 2 — diff a parsed document and queue its new chunks for the encoder
+    def _plan(self, source: dict, chunks: list[str], pages: list[int | None]):
+        from rag.chunker import hash_chunk
+        from rag.ingest import plan_chunk_diff
+        from rag.vector_store import get_chunk_hashes
+
+        hashes = [hash_chunk(c) for c in chunks]
+        existing = get_chunk_hashes(source["document_id"])
+        if self.full:
+            # New model: every stored vector is stale, keep nothing
+            to_embed, reindex, delete_ids = list(range(len(chunks))), [], [row[0] for row in existing]
+        else:
+            to_embed, reindex, delete_ids = plan_chunk_diff(existing, hashes, pages)
+
+        doc = {
+            "source": source,
+            "chunks": chunks,
+            "pages": pages,
+            "hashes": hashes,
+            "reindex": reindex,
+            "delete_ids": delete_ids,
+            "embeddings": {},
+            "remaining": len(to_embed),
+        }
+        if not to_embed:
+            self._writes.put(doc)
+        self._buffer.extend((doc, i) for i in to_embed)
+
+    # Step 3 — encode pooled chunks from many documents in one call
+    def _flush(self, force: bool = False):
+        from rag.embeddings import generate_embeddings
+
+        while self._buffer and (force or len(self._buffer) >= self.embed_batch):
+            batch, self._buffer = self._buffer[:self.embed_batch], self._buffer[self.embed_batch:]
+            start = time.perf_counter()
+            embeddings = generate_embeddings([doc["chunks"][i] for doc, i in batch])
+            finished = []
+            for (doc, i), emb in zip(batch, embeddings):
+                doc["embeddings"][i] = emb
+                doc["remaining"] -= 1
+                if doc["remaining"] == 0:
+                    finished.append(doc)
+            self._record("embed", len(finished), len(batch), time.perf_counter() - start)
+            for doc in finished:
+                self._writes.put(doc)
+
+    # Step 4 — bulk write + checkpoint, on its own thread so encoding continues
+    def _writer(self):
+        from rag.vector_store import apply_chunk_diff
+
+        record_sync = None
+        if self.drive:
+            from rag.drive_sync import _record_sync as record_sync
+
+        while (doc := self._writes.get()) is not None:
+            source = doc["source"]
+            try:
+                start = time.perf_counter()
+                inserts = [
+                    (i, doc["chunks"][i], doc["hashes"][i], emb, doc["pages"][i])
+                    for i, emb in sorted(doc["embeddings"].items())
+                ]
+                metadata = {"mime_type": source["mime_type"], **source["metadata"]}
+                # No backend refresh: this process never searches, and the
+                # memory backend would reload every document once per write
+                apply_chunk_diff(
+                    source["document_id"], inserts, doc["reindex"], doc["delete_ids"],
+                    metadata=metadata, refresh_backend=False,
+                )
+                if record_sync is not None:
+                    record_sync(source["drive_file"])
+                self._checkpoint(source, len(doc["chunks"]))
+                self._record("write", 1, len(inserts), time.perf_counter() - start)
+            except Exception as e:
+                logger.exception("Backfill write failed for %s", source["key"])
+                self.failed.append({"key": source["key"], "stage": "write", "error": str(e)})
+
+    def run(self) -> dict:
+        done = load_checkpoint(self.checkpoint_path, self.run_key)
+        todo = [s for s in self.sources if done.get(s["key"]) != s["checksum"]]
+        skipped = len(self.sources) - len(todo)
+        logger.info("Backfill (%s): %d documents, %d already done", self.run_key, len(self.sources), skipped)
+
+        writer = threading.Thread(target=self._writer, name="backfill-writer", daemon=True)
+        writer.start()
+        wall_start = time.perf_counter()
+
+        # spawn keeps the parse processes free of the loaded model
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=ctx) as parse_pool, \
+                ThreadPoolExecutor(max_workers=settings.drive_sync_concurrency) as download_pool:
+            service = threading.local()
+
+            def download_and_parse(source: dict):
+                # Step 1 (Drive) — download on a thread, parse in the pool
+                from rag.drive_sync import download_file, get_drive_service
+
+                if not hasattr(service, "client"):
+                    service.client = get_drive_service()
+                file_bytes = download_file(service.client, source["drive_file"])
+                return parse_pool.submit(_parse, file_bytes, source["mime_type"]).result()
+
+            def submit(source: dict):
+                # Step 1 — parse
+                if self.drive:
+                    return download_pool.submit(download_and_parse, source)
+                return parse_pool.submit(_parse, source["path"], source["mime_type"])
+
+            pending = list(reversed(todo))
+            in_flight = {}
+            next_log = 25
+            while pending or in_flight:
+                # Bounded window: parsed-but-unembedded chunks never pile up
+                while pending and len(in_flight) < self.processes * 2:
+                    source = pending.pop()
+                    in_flight[submit(source)] = source
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    source = in_flight.pop(future)
+                    try:
+                        chunks, pages, seconds = future.result()
+                        self._record("parse", 1, len(chunks), seconds)
+                        self._plan(source, chunks, pages)
+                    except Exception as e:
+                        logger.warning("Backfill parse failed for %s: %s", source["key"], e)
+                        self.failed.append({"key": source["key"], "stage": "parse", "error": str(e)})
+                self._flush()
+
+                if self.stats["parse"]["docs"] >= next_log:
+                    self._log_progress(time.perf_counter() - wall_start)
+                    next_log += 25
+
+            self._flush(force=True)
+
+        self._writes.put(None)
+        writer.join()
+        wall = time.perf_counter() - wall_start
+        return {"documents": len(self.sources), "skipped": skipped, "failed": self.failed,
+                "wall_seconds": round(wall, 2), "stages": self.report(wall)}
+
+    def _log_progress(self, wall: float):
+        logger.info(
+            "Backfill progress: parsed=%d embedded_chunks=%d written=%d (%.1f docs/s)",
+            self.stats["parse"]["docs"], self.stats["embed"]["chunks"], self.stats["write"]["docs"],
+            self.stats["write"]["docs"] / wall if wall else 0.0,
+        )
+
+    def report(self, wall: float) -> dict:
+        # busy_* rates are per second spent in the stage (summed over parse
+        # processes); wall_* rates are over the whole run
+        report = {}
+        for stage, entry in self.stats.items():
+            busy = entry["seconds"]
+            report[stage] = {
+                **entry,
+                "seconds": round(busy, 2),
+                "busy_docs_per_sec": round(entry["docs"] / busy, 2) if busy else None,
+                "busy_chunks_per_sec": round(entry["chunks"] / busy, 1) if busy else None,
+                "wall_docs_per_sec": round(entry["docs"] / wall, 2) if wall else None,
+                "wall_chunks_per_sec": round(entry["chunks"] / wall, 1) if wall else None,
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of PDF/DOCX/TXT files; document ids are their relative paths")
+    source.add_argument("--drive", action="store_true", help="Re-ingest every file recorded in the Drive sync log")
+    parser.add_argument("--full", action="store_true", help="Re-embed every chunk, e.g. after changing the model")
+    parser.add_argument("--checkpoint", default="data/backfill_checkpoint.jsonl",
+                        help="Progress file; delete it to start over")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--embed-batch", type=int, default=1024)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    os.makedirs(os.path.dirname(os.path.abspath(args.checkpoint)), exist_ok=True)
+    sources = drive_sources() if args.drive else directory_sources(args.dir)
+    result = Backfill(
+        sources,
+        checkpoint_path=args.checkpoint,
+        full=args.full,
+        processes=args.processes,
+        embed_batch=args.embed_batch,
+        drive=args.drive,
+    ).run()
+
+    print(f"{result['documents']} documents, {result['skipped']} skipped (checkpoint), "
+          f"{len(result['failed'])} failed, {result['wall_seconds']} s")
+    print(f"{'stage':<6} {'docs':>6} {'chunks':>8} {'busy s':>8} {'docs/s':>8} {'chunks/s':>9} {'wall docs/s':>12} {'wall chunks/s':>14}")
+    for stage, r in result["stages"].items():
+        print(f"{stage:<6} {r['docs']:>6} {r['chunks']:>8} {r['seconds']:>8} {r['busy_docs_per_sec'] or '-':>8} "
+              f"{r['busy_chunks_per_sec'] or '-':>9} {r['wall_docs_per_sec'] or '-':>12} {r['wall_chunks_per_sec'] or '-':>14}")
+    for failure in result["failed"]:
+        print(f"FAILED {failure['stage']}: {failure['key']} — {failure['error']}")
+
+    if settings.vector_index_auto_rebuild and settings.vector_backend == "pgvector":
+        from rag.vector_index import maybe_rebuild
+
+        index = maybe_rebuild()
+        if index is not None and index.get("dropped"):
+            print(f"vector index dropped ({index['reason']}); searches scan exactly")
+        elif index is not None:
+            print(f"vector index rebuilt ({index['reason']}): {index['index_type']} {index['params']} "
+                  f"in {index['build_seconds']} s, {index['size_bytes'] / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,77 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import hashlib
+from bisect import bisect_right
+from typing import Iterable, Iterator
 
-def get_chunks(text: str) -> list[str]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50,
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+WINDOW_CHARS = 40 * CHUNK_SIZE  # Text buffered before splitting in iter_chunks
+
+def _splitter():
+    # Imported here — langchain is slow to import and only ingest needs it
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
         separators=["\n\n", "\n", ".", " ", ""]
     )
-    chunks = splitter.split_text(text)
-    return [c.strip() for c in chunks if c.strip()]
\ No newline at end of file
+
+
+def get_chunks(text: str) -> list[str]:
+    chunks = _splitter().split_text(text)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def iter_chunks(segments: Iterable[tuple[int | None, str]]) -> Iterator[tuple[str, int | None]]:
+    """Chunk a stream of (page_number, text) segments.
+
+    Text is buffered up to WINDOW_CHARS and split; every chunk but the last is
+    emitted and the last one is carried over, so it can grow with the next
+    segments. Memory stays bounded by the window, not the document. Each
+    chunk is tagged with the page it starts on.
+    """
+    splitter = _splitter()
+    buffer = ""
+    starts: list[int] = []  # Buffer offset where each page's text begins
+    pages: list[int | None] = []
+
+    def split(final: bool):
+        nonlocal buffer, starts, pages
+        pieces = splitter.split_text(buffer)
+        cursor = 0
+        located = []
+        for piece in pieces:
+            pos = buffer.find(piece, cursor)
+            pos = cursor if pos < 0 else pos
+            located.append((pos, piece))
+            cursor = pos + 1
+        if not final and len(located) > 1:
+            carry_from = located[-1][0]
+            located = located[:-1]
+        else:
+            carry_from = len(buffer)
+
+        for pos, piece in located:
+            if piece.strip():
+                yield piece.strip(), pages[bisect_right(starts, pos) - 1]
+
+        # Rebase the carried-over text and the pages it spans
+        first = max(bisect_right(starts, carry_from) - 1, 0)
+        buffer = buffer[carry_from:]
+        starts = [max(s - carry_from, 0) for s in starts[first:]]
+        pages = pages[first:]
+
+    for page, text in segments:
+        if not text:
+            continue
+        starts.append(len(buffer))
+        pages.append(page)
+        buffer += text
+        if len(buffer) >= WINDOW_CHARS:
+            yield from split(final=False)
+    if buffer:
+        yield from split(final=True)
+
+
+def hash_chunk(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
@@ -0,0 +1,111 @@
+"""Prompt context assembly under a token budget.
+
+Retrieved chunks overlap (the splitter repeats up to 50 characters between
+neighbours) and often come from consecutive positions in the same document.
+Runs of adjacent chunk_index values are merged into one span with the
+repeated overlap removed, exact duplicates are dropped, and spans are packed
+in retrieval rank order until the budget is spent.
+
+Token counts are estimated from character length — close enough for
+budgeting without shipping the LLM's tokenizer.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+MAX_OVERLAP_CHARS = 200
+MIN_OVERLAP_CHARS = 10  # Shorter suffix/prefix matches are likely coincidence
+
+_totals = {"requests": 0, "raw_tokens": 0, "tokens": 0, "tokens_saved": 0}
+_totals_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+
+def strip_overlap(previous: str, text: str) -> tuple[str, bool]:
+    # Longest suffix of previous that text starts with
+    for size in range(min(len(previous), len(text), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip(), True
+    return text, False
+
+
+def merge_adjacent(results: list[dict]) -> list[dict]:
+    """Group ranked results into spans of consecutive chunks per document.
+
+    Each span keeps the best (lowest) rank and highest score of its members.
+    """
+    seen_texts = set()
+    by_document: dict[str, list[tuple[int, dict]]] = {}
+    for rank, result in enumerate(results):
+        text = result["chunk_text"]
+        if text in seen_texts:
+            continue
+        seen_texts.add(text)
+        by_document.setdefault(result["document_id"], []).append((rank, result))
+
+    spans = []
+    for document_id, members in by_document.items():
+        members.sort(key=lambda m: (m[1].get("chunk_index") is None, m[1].get("chunk_index") or 0))
+        span = None
+        for rank, result in members:
+            index = result.get("chunk_index")
+            if span is not None and index is not None and index == span["chunk_indexes"][-1] + 1:
+                remainder, overlapped = strip_overlap(span["chunk_text"], result["chunk_text"])
+                if remainder:
+                    span["chunk_text"] += (" " if overlapped else "\n") + remainder
+                span["chunk_indexes"].append(index)
+                span["rank"] = min(span["rank"], rank)
+                span["score"] = max(span["score"], result["score"])
+                continue
+            span = {
+                **result,
+                "rank": rank,
+                "chunk_indexes": [index] if index is not None else [],
+            }
+            spans.append(span)
+            if index is None:
+                span = None
+    return sorted(spans, key=lambda s: s["rank"])
+
+
+def build_context(results: list[dict], token_budget: int) -> tuple[list[dict], dict]:
+    """Merge, dedupe and pack results; returns (spans, token stats)."""
+    raw_tokens = sum(estimate_tokens(r["chunk_text"]) for r in results)
+    packed, used = [], 0
+    for span in merge_adjacent(results):
+        tokens = estimate_tokens(span["chunk_text"])
+        if used + tokens > token_budget:
+            if packed:
+                continue  # A lower-ranked, shorter span may still fit
+            # Never return an empty context just because the best span is long
+            span["chunk_text"] = span["chunk_text"][:token_budget * CHARS_PER_TOKEN]
+            tokens = estimate_tokens(span["chunk_text"])
+        packed.append(span)
+        used += tokens
+
+    stats = {
+        "chunks": len(results),
+        "spans": len(packed),
+        "raw_tokens": raw_tokens,
+        "tokens": used,
+        "tokens_saved": raw_tokens - used,
+    }
+    with _totals_lock:
+        _totals["requests"] += 1
+        for key in ("raw_tokens", "tokens", "tokens_saved"):
+            _totals[key] += stats[key]
+    logger.info(
+        "rag context chunks=%d spans=%d tokens=%d tokens_saved=%d",
+        stats["chunks"], stats["spans"], stats["tokens"], stats["tokens_saved"],
+    )
+    return packed, stats
+
+
+def context_stats() -> dict:
+    with _totals_lock:
+        return dict(_totals)
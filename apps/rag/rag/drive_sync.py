@@ -1,14 +1,20 @@
 import json
-import io
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 from google.oauth2 import service_account
 from core.config import settings
+from rag.filters import parse_drive_time
 from rag.ingest import ingest_file
+from rag.vector_store import delete_documents
 from db.session import get_connection, release_connection
 
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 
+FOLDER_MIME = "application/vnd.google-apps.folder"
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime)"
+
 MIME_MAP = {
     "application/pdf": "application/pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -29,88 +35,183 @@ def get_drive_service():
     return build("drive", "v3", credentials=creds)
 
 
-def sync_drive_folder() -> dict:
-    if not settings.google_service_account_json or not settings.google_drive_folder_id:
-        return {"status": "skipped", "reason": "Drive not configured"}
+def list_drive_files(service, folder_id: str) -> list[dict]:
+    # Follows nextPageToken and walks subfolders — returns every non-folder
+    # file, with "folders" set to the names of the subfolders it sits in
+    files = []
+    pending = [(folder_id, [])]
+    seen = set()
+    while pending:
+        parent, path = pending.pop()
+        if parent in seen:
+            continue
+        seen.add(parent)
+
+        page_token = None
+        while True:
+            results = service.files().list(
+                q=f"'{parent}' in parents and trashed=false",
+                fields=LIST_FIELDS,
+                pageSize=1000,
+                pageToken=page_token,
+            ).execute()
+            for f in results.get("files", []):
+                if f.get("mimeType") == FOLDER_MIME:
+                    pending.append((f["id"], path + [f["name"]]))
+                else:
+                    files.append({**f, "folders": path})
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                break
+    return files
 
-    service = get_drive_service()
 
-    results = service.files().list(
-        q=f"'{settings.google_drive_folder_id}' in parents and trashed=false",
-        fields="files(id, name, mimeType, md5Checksum, modifiedTime)",
-        pageSize=100,
-    ).execute()
+def download_file(service, f: dict) -> bytes:
+    mime = f["mimeType"]
+    if mime in EXPORT_MIME:
+        request = service.files().export_media(fileId=f["id"], mimeType=EXPORT_MIME[mime])
+    else:
+        request = service.files().get_media(fileId=f["id"])
+    return request.execute()
 
-    files = results.get("files", [])
-    ingested = []
-    skipped = []
-    failed = []
 
-    conn = get_connection()
-    cur = conn.cursor()
+def file_checksum(f: dict) -> str:
+    return f.get("md5Checksum") or f.get("modifiedTime", "")
+
 
+def load_sync_log() -> dict[str, dict]:
+    conn = get_connection()
     try:
-        for f in files:
-            mime = f.get("mimeType")
-            if mime not in MIME_MAP:
-                skipped.append(f["name"])
-                continue
-
-            file_id = f["id"]
-            checksum = f.get("md5Checksum") or f.get("modifiedTime", "")
-
-            # Skip if already ingested with same checksum
-            cur.execute(
-                "SELECT 1 FROM rag.drive_sync_log WHERE drive_file_id = %s AND checksum = %s",
-                (file_id, checksum),
-            )
-            if cur.fetchone():
-                skipped.append(f["name"])
-                continue
-
-            try:
-                if mime in EXPORT_MIME:
-                    request = service.files().export_media(
-                        fileId=file_id,
-                        mimeType=EXPORT_MIME[mime]
-                    )
-                else:
-                    request = service.files().get_media(fileId=file_id)
-
-                buffer = io.BytesIO()
-                downloader = MediaIoBaseDownload(buffer, request)
-                done = False
-                while not done:
-                    _, done = downloader.next_chunk()
-
-                file_bytes = buffer.getvalue()
-                actual_mime = MIME_MAP[mime]
-
-                ingest_file(file_bytes, actual_mime, file_id)
-
-                cur.execute(
-                    """
-                    INSERT INTO rag.drive_sync_log (drive_file_id, filename, checksum, synced_at)
-                    VALUES (%s, %s, %s, now())
-                    ON CONFLICT (drive_file_id) DO UPDATE
-                    SET checksum = EXCLUDED.checksum, synced_at = now()
-                    """,
-                    (file_id, f["name"], checksum),
-                )
-                conn.commit()
-                ingested.append(f["name"])
-
-            except Exception as e:
-                conn.rollback()
-                failed.append({"name": f["name"], "error": str(e)})
+        cur = conn.cursor()
+        cur.execute("SELECT drive_file_id, filename, checksum FROM rag.drive_sync_log")
+        rows = cur.fetchall()
+        cur.close()
+        return {row[0]: {"filename": row[1], "checksum": row[2]} for row in rows}
+    finally:
+        release_connection(conn)
+
 
+def diff_drive_files(files: list[dict], sync_log: dict[str, dict]) -> tuple[list[dict], list[dict], list[dict], list[str]]:
+    """Split supported Drive files into (added, changed, unchanged) against the
+    sync log, plus the ids of logged files that are no longer in Drive."""
+    added, changed, unchanged = [], [], []
+    for f in files:
+        logged = sync_log.get(f["id"])
+        if logged is None:
+            added.append(f)
+        elif logged["checksum"] != file_checksum(f):
+            changed.append(f)
+        else:
+            unchanged.append(f)
+    present = {f["id"] for f in files}
+    removed = [file_id for file_id in sync_log if file_id not in present]
+    return added, changed, unchanged, removed
+
+
+def _purge_removed(file_ids: list[str]) -> int:
+    deleted = delete_documents(file_ids)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM rag.drive_sync_log WHERE drive_file_id = ANY(%s)", (file_ids,))
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
+        release_connection(conn)
+    return deleted
+
+
+def _record_sync(f: dict):
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO rag.drive_sync_log (drive_file_id, filename, checksum, synced_at)
+            VALUES (%s, %s, %s, now())
+            ON CONFLICT (drive_file_id) DO UPDATE
+            SET filename = EXCLUDED.filename, checksum = EXCLUDED.checksum, synced_at = now()
+            """,
+            (f["id"], f["name"], file_checksum(f)),
+        )
+        conn.commit()
         cur.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         release_connection(conn)
 
+
+def sync_drive_folder(service_factory: Callable = get_drive_service) -> dict:
+    # service_factory builds a Drive client; each download thread gets its own
+    # because googleapiclient/httplib2 objects are not thread-safe
+    if not settings.google_service_account_json or not settings.google_drive_folder_id:
+        return {"status": "skipped", "reason": "Drive not configured"}
+
+    service = service_factory()
+    files = list_drive_files(service, settings.google_drive_folder_id)
+
+    ingested = []
+    failed = []
+    skipped = [f["name"] for f in files if f.get("mimeType") not in MIME_MAP]
+    supported = [f for f in files if f.get("mimeType") in MIME_MAP]
+
+    # One query for the whole sync log, then diff in memory
+    sync_log = load_sync_log()
+    added, changed, unchanged, removed = diff_drive_files(supported, sync_log)
+    skipped.extend(f["name"] for f in unchanged)
+    to_sync = added + changed
+
+    # An empty listing with a non-empty log usually means lost folder access,
+    # not that every document was deleted — don't wipe the index on that
+    if not supported:
+        removed = []
+    purged_chunks = _purge_removed(removed) if removed else 0
+
+    local = threading.local()
+
+    def fetch(f: dict) -> bytes:
+        if not hasattr(local, "service"):
+            local.service = service_factory()
+        return download_file(local.service, f)
+
+    # Downloads run concurrently; each finished download is embedded and saved
+    # here while the others continue. The in-flight window bounds memory.
+    concurrency = max(1, settings.drive_sync_concurrency)
+    pending = list(reversed(to_sync))
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="drive-download") as pool:
+        while pending or in_flight:
+            while pending and len(in_flight) < concurrency * 2:
+                f = pending.pop()
+                in_flight[pool.submit(fetch, f)] = f
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                f = in_flight.pop(future)
+                try:
+                    file_bytes = future.result()
+                    ingest_file(file_bytes, MIME_MAP[f["mimeType"]], f["id"], metadata={
+                        "source_filename": f["name"],
+                        "drive_modified_at": parse_drive_time(f.get("modifiedTime")),
+                        "tags": f["folders"],
+                    })
+                    _record_sync(f)
+                    ingested.append(f["name"])
+                except Exception as e:
+                    failed.append({"name": f["name"], "error": str(e)})
+
     return {
         "status": "done",
+        "added": [f["name"] for f in added],
+        "changed": [f["name"] for f in changed],
+        "removed": [sync_log[file_id]["filename"] for file_id in removed],
+        "purged_chunks": purged_chunks,
         "ingested": ingested,
         "skipped": skipped,
         "failed": failed,
-    }
\ No newline at end of file
+    }
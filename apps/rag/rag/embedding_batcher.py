@@ -0,0 +1,69 @@
+"""Micro-batching in front of the embedding model.
+
+Concurrent single-text encode requests are collected for up to max_wait_ms
+(or until max_batch texts are waiting) and encoded in one forward pass; each
+caller gets its own vector back through a Future.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+
+class EmbeddingBatcher:
+    def __init__(self, encode_fn: Callable[[list[str]], list[list[float]]], max_batch: int, max_wait_ms: float):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue[tuple[str, Future]] = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> list[float]:
+        return self.submit(text).result()
+
+    async def aencode(self, text: str) -> list[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> list[tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(text, f) for text, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = self.encode_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, f in batch:
+                    f.set_exception(e)
+                continue
+            for (_, f), vector in zip(batch, vectors):
+                f.set_result(vector)
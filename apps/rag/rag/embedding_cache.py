@@ -0,0 +1,127 @@
+"""Content-addressed embedding cache: in-process LRU in front of a SQLite file.
+
+Keys are sha256(model name + normalized text), so the same paragraph or the
+same question is only ever encoded once per model. Vectors are held as
+read-only float32 arrays (~1.5 KB for 384 dims, vs ~12 KB as a list of
+Python floats); callers convert at their API boundary.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Check the persistent tier's size every this many writes
+_EVICT_CHECK_EVERY = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, memory_entries: int, path: str = "", max_rows: int = 0, track_stats: bool = True):
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self.track_stats = track_stats
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            memory_hits = len(found)
+
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            if self._db is not None and missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})",
+                    missing,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)  # Read-only view of the blob
+                    found[key] = vector
+                    self._remember(key, vector)
+                if rows:
+                    self._db.executemany(
+                        "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                        [(time.time(), key) for key, _ in rows],
+                    )
+                    self._db.commit()
+
+            if self.track_stats:
+                self.counters["memory_hits"] += memory_hits
+                self.counters["disk_hits"] += len(found) - memory_hits
+                self.counters["misses"] += len(set(keys) - found.keys())
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]):
+        # Own copies: a row view would keep the caller's whole batch matrix alive
+        items = {k: np.array(v, dtype=np.float32) for k, v in items.items()}
+        for vector in items.values():
+            vector.setflags(write=False)
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._db is None or not items:
+                return
+            now = time.time()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, v.tobytes(), now) for k, v in items.items()],
+            )
+            self._writes += len(items)
+            if self.max_rows and self._writes >= _EVICT_CHECK_EVERY:
+                self._writes = 0
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+        if count > self.max_rows:
+            self._db.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                (count - self.max_rows,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = sum(self.counters.values())
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            return {
+                **self.counters,
+                "memory_entries": len(self._lru),
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+            }
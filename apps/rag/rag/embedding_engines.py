@@ -0,0 +1,110 @@
+"""Embedding engines for the sentence-transformers model.
+
+"torch" runs the model through sentence-transformers / PyTorch. "onnx" runs
+the ONNX export published with the model through ONNX Runtime, optionally
+int8 dynamically quantized, with the same pipeline (tokenize, mean-pool over
+the attention mask, L2-normalize). Model files are cached under
+EMBEDDING_MODEL_CACHE_DIR (default: the Hugging Face cache), so only the
+first start downloads them.
+
+Each engine's `name` is part of the embedding cache key: vectors from
+different engines or precisions never mix in the cache.
+"""
+import os
+
+import numpy as np
+
+from core.config import settings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers setting
+BATCH_SIZE = 32
+
+
+class TorchEngine:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = engine_name("torch", model_name)
+        self.model = SentenceTransformer(model_name, cache_folder=settings.embedding_model_cache_dir or None)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=BATCH_SIZE, show_progress_bar=False)
+
+
+class OnnxEngine:
+    def __init__(self, model_name: str, quantize: bool):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        cache_dir = settings.embedding_model_cache_dir or None
+        model_path = hf_hub_download(model_name, "onnx/model.onnx", cache_dir=cache_dir)
+        tokenizer_path = hf_hub_download(model_name, "tokenizer.json", cache_dir=cache_dir)
+        if quantize:
+            model_path = self._quantized(model_path)
+
+        self.name = engine_name("onnx", model_name, quantize)
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _quantized(model_path: str) -> str:
+        # Dynamic int8 quantization of the weights, done once next to the fp32 file
+        quantized_path = os.path.join(os.path.dirname(model_path), "model_int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            tmp_path = quantized_path + ".tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        return quantized_path
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Batch texts of similar length together to keep padding small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), BATCH_SIZE):
+            batch = order[start:start + BATCH_SIZE]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                out[i] = vector
+        return np.stack(out)
+
+
+def engine_name(engine: str, model_name: str, quantize: bool = False) -> str:
+    # Known without loading the model, so cache lookups do not need it
+    if engine == "onnx":
+        return f"{model_name}:onnx-{'int8' if quantize else 'fp32'}"
+    return model_name  # Same cache keys as before engines were selectable
+
+
+def load_engine(engine: str, model_name: str, quantize: bool = False):
+    if engine == "torch":
+        return TorchEngine(model_name)
+    if engine == "onnx":
+        return OnnxEngine(model_name, quantize)
+    raise ValueError(f"Unknown EMBEDDING_ENGINE: {engine}")
@@ -1,8 +1,108 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import threading
+
+import numpy as np
+
+from core.config import settings
+from rag.embedding_batcher import EmbeddingBatcher
+from rag.embedding_cache import EmbeddingCache, cache_key
+from rag.embedding_engines import MODEL_NAME, engine_name, load_engine
+
+# Loaded on first use (or by the startup warm-up), then stays in memory
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = load_engine(settings.embedding_engine, MODEL_NAME, settings.embedding_onnx_quantize)
+    return _engine
+
+
+# Cache key prefix, from settings: a batch of cache hits never loads the model
+ENGINE_NAME = engine_name(settings.embedding_engine, MODEL_NAME, settings.embedding_onnx_quantize)
+
+# Built on first use, so importing this module opens no files and starts no threads
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+_batcher: EmbeddingBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache | None:
+    global _cache
+    if _cache is None and settings.embedding_cache_enabled:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    memory_entries=settings.embedding_cache_memory_entries,
+                    path=settings.embedding_cache_path,
+                    max_rows=settings.embedding_cache_max_rows,
+                    track_stats=settings.embedding_cache_stats,
+                )
+    return _cache
+
+
+def get_batcher() -> EmbeddingBatcher | None:
+    global _batcher
+    if _batcher is None and settings.embedding_batching_enabled:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(
+                    generate_embeddings,
+                    max_batch=settings.embedding_batch_max_size,
+                    max_wait_ms=settings.embedding_batch_max_wait_ms,
+                )
+    return _batcher
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    return np.asarray(get_engine().encode(texts), dtype=np.float32)
 
-# Loads once when the module is imported — stays in memory
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
 def generate_embeddings(texts: list[str]) -> list[list[float]]:
-    embeddings = model.encode(texts, show_progress_bar=False)
-    return embeddings.tolist()
\ No newline at end of file
+    cache = get_cache()
+    if cache is None:
+        return _encode(texts).tolist()
+
+    keys = [cache_key(ENGINE_NAME, t) for t in texts]
+    found = cache.get_many(keys)
+
+    # Encode each missing text once, even if it repeats within the batch
+    missing = {k: t for k, t in zip(keys, texts) if k not in found}
+    if missing:
+        encoded = dict(zip(missing.keys(), _encode(list(missing.values()))))
+        cache.put_many(encoded)
+        found.update(encoded)
+
+    # The cache holds float32 arrays; callers get plain lists
+    return [found[k].tolist() for k in keys]
+
+
+async def agenerate_embeddings(texts: list[str]) -> list[list[float]]:
+    # Encoding is CPU-bound — run it on the default executor, off the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, generate_embeddings, texts)
+
+
+def embed_query(text: str) -> list[float]:
+    # Single-text encodes from concurrent requests share a forward pass
+    batcher = get_batcher()
+    if batcher is None:
+        return generate_embeddings([text])[0]
+    return batcher.encode(text)
+
+
+async def aembed_query(text: str) -> list[float]:
+    batcher = get_batcher()
+    if batcher is None:
+        return (await agenerate_embeddings([text]))[0]
+    return await batcher.aencode(text)
+
+
+def cache_stats() -> dict | None:
+    cache = get_cache()
+    return cache.stats() if cache is not None else None
@@ -0,0 +1,95 @@
+# Parse + chunk, kept free of model/DB imports so it can run in worker processes
+import json
+import time
+from typing import Iterable, Iterator
+
+from rag.parsers.pdf import iter_pdf_pages
+from rag.parsers.docx import iter_docx_pages
+from rag.parsers.txt import iter_txt_pages
+from rag.chunker import iter_chunks
+
+# Each parser takes a file path or bytes and yields (page_number, text)
+SUPPORTED_TYPES = {
+    "application/pdf": iter_pdf_pages,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": iter_docx_pages,
+    "text/plain": iter_txt_pages,
+}
+
+
+def _timed(pages: Iterable, timings: dict) -> Iterator:
+    # Parsing and chunking are interleaved; time spent inside the parser is
+    # summed here so the two can be reported separately
+    pages = iter(pages)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(pages)
+        except StopIteration:
+            return
+        finally:
+            timings["parse"] += time.perf_counter() - start
+        yield item
+
+
+def iter_document_chunks(
+    source: str | bytes, mime_type: str, timings: dict | None = None
+) -> Iterator[tuple[str, int | None]]:
+    # Step 1 — pick the right parser
+    parser = SUPPORTED_TYPES.get(mime_type)
+    if not parser:
+        raise ValueError(f"Unsupported file type: {mime_type}")
+
+    # Step 2 + 3 — extract text page by page and chunk it as it streams in
+    pages = parser(source)
+    if timings is not None:
+        timings.setdefault("parse", 0.0)
+        pages = _timed(pages, timings)
+    return iter_chunks(pages)
+
+
+def extract_chunks(
+    source: str | bytes, mime_type: str, timings: dict | None = None
+) -> tuple[list[str], list[int | None]]:
+    start = time.perf_counter()
+    chunks, pages = [], []
+    for chunk, page in iter_document_chunks(source, mime_type, timings):
+        chunks.append(chunk)
+        pages.append(page)
+    if not chunks:
+        raise ValueError("No chunks produced from document")
+    if timings is not None:
+        timings["chunk"] = time.perf_counter() - start - timings["parse"]
+    return chunks, pages
+
+
+def spool_chunks(path: str, mime_type: str, out_path: str, timings: dict | None = None) -> int:
+    """Chunk the file at path into a JSON-lines file of [page, chunk] rows.
+
+    Used by ingest jobs: neither the file nor its chunk list is ever held in
+    memory whole, here or in the process that reads the spool back. With a
+    timings dict, seconds spent parsing and chunking are added to it.
+    """
+    start = time.perf_counter()
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for chunk, page in iter_document_chunks(path, mime_type, timings):
+            out.write(json.dumps([page, chunk]) + "\n")
+            count += 1
+    if not count:
+        raise ValueError("No chunks produced from document")
+    if timings is not None:
+        timings["chunk"] = time.perf_counter() - start - timings["parse"]
+    return count
+
+
+def spool_chunks_timed(path: str, mime_type: str, out_path: str) -> tuple[int, dict]:
+    # For process pools, where a timings dict passed in would not come back
+    timings = {}
+    return spool_chunks(path, mime_type, out_path, timings), timings
+
+
+def read_spooled_chunks(path: str) -> Iterator[tuple[str, int | None]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            page, chunk = json.loads(line)
+            yield chunk, page
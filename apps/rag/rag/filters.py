@@ -0,0 +1,91 @@
+"""Metadata filters for chunk search.
+
+Filters are a plain dict (built from QueryFilters in routers/query.py) with
+any of: document_ids, mime_types, source_filenames, tags (matches any),
+modified_after, modified_before, page_from, page_to. Chunk-level predicates
+go straight onto rag.embeddings; document-level ones become a subquery on
+rag.documents, which carries the supporting indexes. Naive modified_*
+bounds are taken as UTC on every backend.
+"""
+from datetime import datetime, timezone
+
+
+def as_utc(value: datetime | None) -> datetime | None:
+    # Naive values are UTC; comparing naive with aware raises TypeError
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def filter_sql(filters: dict | None, alias: str = "e") -> tuple[str, dict]:
+    """SQL condition (psycopg2 named params) restricting rows of rag.embeddings."""
+    filters = filters or {}
+    chunk_conditions = []
+    doc_conditions = []
+    params = {}
+
+    if filters.get("document_ids"):
+        chunk_conditions.append(f"{alias}.document_id = ANY(%(f_document_ids)s)")
+        params["f_document_ids"] = list(filters["document_ids"])
+    if filters.get("page_from") is not None:
+        chunk_conditions.append(f"{alias}.page_number >= %(f_page_from)s")
+        params["f_page_from"] = filters["page_from"]
+    if filters.get("page_to") is not None:
+        chunk_conditions.append(f"{alias}.page_number <= %(f_page_to)s")
+        params["f_page_to"] = filters["page_to"]
+
+    if filters.get("mime_types"):
+        doc_conditions.append("d.mime_type = ANY(%(f_mime_types)s)")
+        params["f_mime_types"] = list(filters["mime_types"])
+    if filters.get("source_filenames"):
+        doc_conditions.append("d.source_filename = ANY(%(f_source_filenames)s)")
+        params["f_source_filenames"] = list(filters["source_filenames"])
+    if filters.get("tags"):
+        doc_conditions.append("d.tags && %(f_tags)s::text[]")
+        params["f_tags"] = list(filters["tags"])
+    if filters.get("modified_after"):
+        doc_conditions.append("d.drive_modified_at >= %(f_modified_after)s")
+        params["f_modified_after"] = as_utc(filters["modified_after"])
+    if filters.get("modified_before"):
+        doc_conditions.append("d.drive_modified_at < %(f_modified_before)s")
+        params["f_modified_before"] = as_utc(filters["modified_before"])
+
+    if doc_conditions:
+        chunk_conditions.append(
+            f"{alias}.document_id IN (SELECT d.document_id FROM rag.documents d WHERE "
+            + " AND ".join(doc_conditions) + ")"
+        )
+    return (" AND ".join(chunk_conditions) or "TRUE"), params
+
+
+def document_matches(metadata: dict, filters: dict | None) -> bool:
+    # Python mirror of the rag.documents predicates, for in-memory backends
+    filters = filters or {}
+    if filters.get("mime_types") and metadata.get("mime_type") not in filters["mime_types"]:
+        return False
+    if filters.get("source_filenames") and metadata.get("source_filename") not in filters["source_filenames"]:
+        return False
+    if filters.get("tags") and not set(filters["tags"]) & set(metadata.get("tags") or []):
+        return False
+    modified = as_utc(metadata.get("drive_modified_at"))
+    if filters.get("modified_after") and (modified is None or modified < as_utc(filters["modified_after"])):
+        return False
+    if filters.get("modified_before") and (modified is None or modified >= as_utc(filters["modified_before"])):
+        return False
+    return True
+
+
+def chunk_matches(document_id: str, page_number: int | None, filters: dict | None) -> bool:
+    filters = filters or {}
+    if filters.get("document_ids") and document_id not in filters["document_ids"]:
+        return False
+    if filters.get("page_from") is not None and (page_number is None or page_number < filters["page_from"]):
+        return False
+    if filters.get("page_to") is not None and (page_number is None or page_number > filters["page_to"]):
+        return False
+    return True
+
+
+def parse_drive_time(value: str | None) -> datetime | None:
+    # Drive returns RFC 3339 with a trailing Z
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
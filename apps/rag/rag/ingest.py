@@ -1,40 +1,154 @@
-from rag.parsers.pdf import parse_pdf
-from rag.parsers.docx import parse_docx
-from rag.parsers.txt import parse_txt
-from rag.chunker import get_chunks
+import time
+from collections import defaultdict
+from typing import Callable, Iterable
+
+import numpy as np
+
+from core.config import settings
+from rag.chunker import hash_chunk
 from rag.embeddings import generate_embeddings
-from rag.vector_store import save_chunks
+from rag.extract import extract_chunks
+from rag.metrics import ingest_stage, observe_ingest_stage
+from rag.vector_store import apply_chunk_diff, get_chunk_hashes
+
+
+def plan_chunk_diff(
+    existing: list[tuple[int, int, str | None, int | None]],
+    hashes: list[str],
+    pages: list[int | None],
+) -> tuple[list[int], list[tuple[int, int, int | None]], list[int]]:
+    """Match new chunk hashes against stored rows.
+
+    Returns (indexes of chunks that need embedding, (row id, chunk_index,
+    page_number) for kept rows whose position changed, row ids to delete).
+    Duplicate chunks are matched one-to-one, so a paragraph repeated twice
+    keeps two rows.
+    """
+    available = defaultdict(list)
+    delete_ids = []
+    for row_id, chunk_index, content_hash, page_number in sorted(existing, key=lambda r: r[1]):
+        if content_hash is None:
+            delete_ids.append(row_id)
+        else:
+            available[content_hash].append((row_id, chunk_index, page_number))
+
+    to_embed = []
+    reindex = []
+    for idx, (content_hash, page) in enumerate(zip(hashes, pages)):
+        if available[content_hash]:
+            row_id, old_index, old_page = available[content_hash].pop(0)
+            if (old_index, old_page) != (idx, page):
+                reindex.append((row_id, idx, page))
+        else:
+            to_embed.append(idx)
+
+    delete_ids.extend(row_id for rows in available.values() for row_id, _, _ in rows)
+    return to_embed, reindex, delete_ids
+
+
+def embed_chunks(read_chunks: Callable[[], Iterable[tuple[str, int | None]]], wanted: list[int]) -> np.ndarray:
+    """Embed the chunks at the `wanted` indexes, in INGEST_EMBED_BATCH_SIZE batches.
 
-SUPPORTED_TYPES = {
-    "application/pdf": parse_pdf,
-    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": parse_docx,
-    "text/plain": parse_txt,
-}
+    Vectors go into one float32 matrix (~1.5 KB per chunk at 384 dims);
+    chunk texts are not kept and are re-read when the rows are written.
+    """
+    wanted_set = set(wanted)
+    vectors = None
+    filled = 0
+    batch = []
 
-def ingest_file(file_bytes: bytes, mime_type: str, document_id: str) -> dict:
-    # Step 1 — pick the right parser
-    parser = SUPPORTED_TYPES.get(mime_type)
-    if not parser:
-        raise ValueError(f"Unsupported file type: {mime_type}")
+    def flush():
+        nonlocal vectors, filled
+        embedded = np.asarray(generate_embeddings(batch), dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((len(wanted), embedded.shape[1]), dtype=np.float32)
+        vectors[filled:filled + len(embedded)] = embedded
+        filled += len(embedded)
+        batch.clear()
 
-    # Step 2 — extract text
-    text = parser(file_bytes)
-    if not text:
-        raise ValueError("File appears to be empty or unreadable")
+    for idx, (chunk, _) in enumerate(read_chunks()):
+        if idx in wanted_set:
+            batch.append(chunk)
+            if len(batch) == settings.ingest_embed_batch_size:
+                flush()
+    if batch:
+        flush()
+    return vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)
 
-    # Step 3 — chunk
-    chunks = get_chunks(text)
-    if not chunks:
-        raise ValueError("No chunks produced from document")
 
-    # Step 4 — embed
-    embeddings = generate_embeddings(chunks)
+def ingest_stream(
+    document_id: str,
+    read_chunks: Callable[[], Iterable[tuple[str, int | None]]],
+    on_stage: Callable[[str, dict], None] | None = None,
+    metadata: dict | None = None,
+) -> dict:
+    """Ingest a document whose (chunk, page_number) stream can be re-read.
 
-    # Step 5 — save to pgvector
-    save_chunks(document_id, chunks, embeddings)
+    The first pass keeps only hashes and pages for the diff, the second
+    embeds new chunks in bounded batches, and the third re-reads the chunks
+    while writing them, so only the compact vector matrix grows with
+    document size.
+    """
+    report = on_stage or (lambda stage, info: None)
+
+    # Step 4 — diff against what is already stored, embed only new/changed chunks
+    with ingest_stage("diff"):
+        hashes, pages = [], []
+        for chunk, page in read_chunks():
+            hashes.append(hash_chunk(chunk))
+            pages.append(page)
+        if not hashes:
+            raise ValueError("No chunks produced from document")
+        to_embed, reindex, delete_ids = plan_chunk_diff(get_chunk_hashes(document_id), hashes, pages)
+    report("embed", {"chunks": len(hashes), "to_embed": len(to_embed)})
+
+    # Step 5 — embed before the write transaction opens, so the pooled
+    # connection (and the rag.corpus_stats row lock migration 005's triggers
+    # take) is held only for the writes, not for minutes of model time
+    start = time.perf_counter()
+    vectors = embed_chunks(read_chunks, to_embed)
+    observe_ingest_stage("embed", time.perf_counter() - start)
+
+    def insert_rows():
+        # to_embed is in chunk order, so the n-th wanted chunk owns vectors[n]
+        position = {idx: n for n, idx in enumerate(to_embed)}
+        for idx, (chunk, page) in enumerate(read_chunks()):
+            n = position.get(idx)
+            if n is not None:
+                yield idx, chunk, hashes[idx], vectors[n], page
+
+    # Step 6 — apply the diff to pgvector in one short transaction
+    report("save", {})
+    start = time.perf_counter()
+    write_stats = apply_chunk_diff(document_id, insert_rows(), reindex, delete_ids, metadata=metadata)
+    observe_ingest_stage("save", time.perf_counter() - start)
 
     return {
         "document_id": document_id,
-        "chunks": len(chunks),
+        "chunks": len(hashes),
+        "embedded": len(to_embed),
+        "kept": len(hashes) - len(to_embed),
+        "deleted": len(delete_ids),
+        "rows_per_sec": write_stats["rows_per_sec"],
         "status": "done"
-    }
\ No newline at end of file
+    }
+
+
+def ingest_chunks(
+    document_id: str,
+    chunks: list[str],
+    on_stage: Callable[[str, dict], None] | None = None,
+    metadata: dict | None = None,
+    pages: list[int | None] | None = None,
+) -> dict:
+    pages = pages or [None] * len(chunks)
+    return ingest_stream(document_id, lambda: zip(chunks, pages), on_stage=on_stage, metadata=metadata)
+
+
+def ingest_file(file_bytes: bytes, mime_type: str, document_id: str, metadata: dict | None = None) -> dict:
+    metadata = {"mime_type": mime_type, **(metadata or {})}
+    timings = {}
+    chunks, pages = extract_chunks(file_bytes, mime_type, timings)
+    observe_ingest_stage("parse", timings["parse"])
+    observe_ingest_stage("chunk", timings["chunk"])
+    return ingest_chunks(document_id, chunks, metadata=metadata, pages=pages)
@@ -0,0 +1,306 @@
+"""Booking intent detection and slot extraction with precompiled patterns.
+
+is_booking_intent() decides whether a message goes down the booking path.
+extract_booking() fills the create_booking slots (room, date, start/end
+time, reason) straight from the message. When every slot is found, the
+message names exactly one room, date and time range, it is a plain request
+for one booking (no cancel/negation, alternative or recurring wording) and
+the slot is not in the past, the query path returns the booking request
+without an LLM call. Everything else still goes to the LLM with the
+booking tool.
+
+Everything is compiled once at import, except the room-name pattern, which
+comes from the cached room catalogue (see rag/rooms.py).
+"""
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+from rag.rooms import RoomCatalogue
+
+REQUIRED_SLOTS = ["room_name", "date", "start_time", "end_time", "reason"]
+
+# "book" as a verb — not "textbook", "the book", "which book ..."
+BOOKING_INTENT = re.compile(
+    r"(?<!\bthe )(?<!\ba )(?<!\bany )(?<!\bwhich )(?<!\bthis )(?<!\breference )\bbook(?:ing)?\b"
+    r"|\breserv(?:e|ation)\b"
+    r"|(?:^|\b(?:to|i|please|can|could|pls)\s+)schedule\b",
+    re.IGNORECASE,
+)
+
+# Skipping the LLM needs an explicit request to book: an imperative at the
+# start ("book ...", "hi, please reserve ..."), "can/could I/you book",
+# "I'd like/want/need to book" or "booking request/for"
+DIRECT_REQUEST = re.compile(
+    r"^\W*(?:(?:hi|hey|hello)\b\W*)?(?:(?:please|pls|kindly)\s+)?(?:book|reserve|schedule)\b"
+    r"|\b(?:can|could|may|would)\s+(?:i|we|you)\s+(?:please\s+)?(?:book|reserve|schedule)\b"
+    r"|\b(?:like|want|need|wish)\s+to\s+(?:book|reserve|schedule)\b"
+    r"|\b(?:please|pls|kindly)\s+(?:book|reserve|schedule)\b"
+    r"|^\W*booking\s+(?:request|for)\b",
+    re.IGNORECASE,
+)
+# ...and nothing that turns it into a cancellation, an edit or a refusal
+NOT_A_REQUEST = re.compile(
+    r"\b(?:cancel\w*|unbook\w*|delete|remove|reschedul\w*|postpone|change|modify|move|shift|undo|release"
+    r"|not|cannot|never|no\s+longer|instead|(?:do|does|did|would|wo|should|ca)n['’]?t)\b",
+    re.IGNORECASE,
+)
+# ...and nothing that makes it several bookings, a recurring one or a conditional one
+NOT_ONE_BOOKING = re.compile(
+    r"\b(?:or|either|if|unless|otherwise|alternatively|every|each|daily|weekly|monthly|weekdays"
+    r"|recurring|repeat\w*|also|as\s+well|plus)\b",
+    re.IGNORECASE,
+)
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = {
+    name: i + 1
+    for i, names in enumerate([
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"),
+        ("may",), ("june", "jun"), ("july", "jul"), ("august", "aug"),
+        ("september", "sept", "sep"), ("october", "oct"), ("november", "nov"), ("december", "dec"),
+    ])
+    for name in names
+}
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+# One alternation, one named group per form — the first form to match wins
+DATE = re.compile(
+    r"\b(?:"
+    r"(?P<after_tomorrow>day\s+after\s+tomorrow)"
+    r"|(?P<today>today|tonight)"
+    r"|(?P<tomorrow>tomorrow|tmrw|tmr)"
+    r"|(?:(?P<modifier>this|next|coming|on)\s+)?(?P<weekday>" + "|".join(WEEKDAYS) + r")"
+    r"|(?P<iso>\d{4}-\d{2}-\d{2})"
+    r"|(?P<dm_day>\d{1,2})[/.](?P<dm_month>\d{1,2})(?:[/.](?P<dm_year>\d{2}|\d{4}))?"
+    r"|(?P<dmy_day>\d{1,2})" + _ORDINAL + r"\s+(?:of\s+)?(?P<dmy_month>" + _MONTH + r")\.?(?:,?\s+(?P<dmy_year>\d{4}))?"
+    r"|(?P<mdy_month>" + _MONTH + r")\.?\s+(?P<mdy_day>\d{1,2})" + _ORDINAL + r"(?:,?\s+(?P<mdy_year>\d{4}))?"
+    r")\b",
+    re.IGNORECASE,
+)
+
+_CLOCK = r"(?:\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|\d{1,2}:\d{2}|noon|midday)"
+_CLOCK_LOOSE = r"(?:\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)?|noon|midday)"
+# "2pm to 4pm", "2 - 4pm", "14:00-16:00", "from 11 till noon"; at least the
+# end needs am/pm or a colon, so "2-4" or "10-18" alone is not a time
+TIME_RANGE = re.compile(
+    r"(?<![\d/:.-])(?:(?:from|between)\s+)?(?P<start>" + _CLOCK_LOOSE + r")"
+    r"\s*(?:-|–|to|till|until|and)\s*(?P<end>" + _CLOCK + r")(?![\w:])",
+    re.IGNORECASE,
+)
+CLOCK = re.compile(r"^(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>[ap])?", re.IGNORECASE)
+
+# Looser hints used to spot slots the LLM may have invented
+TIME_HINT = re.compile(_CLOCK + r"|\bo'?clock\b|\b(?:morning|afternoon|evening)\b", re.IGNORECASE)
+DATE_HINT = re.compile(
+    DATE.pattern + r"|\b(?:" + "|".join(m for m in MONTHS if m != "may") + r")\b",  # "may I book ..."
+    re.IGNORECASE,
+)
+
+REASON = re.compile(r"\b(?:for|because(?:\s+of)?|reason\s*:|purpose\s*:)\s*", re.IGNORECASE)
+DURATION = re.compile(r"^(?:an?|\d+(?:\.\d+)?)\s*(?:hours?|hrs?|h|minutes?|mins?)\b", re.IGNORECASE)
+REASON_FILLER = re.compile(r"^(?:the\s+(?:purpose|reason)\s+(?:of|is)\s+)?", re.IGNORECASE)
+# Politeness, and prepositions left dangling where a date/time was cut out
+REASON_TRAILER = re.compile(
+    r"(?:[\s,]+(?:please|pls|thanks|thank\s+you|on|at|from|between|in|this|next))+$", re.IGNORECASE
+)
+REASON_STOPWORDS = {"a", "an", "the", "my", "our", "me", "us", "it", "this", "that", "please", "pls"}
+
+_counter_lock = threading.Lock()
+_counters = {"routed": 0, "llm_skipped": 0}
+
+
+def is_booking_intent(message: str) -> bool:
+    # Substring pre-check first: most chat messages are questions and never reach the regex
+    msg = message.lower()
+    if "book" not in msg and "reserv" not in msg and "schedule" not in msg:
+        return False
+    return BOOKING_INTENT.search(message) is not None
+
+
+def mentions_time(message: str) -> bool:
+    return TIME_HINT.search(message) is not None
+
+
+def mentions_date(message: str) -> bool:
+    return DATE_HINT.search(message) is not None
+
+
+def _year_for(month: int, day: int, today: date) -> int:
+    # A date without a year means the next one on or after today
+    try:
+        return today.year if date(today.year, month, day) >= today else today.year + 1
+    except ValueError:
+        return today.year
+
+
+def _resolve_date(match: re.Match, today: date) -> date | None:
+    g = match.groupdict()
+    try:
+        if g["after_tomorrow"]:
+            return today + timedelta(days=2)
+        if g["today"]:
+            return today
+        if g["tomorrow"]:
+            return today + timedelta(days=1)
+        if g["weekday"]:
+            ahead = (WEEKDAYS.index(g["weekday"].lower()) - today.weekday()) % 7
+            if ahead == 0 and (g["modifier"] or "").lower() == "next":
+                ahead = 7
+            return today + timedelta(days=ahead)
+        if g["iso"]:
+            return date.fromisoformat(g["iso"])
+        if g["dm_day"]:
+            day, month = int(g["dm_day"]), int(g["dm_month"])
+            year = g["dm_year"]
+            year = (2000 + int(year) if len(year) == 2 else int(year)) if year else _year_for(month, day, today)
+            return date(year, month, day)
+        day = g["dmy_day"] or g["mdy_day"]
+        month = MONTHS[(g["dmy_month"] or g["mdy_month"]).lower().rstrip(".")]
+        year = g["dmy_year"] or g["mdy_year"]
+        return date(int(year) if year else _year_for(month, int(day), today), month, int(day))
+    except ValueError:
+        return None  # e.g. 31/02
+
+
+def _clock(text: str) -> tuple[int, int, str | None] | None:
+    text = text.strip().lower()
+    if text in ("noon", "midday"):
+        return 12, 0, "p"
+    m = CLOCK.match(text)
+    if not m:
+        return None
+    hour, minute = int(m["hour"]), int(m["minute"] or 0)
+    meridiem = m["meridiem"].lower() if m["meridiem"] else None
+    if minute > 59 or hour > 23 or (meridiem and not 1 <= hour <= 12):
+        return None
+    return hour, minute, meridiem
+
+
+def _to_24h(hour: int, minute: int, meridiem: str | None) -> int:
+    if meridiem == "a":
+        hour = 0 if hour == 12 else hour
+    elif meridiem == "p":
+        hour = hour if hour == 12 else hour + 12
+    return hour * 60 + minute
+
+
+def _resolve_times(match: re.Match) -> tuple[str, str] | None:
+    start, end = _clock(match["start"]), _clock(match["end"])
+    if start is None or end is None:
+        return None
+    end_minutes = _to_24h(*end)
+    if start[2] is None and end[2] is not None and start[0] <= 12:
+        # "2 to 4pm" — the start shares the end's am/pm unless that puts it after the end ("11 to 1pm")
+        shared = _to_24h(start[0], start[1], end[2])
+        start_minutes = shared if shared < end_minutes else _to_24h(start[0], start[1], "a")
+    else:
+        start_minutes = _to_24h(*start)
+    if start_minutes >= end_minutes:
+        return None
+    return tuple(f"{m // 60:02d}:{m % 60:02d}" for m in (start_minutes, end_minutes))
+
+
+def _reason(message: str, spans: list[tuple[int, int]]) -> str | None:
+    # Blank out the room/date/time text, then take what follows "for"/"because"
+    chars = list(message)
+    for start, end in spans:
+        chars[start:end] = "\0" * (end - start)
+    masked = "".join(chars)
+    for m in REASON.finditer(masked):
+        text = masked[m.end():].split("\0", 1)[0]
+        text = text.strip(" \t\n,.;:!?")
+        text = REASON_TRAILER.sub("", REASON_FILLER.sub("", text)).strip(" \t\n,.;:!?")
+        if not text or DURATION.match(text):
+            continue
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        if any(len(w) > 1 and w not in REASON_STOPWORDS for w in words):
+            return text
+    return None
+
+
+def _extract(message: str, catalogue: RoomCatalogue, today: date) -> tuple[dict, dict[str, int]]:
+    # Params from the first room/date/time found, plus how many distinct ones the
+    # message names; every match is masked out of the reason
+    params = dict.fromkeys(REQUIRED_SLOTS)
+    spans = []
+    found = {"rooms": set(), "dates": set(), "times": set()}
+
+    for m in catalogue.finditer(message):
+        room = catalogue.resolve(m.group())
+        if room is None:
+            continue
+        if params["room_name"] is None:
+            params["room_name"] = room["name"]
+        spans.append(m.span())
+        found["rooms"].add(room["name"])
+
+    for m in DATE.finditer(message):
+        resolved = _resolve_date(m, today)
+        if resolved is None:
+            found["dates"].add(m.group().lower())  # Unreadable ("31/02") still counts as another date
+            continue
+        if params["date"] is None:
+            params["date"] = resolved.isoformat()
+        spans.append(m.span())
+        found["dates"].add(resolved)
+
+    for m in TIME_RANGE.finditer(message):
+        times = _resolve_times(m)
+        if times is None:
+            continue
+        if params["start_time"] is None:
+            params["start_time"], params["end_time"] = times
+        spans.append(m.span())
+        found["times"].add(times)
+
+    params["reason"] = _reason(message, spans)
+    return params, {k: len(v) for k, v in found.items()}
+
+
+def extract_booking(message: str, catalogue: RoomCatalogue, today: date | None = None) -> dict:
+    """Return create_booking params; slots that were not found are None."""
+    return _extract(message, catalogue, today or date.today())[0]
+
+
+def missing_slots(params: dict) -> list[str]:
+    return [slot for slot in REQUIRED_SLOTS if not params.get(slot)]
+
+
+def direct_booking(message: str, catalogue: RoomCatalogue, now: datetime | None = None) -> dict | None:
+    """create_booking params when the message can skip the LLM, else None."""
+    now = now or datetime.now()
+    params, found = _extract(message, catalogue, now.date())
+    if missing_slots(params):
+        return None
+    if not DIRECT_REQUEST.search(message) or NOT_A_REQUEST.search(message) or NOT_ONE_BOOKING.search(message):
+        return None
+    # Exactly one room, one date and one time range — otherwise the first match would win silently
+    if any(n != 1 for n in found.values()):
+        return None
+    # A past slot is left to the LLM, which can tell the user why it cannot be booked
+    today = now.date().isoformat()
+    if params["date"] < today or (params["date"] == today and params["start_time"] <= now.strftime("%H:%M")):
+        return None
+    return params
+
+
+def route_booking(message: str, catalogue: RoomCatalogue) -> dict | None:
+    """Return a booking_request when the message can skip the LLM, else None (ask the LLM)."""
+    params = direct_booking(message, catalogue)
+    with _counter_lock:
+        _counters["routed"] += 1
+        _counters["llm_skipped"] += params is not None
+    if params is None:
+        return None
+    return {"type": "booking_request", "params": params}
+
+
+def booking_router_stats() -> dict:
+    with _counter_lock:
+        routed = _counters["routed"]
+        return {
+            **_counters,
+            "llm_skipped_rate": round(_counters["llm_skipped"] / routed, 3) if routed else 0.0,
+        }
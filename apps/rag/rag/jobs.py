@@ -0,0 +1,426 @@
+"""Background ingestion jobs.
+
+Endpoints enqueue work and return a job id; a bounded pool of worker threads
+runs the jobs. Parsing and chunking go to a process pool, while embedding and
+DB writes stay in this process so the model is loaded once. The queue lives
+in SQLite and uploads are spooled to disk, so pending jobs survive restarts.
+
+Several processes (uvicorn workers, restarts overlapping) can share the
+queue. A job is claimed in one UPDATE ... RETURNING, never twice; running
+jobs carry their owner and a heartbeat, and only jobs whose heartbeat went
+stale (owner died) are requeued. Jobs for the same document run one at a
+time, in order.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import BinaryIO
+
+from core.config import settings
+from rag.metrics import INGEST_JOBS
+from rag.vector_index import schedule_check
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    document_id  TEXT,
+    mime_type    TEXT,
+    payload_path TEXT,
+    metadata     TEXT,
+    status       TEXT NOT NULL,
+    stage        TEXT NOT NULL,
+    progress     TEXT NOT NULL DEFAULT '{}',
+    timings      TEXT NOT NULL DEFAULT '{}',
+    result       TEXT,
+    error        TEXT,
+    created_at   REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL,
+    owner        TEXT,
+    heartbeat_at REAL
+)
+"""
+
+# Oldest queued job whose document has no job running (sync jobs, with no
+# document, are serialised with each other), taken in the same statement
+_CLAIM_SQL = """
+UPDATE ingest_jobs
+SET status = 'running', owner = :owner, started_at = :now, heartbeat_at = :now
+WHERE status = 'queued' AND id = (
+    SELECT q.id FROM ingest_jobs q
+    WHERE q.status = 'queued' AND NOT EXISTS (
+        SELECT 1 FROM ingest_jobs r
+        WHERE r.status = 'running' AND COALESCE(r.document_id, r.kind) = COALESCE(q.document_id, q.kind)
+    )
+    ORDER BY q.created_at
+    LIMIT 1
+)
+RETURNING *
+"""
+
+
+class JobStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(_SCHEMA)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(ingest_jobs)")}
+            if "metadata" not in columns:
+                self._db.execute("ALTER TABLE ingest_jobs ADD COLUMN metadata TEXT")
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE ingest_jobs ADD COLUMN owner TEXT")
+                self._db.execute("ALTER TABLE ingest_jobs ADD COLUMN heartbeat_at REAL")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status, created_at)")
+            self._db.commit()
+
+    def create(self, kind: str, document_id: str | None = None, mime_type: str | None = None,
+               payload_path: str | None = None, metadata: dict | None = None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO ingest_jobs "
+                "(id, kind, document_id, mime_type, payload_path, metadata, status, stage, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', 'queued', ?)",
+                (job_id, kind, document_id, mime_type, payload_path,
+                 json.dumps(metadata) if metadata else None, time.time()),
+            )
+            self._db.commit()
+        return job_id
+
+    def claim(self, owner: str) -> dict | None:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so the pick and the
+            # update see the same queue even with other processes claiming
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(_CLAIM_SQL, {"owner": owner, "now": time.time()}).fetchone()
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            return dict(row) if row else None
+
+    def heartbeat(self, owner: str) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE ingest_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                (time.time(), owner),
+            )
+            self._db.commit()
+            return cur.rowcount
+
+    def update(self, job_id: str, **fields):
+        for key in ("progress", "timings", "result"):
+            if key in fields and not isinstance(fields[key], str):
+                fields[key] = json.dumps(fields[key])
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE ingest_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def requeue_stale(self, stale_after: float) -> int:
+        # Jobs whose owner stopped heartbeating died mid-flight and start over;
+        # jobs of live processes (this one or others) are left alone
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE ingest_jobs SET status = 'queued', stage = 'queued', owner = NULL, heartbeat_at = NULL "
+                "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (time.time() - stale_after,),
+            )
+            self._db.commit()
+            return cur.rowcount
+
+
+_store: JobStore | None = None
+_store_lock = threading.Lock()
+_parse_pool: ProcessPoolExecutor | None = None
+_parse_pool_lock = threading.Lock()
+_workers: list[threading.Thread] = []
+_owner: str | None = None  # Set per process in start_workers, after any fork
+_wakeup = threading.Event()
+_stopping = threading.Event()
+
+
+def get_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore(settings.ingest_jobs_path)
+    return _store
+
+
+def enqueue_file(file: BinaryIO, mime_type: str, document_id: str, metadata: dict | None = None) -> str:
+    # Spool the upload to disk in chunks instead of holding it in memory
+    os.makedirs(settings.ingest_spool_dir, exist_ok=True)
+    payload_path = os.path.join(settings.ingest_spool_dir, f"{uuid.uuid4().hex}.upload")
+    with open(payload_path, "wb") as out:
+        shutil.copyfileobj(file, out, length=1024 * 1024)
+    job_id = get_store().create(
+        "file", document_id=document_id, mime_type=mime_type, payload_path=payload_path, metadata=metadata
+    )
+    _wakeup.set()
+    return job_id
+
+
+def enqueue_sync() -> str:
+    job_id = get_store().create("sync")
+    _wakeup.set()
+    return job_id
+
+
+def _iso(ts: float | None) -> str | None:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if ts else None
+
+
+def get_job(job_id: str) -> dict | None:
+    job = get_store().get(job_id)
+    if job is None:
+        return None
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "document_id": job["document_id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": json.loads(job["progress"]),
+        "timings": json.loads(job["timings"]),
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+        "owner": job["owner"],
+        "created_at": _iso(job["created_at"]),
+        "started_at": _iso(job["started_at"]),
+        "finished_at": _iso(job["finished_at"]),
+    }
+
+
+def _mark_document(document_id: str, status: str, error: str | None = None):
+    # Uploads use the web app's Document id — keep its ingestionStatus in step.
+    # Drive files use Drive ids, which match no row, so this is a no-op there.
+    from db.session import get_connection, release_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE "Document"
+            SET "ingestionStatus" = %s,
+                "errorMessage" = %s,
+                "ingestedAt" = CASE WHEN %s = 'DONE' THEN now() ELSE "ingestedAt" END
+            WHERE id = %s
+            """,
+            (status, error[:500] if error else None, status, document_id),
+        )
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        logger.exception("Could not update Document %s to %s", document_id, status)
+    finally:
+        release_connection(conn)
+
+
+class _StageTimer:
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.progress = {}
+        self.timings = {}
+        self._stage = None
+        self._started = time.perf_counter()
+
+    def __call__(self, stage: str, info: dict | None = None):
+        now = time.perf_counter()
+        if self._stage:
+            self.timings[self._stage] = round(now - self._started, 3)
+        self._stage, self._started = stage, now
+        self.progress.update(info or {})
+        self.store.update(self.job_id, stage=stage, progress=self.progress, timings=self.timings)
+
+
+def _new_parse_pool() -> ProcessPoolExecutor:
+    # spawn keeps the children free of this process's threads and loaded model
+    return ProcessPoolExecutor(
+        max_workers=settings.ingest_parse_processes,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def _parse(*args):
+    # A child that dies (OOM, a crash in the PDF library) breaks the whole
+    # pool; replace it so later jobs still run, and give this one a retry
+    global _parse_pool
+    for attempt in range(2):
+        pool = _parse_pool
+        if pool is None:
+            raise RuntimeError("Ingest workers are stopping")
+        try:
+            return pool.submit(*args).result()
+        except BrokenProcessPool:
+            with _parse_pool_lock:
+                if _parse_pool is pool and not _stopping.is_set():
+                    logger.warning("Parse process pool broke; starting a new one")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    _parse_pool = _new_parse_pool()
+            if attempt:
+                raise
+
+
+def _run_file_job(job: dict, timer: _StageTimer) -> dict:
+    from rag.extract import read_spooled_chunks, spool_chunks_timed
+    from rag.ingest import ingest_stream
+    from rag.metrics import observe_ingest_stage
+
+    _mark_document(job["document_id"], "PROCESSING")
+    # The parse process streams pages from the spooled upload and writes chunks
+    # to a second spool file, which the embed stage reads back in batches
+    timer("parse")
+    chunks_path = job["payload_path"] + ".chunks"
+    count, timings = _parse(spool_chunks_timed, job["payload_path"], job["mime_type"], chunks_path)
+    observe_ingest_stage("parse", timings["parse"])
+    observe_ingest_stage("chunk", timings["chunk"])
+
+    timer("chunk", {"chunks": count})
+    metadata = {"mime_type": job["mime_type"], **json.loads(job["metadata"] or "{}")}
+    return ingest_stream(
+        job["document_id"], lambda: read_spooled_chunks(chunks_path), on_stage=timer, metadata=metadata
+    )
+
+
+def _run_sync_job(job: dict, timer: _StageTimer) -> dict:
+    from rag.drive_sync import sync_drive_folder
+
+    timer("sync")
+    return sync_drive_folder()
+
+
+def _run_job(job: dict):
+    store = get_store()
+    timer = _StageTimer(store, job["id"])
+    try:
+        if job["kind"] == "file":
+            result = _run_file_job(job, timer)
+        else:
+            result = _run_sync_job(job, timer)
+        timer("done")
+        INGEST_JOBS.labels(job["kind"], "done").inc()
+        store.update(job["id"], status="done", result=result, finished_at=time.time())
+        if job["kind"] == "file":
+            _mark_document(job["document_id"], "DONE")
+        schedule_check()  # Rebuilds the vector index in the background once the table has grown enough
+    except Exception as e:
+        logger.exception("Ingest job %s failed", job["id"])
+        timer("failed")
+        INGEST_JOBS.labels(job["kind"], "failed").inc()
+        store.update(job["id"], status="failed", error=str(e), finished_at=time.time())
+        if job["kind"] == "file":
+            _mark_document(job["document_id"], "FAILED", f"Ingestion failed: {e}")
+    finally:
+        if job["payload_path"]:
+            for path in (job["payload_path"], job["payload_path"] + ".chunks"):
+                if os.path.exists(path):
+                    os.remove(path)
+        _wakeup.set()  # A queued job for the same document may be claimable now
+
+
+def _worker_loop():
+    store = get_store()
+    backoff = 1.0
+    while not _stopping.is_set():
+        job = None
+        try:
+            job = store.claim(_owner)
+            if job is None:
+                _wakeup.wait(timeout=1.0)
+                _wakeup.clear()
+                continue
+            _run_job(job)
+            backoff = 1.0
+        except Exception:
+            # e.g. "database is locked" with several processes on the queue —
+            # the thread must survive it or queued jobs wait forever
+            logger.exception("Ingest worker error; retrying in %.0fs", backoff)
+            if job is not None:
+                _release(store, job)
+            _stopping.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+def _release(store: JobStore, job: dict):
+    # A job whose bookkeeping failed goes back in the queue (ingest is idempotent)
+    # unless its upload was already cleaned up; if even that fails, it goes stale
+    # once this process stops heartbeating it
+    try:
+        if job["payload_path"] and not os.path.exists(job["payload_path"]):
+            store.update(job["id"], status="failed", error="Job state was lost", finished_at=time.time())
+        else:
+            store.update(job["id"], status="queued", stage="queued", owner=None, heartbeat_at=None)
+    except sqlite3.Error:
+        logger.exception("Could not requeue ingest job %s", job["id"])
+
+
+def _heartbeat_loop():
+    store = get_store()
+    while True:
+        try:
+            store.heartbeat(_owner)
+            requeued = store.requeue_stale(settings.ingest_job_stale_seconds)
+            if requeued:
+                logger.info("Requeued %d ingest jobs whose worker stopped heartbeating", requeued)
+                _wakeup.set()
+        except sqlite3.Error:
+            logger.exception("Ingest job heartbeat failed")
+        if _stopping.wait(settings.ingest_job_heartbeat_seconds):
+            return
+
+
+def start_workers():
+    global _parse_pool, _owner
+    if _workers:
+        return
+    _stopping.clear()
+    _owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    _parse_pool = _new_parse_pool()
+    # Heartbeat first: it also requeues jobs left running by a dead process
+    heartbeat = threading.Thread(target=_heartbeat_loop, name="ingest-heartbeat", daemon=True)
+    heartbeat.start()
+    _workers.append(heartbeat)
+    for i in range(settings.ingest_workers):
+        t = threading.Thread(target=_worker_loop, name=f"ingest-worker-{i}", daemon=True)
+        t.start()
+        _workers.append(t)
+
+
+def stop_workers():
+    global _parse_pool
+    _stopping.set()
+    _wakeup.set()
+    for t in _workers:
+        t.join(timeout=5)
+    _workers.clear()
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
@@ -1,9 +1,42 @@
-from groq import Groq
 from core.config import settings
+from contextlib import aclosing
 from datetime import datetime
 import json
+import threading
+
+from rag.intent import mentions_date, mentions_time
+from rag.llm_gateway import gateway
+from rag.metrics import record_llm_usage
+from rag.rooms import RoomCatalogue
+
+# Clients are built on first use (or by the startup warm-up). Retries are
+# off in the SDK — timeouts, retries and fallbacks live in rag/llm_gateway.py
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=settings.groq_api_key, base_url=settings.llm_base_url or None, max_retries=0)
+    return _client
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from groq import AsyncGroq
+                _async_client = AsyncGroq(
+                    api_key=settings.groq_api_key, base_url=settings.llm_base_url or None, max_retries=0
+                )
+    return _async_client
 
-client = Groq(api_key=settings.groq_api_key)
 
 BOOKING_TOOL = {
     "type": "function",
@@ -40,64 +73,111 @@ BOOKING_TOOL = {
 }
 
 
+def _answer_messages(prompt: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a helpful academic assistant for the CS department at BITS Goa. "
+                "Answer questions using the provided context. "
+                "If the context is not enough, use your general knowledge. "
+                "Always be concise and accurate."
+            )
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
 def call_groq(prompt: str) -> str:
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful academic assistant for the CS department at BITS Goa. "
-                    "Answer questions using the provided context. "
-                    "If the context is not enough, use your general knowledge. "
-                    "Always be concise and accurate."
-                )
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
+    response = gateway.complete(
+        get_client().chat.completions.create,
+        messages=_answer_messages(prompt),
         temperature=0.2,
         max_tokens=1024,
     )
+    record_llm_usage(response)
     return response.choices[0].message.content.strip()
 
 
-def call_groq_with_tools(message: str, rooms: list[dict]) -> dict:
-    rooms_text = "\n".join([
-        f"- {r['name']} (ID: {r['id']}, Location: {r['location']}, Capacity: {r['capacity']})"
-        for r in rooms
-    ])
-    room_names = [r["name"] for r in rooms]
-
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    f"You are a helpful academic assistant for the CS department at BITS Goa.\n"
-                    f"Today's date is {datetime.now().strftime('%A, %B %d, %Y')}.\n"
-                    f"Available rooms:\n{rooms_text}\n\n"
-                    f"If the user wants to book a room, use the create_booking tool.\n"
-                    f"Only use the tool if the user is clearly asking to make a booking.\n"
-                    f"For questions and general queries, just answer normally."
-                )
-            },
-            {
-                "role": "user",
-                "content": message
-            }
-        ],
+async def acall_groq(prompt: str) -> str:
+    response = await gateway.acomplete(
+        get_async_client().chat.completions.create,
+        messages=_answer_messages(prompt),
+        temperature=0.2,
+        max_tokens=1024,
+    )
+    record_llm_usage(response)
+    return response.choices[0].message.content.strip()
+
+
+async def astream_groq(prompt: str):
+    # Yields answer text deltas as Groq produces them
+    # aclosing: a caller that stops early closes the Groq stream now, not at GC
+    stream = gateway.astream(
+        get_async_client().chat.completions.create,
+        messages=_answer_messages(prompt),
+        temperature=0.2,
+        max_tokens=1024,
+    )
+    async with aclosing(stream):
+        async for chunk in stream:
+            record_llm_usage(chunk)  # Only the final chunk carries usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def _tools_messages(message: str, catalogue: RoomCatalogue) -> list[dict]:
+    # The room list text is built once per catalogue version, not per message
+    rooms_text = catalogue.text
+    return [
+        {
+            "role": "system",
+            "content": (
+                f"You are a helpful academic assistant for the CS department at BITS Goa.\n"
+                f"Today's date is {datetime.now().strftime('%A, %B %d, %Y')}.\n"
+                f"Available rooms:\n{rooms_text}\n\n"
+                f"If the user wants to book a room, use the create_booking tool.\n"
+                f"Only use the tool if the user is clearly asking to make a booking.\n"
+                f"For questions and general queries, just answer normally."
+            )
+        },
+        {
+            "role": "user",
+            "content": message
+        }
+    ]
+
+
+def call_groq_with_tools(message: str, catalogue: RoomCatalogue) -> dict:
+    response = gateway.complete(
+        get_client().chat.completions.create,
+        messages=_tools_messages(message, catalogue),
+        tools=[BOOKING_TOOL],
+        tool_choice="auto",
+        temperature=0.2,
+        max_tokens=1024,
+    )
+    record_llm_usage(response)
+    return _parse_tool_response(response.choices[0], message, catalogue.names)
+
+
+async def acall_groq_with_tools(message: str, catalogue: RoomCatalogue) -> dict:
+    response = await gateway.acomplete(
+        get_async_client().chat.completions.create,
+        messages=_tools_messages(message, catalogue),
         tools=[BOOKING_TOOL],
         tool_choice="auto",
         temperature=0.2,
         max_tokens=1024,
     )
+    record_llm_usage(response)
+    return _parse_tool_response(response.choices[0], message, catalogue.names)
 
-    choice = response.choices[0]
 
+def _parse_tool_response(choice, message: str, room_names: list[str]) -> dict:
     if choice.finish_reason == "tool_calls" and choice.message.tool_calls:
         tool_call = choice.message.tool_calls[0]
         if tool_call.function.name == "create_booking":
@@ -108,24 +188,14 @@ def call_groq_with_tools(message: str, rooms: list[dict]) -> dict:
             missing = [f for f in required if not params.get(f)]
 
             # Detect fabricated times — if user never mentioned a time, mark as missing
-            time_words = ["am", "pm", ":", "o'clock", "morning", "afternoon", "evening"]
-            time_mentioned = any(word in message.lower() for word in time_words)
-            if not time_mentioned:
+            if not mentions_time(message):
                 if "start_time" not in missing:
                     missing.append("start_time")
                 if "end_time" not in missing:
                     missing.append("end_time")
 
             # Detect fabricated dates — if user never mentioned a date, mark as missing
-            date_words = [
-                "today", "tomorrow", "monday", "tuesday", "wednesday",
-                "thursday", "friday", "saturday", "sunday",
-                "jan", "feb", "mar", "apr", "may", "jun",
-                "jul", "aug", "sep", "oct", "nov", "dec",
-                "/", "-", "next", "this"
-            ]
-            date_mentioned = any(word in message.lower() for word in date_words)
-            if not date_mentioned and "date" not in missing:
+            if not mentions_date(message) and "date" not in missing:
                 missing.append("date")
 
             if missing:
@@ -0,0 +1,408 @@
+"""Resilient wrapper around chat.completions.create.
+
+Every call gets an overall deadline (LLM_DEADLINE_SECONDS). Within it, the
+gateway tries each model in order: the primary (LLM_MODEL), then
+LLM_FALLBACK_MODELS. Per model:
+
+- each attempt has its own timeout, capped by the time left
+- retryable failures are retried with full-jitter backoff: 429, 408/409,
+  5xx, timeouts and connection errors. A Retry-After / retry-after-ms header
+  sets the wait instead; when that wait does not fit in the deadline, the
+  gateway moves on to the next model
+- a circuit breaker opens after LLM_BREAKER_FAILURES consecutive calls
+  failed for availability reasons (connection errors, timeouts, 429, 5xx;
+  one count per call however often it retried), and the model is skipped
+  for LLM_BREAKER_RESET_SECONDS; then one trial call is let through. Other
+  errors (400/422, ...) mean the model answered and do not count
+- with LLM_HEDGE_ENABLED, async non-streaming calls still running after the
+  model's recent p95 latency get a second, identical request. The first
+  answer wins and the other is cancelled
+
+Auth errors (401/403) are raised as-is. When every model is exhausted, or
+the deadline passes, LLMUnavailable is raised. Streams are retried only
+until the first chunk arrives, and are closed (releasing the HTTP
+connection) on every exit: a first-chunk timeout, a consumer that stops
+early or disconnects, or a hedged call that lost the race.
+
+The Groq clients are built with max_retries=0 so only this layer retries.
+"""
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from core.config import settings
+from rag.metrics import LLM_ATTEMPT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429}
+FATAL_STATUS = {401, 403}
+LATENCY_WINDOW = 200  # Recent successful latencies kept per model
+HEDGE_MIN_SAMPLES = 20  # No hedging until the p95 estimate means something
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+async def _close(response: Any):
+    # Streams hold an HTTP connection until closed; plain responses have no close()
+    close = getattr(response, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+    except Exception:
+        logger.debug("Closing an LLM stream failed", exc_info=True)
+
+
+def _classify(exc: Exception) -> str:
+    """"retry" (same model), "next_model", or "fatal" (raise as-is)."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return "retry"
+    import groq
+
+    if isinstance(exc, groq.APIConnectionError):  # Includes APITimeoutError
+        return "retry"
+    status = getattr(exc, "status_code", None)
+    if status is None or status in FATAL_STATUS:
+        return "fatal"
+    if status in RETRYABLE_STATUS or status >= 500:
+        return "retry"
+    return "next_model"  # e.g. 400/404/422 — the next model may accept it
+
+
+def _unavailable_model(exc: Exception) -> bool:
+    """Whether exc says the model is down or overloaded, rather than rejecting this request."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    import groq
+
+    if isinstance(exc, groq.APIConnectionError):
+        return True
+    status = getattr(exc, "status_code", None)
+    return status is not None and (status in (408, 429) or status >= 500)
+
+
+def retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(when.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int, reset_seconds: float):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._consecutive = 0
+        self._opened_at: float | None = None
+        self._trial_at: float | None = None
+        self._lock = threading.Lock()
+        self.opens = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_seconds:
+                return False
+            # Half-open: one trial call at a time (a trial that never reported back expires)
+            if self._trial_at is not None and now - self._trial_at < self.reset_seconds:
+                return False
+            self._trial_at = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = self._trial_at = None
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial_at is not None or (self.failures and self._consecutive >= self.failures):
+                if self._opened_at is None or self._trial_at is not None:
+                    self.opens += 1
+                self._opened_at = time.monotonic()
+                self._trial_at = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self._opened_at < self.reset_seconds else "half_open"
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        models: list[str],
+        deadline: float,
+        attempt_timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge: bool,
+        hedge_min_delay: float,
+        breaker_failures: int,
+        breaker_reset: float,
+    ):
+        self.models = models
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breakers = {m: CircuitBreaker(breaker_failures, breaker_reset) for m in models}
+        self._latencies = {m: deque(maxlen=LATENCY_WINDOW) for m in models}
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "fallbacks": 0,  # Calls answered by a fallback model
+            "hedges": 0,
+            "hedge_wins": 0,
+            "breaker_skips": 0,
+            "unavailable": 0,
+        }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _record_latency(self, model: str, seconds: float):
+        with self._lock:
+            self._latencies[model].append(seconds)
+
+    def p95(self, model: str) -> float | None:
+        with self._lock:
+            window = sorted(self._latencies[model])
+        if len(window) < HEDGE_MIN_SAMPLES:
+            return None
+        return window[int(0.95 * (len(window) - 1))]
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        hinted = retry_after(exc)
+        if hinted is not None:
+            return hinted
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _next_wait(self, model: str, attempt: int, exc: Exception, call_deadline: float,
+                   tripped: set[str]) -> float | None:
+        """Record a failed attempt; return the wait before retrying this model, or None to move on.
+
+        tripped holds the models this call already counted against their breaker.
+        """
+        kind = _classify(exc)
+        if kind == "fatal":
+            raise exc
+        if not _unavailable_model(exc):
+            self.breakers[model].success()  # It answered; also ends a half-open trial
+        elif model not in tripped:
+            tripped.add(model)
+            self.breakers[model].failure()
+        logger.warning("LLM call to %s failed (%s): %s", model, kind, " ".join(str(exc).split())[:200])
+        if kind != "retry" or attempt >= self.max_retries:
+            return None
+        wait = self._backoff(attempt, exc)
+        if time.monotonic() + wait >= call_deadline:
+            return None  # e.g. Retry-After longer than the time left — try the next model instead
+        self._count("retries")
+        return wait
+
+    def _success(self, model: str, seconds: float):
+        LLM_ATTEMPT_SECONDS.labels(model, "ok").observe(seconds)
+        self.breakers[model].success()
+        self._record_latency(model, seconds)
+        if model != self.models[0]:
+            self._count("fallbacks")
+
+    def _unavailable(self, last: Exception | None) -> LLMUnavailable:
+        self._count("unavailable")
+        if last is None:
+            return LLMUnavailable("no LLM model available (circuit open or deadline passed)")
+        return LLMUnavailable(f"all LLM models failed; last error: {' '.join(str(last).split())[:200]}")
+
+    def complete(self, create: Callable[..., Any], **kwargs) -> Any:
+        """Sync call, e.g. complete(client.chat.completions.create, messages=...). Not hedged."""
+        self._count("calls")
+        call_deadline = time.monotonic() + self.deadline
+        last = None
+        tripped: set[str] = set()
+        for model in self.models:
+            for attempt in range(self.max_retries + 1):
+                if not self.breakers[model].allow():
+                    self._count("breaker_skips")
+                    break
+                timeout = min(self.attempt_timeout, call_deadline - time.monotonic())
+                if timeout <= 0:
+                    raise self._unavailable(last) from last
+                self._count("attempts")
+                start = time.monotonic()
+                try:
+                    response = create(model=model, timeout=timeout, **kwargs)
+                except Exception as e:
+                    LLM_ATTEMPT_SECONDS.labels(model, "error").observe(time.monotonic() - start)
+                    last = e
+                    wait = self._next_wait(model, attempt, e, call_deadline, tripped)
+                    if wait is None:
+                        break
+                    time.sleep(wait)
+                    continue
+                self._success(model, time.monotonic() - start)
+                return response
+        raise self._unavailable(last) from last
+
+    async def _arun(self, call: Callable[[str, float], Awaitable[Any]]) -> Any:
+        # Async twin of complete(); call(model, timeout) makes one attempt
+        self._count("calls")
+        call_deadline = time.monotonic() + self.deadline
+        last = None
+        tripped: set[str] = set()
+        for model in self.models:
+            for attempt in range(self.max_retries + 1):
+                if not self.breakers[model].allow():
+                    self._count("breaker_skips")
+                    break
+                timeout = min(self.attempt_timeout, call_deadline - time.monotonic())
+                if timeout <= 0:
+                    raise self._unavailable(last) from last
+                self._count("attempts")
+                start = time.monotonic()
+                try:
+                    response = await call(model, timeout)
+                except Exception as e:
+                    LLM_ATTEMPT_SECONDS.labels(model, "error").observe(time.monotonic() - start)
+                    last = e
+                    wait = self._next_wait(model, attempt, e, call_deadline, tripped)
+                    if wait is None:
+                        break
+                    await asyncio.sleep(wait)
+                    continue
+                self._success(model, time.monotonic() - start)
+                return response
+        raise self._unavailable(last) from last
+
+    async def _hedged(self, create: Callable[..., Awaitable[Any]], model: str, timeout: float, kwargs: dict) -> Any:
+        async def attempt(budget: float):
+            return await asyncio.wait_for(create(model=model, timeout=budget, **kwargs), budget)
+
+        delay = self.p95(model) if self.hedge else None
+        if delay is None or max(delay, self.hedge_min_delay) >= timeout:
+            return await attempt(timeout)
+        delay = max(delay, self.hedge_min_delay)
+
+        first = asyncio.ensure_future(attempt(timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = asyncio.ensure_future(attempt(timeout - delay))
+        pending = {first, second}
+        winner = error = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        # Both finished in the same tick; the unused response is closed
+                        await _close(task.result())
+            if winner is None:
+                raise error
+            if winner is second:
+                self._count("hedge_wins")
+            return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acomplete(self, create: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        return await self._arun(lambda model, timeout: self._hedged(create, model, timeout, kwargs))
+
+    async def astream(self, create: Callable[..., Awaitable[Any]], **kwargs) -> AsyncIterator[Any]:
+        """Yield stream chunks. Opening the stream and the first chunk are retried/failed over; later chunks are not."""
+        async def open_stream(model: str, timeout: float):
+            stream = await asyncio.wait_for(create(model=model, stream=True, timeout=timeout, **kwargs), timeout)
+            chunks = stream.__aiter__()
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                await _close(stream)  # The retry opens a new one
+                raise
+            return stream, first, chunks
+
+        stream, first, chunks = await self._arun(open_stream)
+        try:
+            if first is None:
+                return
+            yield first
+            while True:
+                try:
+                    # A stalled stream fails instead of hanging the request
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.attempt_timeout)
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            await _close(stream)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "models": {
+                model: {
+                    "circuit": self.breakers[model].state,
+                    "circuit_opens": self.breakers[model].opens,
+                    "p95_ms": round(p95 * 1000, 1) if (p95 := self.p95(model)) is not None else None,
+                }
+                for model in self.models
+            },
+        }
+
+
+gateway = LLMGateway(
+    models=[settings.llm_model] + [m.strip() for m in settings.llm_fallback_models.split(",") if m.strip()],
+    deadline=settings.llm_deadline_seconds,
+    attempt_timeout=settings.llm_attempt_timeout_seconds,
+    max_retries=settings.llm_max_retries,
+    backoff_base=settings.llm_backoff_base_seconds,
+    backoff_max=settings.llm_backoff_max_seconds,
+    hedge=settings.llm_hedge_enabled,
+    hedge_min_delay=settings.llm_hedge_min_delay_ms / 1000,
+    breaker_failures=settings.llm_breaker_failures,
+    breaker_reset=settings.llm_breaker_reset_seconds,
+)
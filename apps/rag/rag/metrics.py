@@ -0,0 +1,147 @@
+"""Prometheus metrics for the query and ingest paths.
+
+Per-request measurements (stage latencies, pool waits, LLM attempts and
+tokens) are histograms and counters updated where they happen. The
+components that already keep their own counters — caches, LLM gateway, DB
+pool, context packing — are read when /metrics is scraped, by
+StatsCollector, so they are not counted twice. Stage timers also open an
+OpenTelemetry span when tracing is on (see rag/tracing.py).
+"""
+import contextlib
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from rag.tracing import span
+
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+QUERY_STAGE_SECONDS = Histogram(
+    "rag_query_stage_seconds", "Time spent in each stage of a query", ["stage"], buckets=FAST_BUCKETS
+)
+QUERIES = Counter("rag_queries_total", "Queries by how they were answered", ["route"])
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_seconds", "Time spent in each stage of ingesting one document", ["stage"], buckets=SLOW_BUCKETS
+)
+INGEST_JOBS = Counter("rag_ingest_jobs_total", "Ingest jobs finished", ["kind", "status"])
+DB_POOL_WAIT_SECONDS = Histogram(
+    "rag_db_pool_wait_seconds", "Time waiting for a database connection", ["pool"], buckets=FAST_BUCKETS
+)
+LLM_ATTEMPT_SECONDS = Histogram(
+    "rag_llm_attempt_seconds", "Latency of single LLM attempts", ["model", "outcome"], buckets=SLOW_BUCKETS
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens reported by the LLM API", ["model", "kind"])
+CORPUS_CHUNKS = Gauge("rag_corpus_chunks", "Chunks stored in rag.embeddings")
+CORPUS_DOCUMENTS = Gauge("rag_corpus_documents", "Documents with at least one stored chunk")
+
+
+@contextlib.contextmanager
+def _stage(histogram: Histogram, prefix: str, name: str):
+    start = time.perf_counter()
+    try:
+        with span(f"{prefix}.{name}"):
+            yield
+    finally:
+        histogram.labels(name).observe(time.perf_counter() - start)
+
+
+def query_stage(name: str):
+    return _stage(QUERY_STAGE_SECONDS, "rag.query", name)
+
+
+def ingest_stage(name: str):
+    return _stage(INGEST_STAGE_SECONDS, "rag.ingest", name)
+
+
+def observe_query_stage(name: str, seconds: float):
+    QUERY_STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def count_query(route: str):
+    QUERIES.labels(route).inc()
+
+
+def observe_ingest_stage(name: str, seconds: float):
+    # For stages that are interleaved (embed/save) and timed by summing
+    INGEST_STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def observe_pool_wait(pool: str, seconds: float):
+    DB_POOL_WAIT_SECONDS.labels(pool).observe(seconds)
+
+
+def record_llm_usage(response, model: str | None = None):
+    # Chat completions carry .usage; Groq puts it on the last stream chunk under x_groq
+    usage = getattr(response, "usage", None) or getattr(getattr(response, "x_groq", None), "usage", None)
+    if usage is None:
+        return
+    model = getattr(response, "model", None) or model or "unknown"
+    LLM_TOKENS.labels(model, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(model, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def set_corpus_counts(chunks: int, documents: int):
+    CORPUS_CHUNKS.set(chunks)
+    CORPUS_DOCUMENTS.set(documents)
+
+
+class StatsCollector:
+    def describe(self):
+        return []  # Stops the registry calling collect() at import, before the components exist
+
+    def collect(self):
+        from db.session import pool_stats
+        from rag.answer_cache import answer_cache
+        from rag.context import context_stats
+        from rag.embeddings import cache_stats
+        from rag.llm_gateway import gateway
+
+        embedding = cache_stats()
+        if embedding is not None:
+            lookups = CounterMetricFamily(
+                "rag_embedding_cache_lookups", "Embedding cache lookups by result", labels=["result"]
+            )
+            for result in ("memory_hits", "disk_hits", "misses"):
+                lookups.add_metric([result], embedding[result])
+            yield lookups
+
+        answers = answer_cache.stats()
+        lookups = CounterMetricFamily("rag_answer_cache_lookups", "Answer cache lookups by result", labels=["result"])
+        lookups.add_metric(["hits"], answers["hits"])
+        lookups.add_metric(["misses"], answers["misses"])
+        yield lookups
+        yield GaugeMetricFamily("rag_answer_cache_entries", "Answers cached", value=answers["entries"])
+
+        llm = gateway.stats()
+        events = CounterMetricFamily("rag_llm_gateway_events", "LLM gateway calls, retries, fallbacks", labels=["event"])
+        for event, value in llm.items():
+            if event != "models":
+                events.add_metric([event], value)
+        yield events
+        circuit = GaugeMetricFamily("rag_llm_circuit_open", "1 while a model's circuit breaker is open", labels=["model"])
+        for model, state in llm["models"].items():
+            circuit.add_metric([model], 1 if state["circuit"] == "open" else 0)
+        yield circuit
+
+        pool = pool_stats()
+        if pool is not None:
+            connections = GaugeMetricFamily("rag_db_pool_connections", "Sync pool connections", labels=["state"])
+            connections.add_metric(["in_use"], pool["in_use"])
+            connections.add_metric(["idle"], pool["idle"])
+            yield connections
+            yield CounterMetricFamily("rag_db_pool_timeouts", "Checkouts that hit the pool timeout", value=pool["timeouts"])
+
+        context = context_stats()
+        tokens = CounterMetricFamily("rag_context_tokens", "Estimated prompt context tokens", labels=["kind"])
+        for kind in ("raw_tokens", "tokens", "tokens_saved"):
+            tokens.add_metric([kind], context[kind])
+        yield tokens
+
+
+REGISTRY.register(StatsCollector())
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,7 +1,20 @@
+from typing import Iterator
+
 from docx import Document
 import io
 
+def iter_docx_pages(source: str | bytes) -> Iterator[tuple[int | None, str]]:
+    doc = Document(source if isinstance(source, str) else io.BytesIO(source))
+    # DOCX has no fixed pages; Word records where it last broke them when saving.
+    # Without those markers (e.g. generated files) pages are unknown.
+    paged = bool(doc.element.body.xpath(".//w:lastRenderedPageBreak"))
+    page = 1
+    for para in doc.paragraphs:
+        if para.text.strip():
+            yield (page if paged else None), para.text + "\n"
+        if paged:
+            page += len(para.rendered_page_breaks)
+
+
 def parse_docx(file_bytes: bytes) -> str:
-    doc = Document(io.BytesIO(file_bytes))
-    text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
-    return text.strip()
\ No newline at end of file
+    return "".join(text for _, text in iter_docx_pages(file_bytes)).strip()
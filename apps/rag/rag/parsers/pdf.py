@@ -1,8 +1,17 @@
+from typing import Iterator
+
 import fitz  # PyMuPDF
 
-def parse_pdf(file_bytes: bytes) -> str:
-    text = ""
-    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+def iter_pdf_pages(source: str | bytes) -> Iterator[tuple[int, str]]:
+    # Pages are loaded one at a time; a path is opened without reading the whole file
+    if isinstance(source, str):
+        doc = fitz.open(source, filetype="pdf")
+    else:
+        doc = fitz.open(stream=source, filetype="pdf")
+    with doc:
         for page in doc:
-            text += page.get_text()
-    return text.strip()
\ No newline at end of file
+            yield page.number + 1, page.get_text()
+
+
+def parse_pdf(file_bytes: bytes) -> str:
+    return "".join(text for _, text in iter_pdf_pages(file_bytes)).strip()
@@ -1,2 +1,15 @@
+from typing import Iterator
+
+BLOCK_CHARS = 64 * 1024
+
+def iter_txt_pages(source: str | bytes) -> Iterator[tuple[None, str]]:
+    if isinstance(source, bytes):
+        yield None, source.decode("utf-8", errors="replace")
+        return
+    with open(source, encoding="utf-8", errors="replace") as f:
+        while block := f.read(BLOCK_CHARS):
+            yield None, block
+
+
 def parse_txt(file_bytes: bytes) -> str:
-    return file_bytes.decode("utf-8", errors="replace").strip()
\ No newline at end of file
+    return file_bytes.decode("utf-8", errors="replace").strip()
@@ -1,19 +1,31 @@
-from rag.embeddings import generate_embeddings
-from rag.vector_store import search_similar_chunks
-from rag.llm import call_groq, call_groq_with_tools
-from rag.rooms import get_all_rooms
+import logging
+import time
+from contextlib import aclosing
+
+from core.config import settings
+from rag.embeddings import aembed_query, embed_query
+from rag.retrieval import aretrieve, retrieve
+from rag.llm import acall_groq, acall_groq_with_tools, astream_groq, call_groq, call_groq_with_tools
+from rag.rooms import aget_room_catalogue, get_room_catalogue
+from rag.intent import is_booking_intent, route_booking
+from rag.answer_cache import answer_cache
+from rag.vector_store import aget_corpus_generation, get_corpus_generation
+from rag.context import build_context
+from rag.rerank import reranker
+from rag.metrics import count_query, observe_query_stage, query_stage
+
+logger = logging.getLogger(__name__)
 
 CONFIDENCE_THRESHOLD = 0.25
+CONTEXT_TOP_K = 5  # Chunks that make it into the prompt
 
-BOOKING_KEYWORDS = [
-    "book", "reserve", "booking", "reservation",
-    "schedule", "i want to book", "can i book",
-    "book lab", "book room", "book seminar"
-]
 
-def is_booking_intent(message: str) -> bool:
-    msg = message.lower()
-    return any(keyword in msg for keyword in BOOKING_KEYWORDS)
+def _cache_answer(query_embedding, answer, citations, llm_seconds, filters, generation):
+    # Separate from the LLM try: a cache failure must not replace a generated answer
+    try:
+        answer_cache.store(query_embedding, answer, citations, llm_seconds, filters, generation)
+    except Exception:
+        logger.exception("Could not store the answer in the answer cache")
 
 
 def build_prompt_with_context(question: str, chunks: list[dict]) -> str:
@@ -40,70 +52,280 @@ def build_prompt_general(question: str) -> str:
     )
 
 
-def query_rag(message: str) -> dict:
-    # Step 1 — fast keyword check before any embedding or LLM call
+def booking_response(tool_result: dict, rooms: list[dict]) -> dict:
+    if tool_result["type"] == "booking_request":
+        return {
+            "type": "booking_request",
+            "params": tool_result["params"],
+            "answer": None,
+            "citations": []
+        }
+
+    if tool_result["type"] == "booking_incomplete":
+        return {
+            "type": "text",
+            "answer": tool_result["answer"],
+            "citations": []
+        }
+
+    # Groq didn't call the tool (or could not be reached) — ask for booking details directly
+    room_names = ", ".join([r["name"] for r in rooms])
+    return {
+        "type": "text",
+        "answer": (
+            f"I'd love to help you book a room! Please provide the following details:\n\n"
+            f"- **Room**: which room you need ({room_names})\n"
+            f"- **Date**: which date\n"
+            f"- **Time**: start and end time\n"
+            f"- **Reason**: purpose of the booking\n\n"
+            f"For example: *Book LT1 this Friday from 2pm to 4pm for my ML project*"
+        ),
+        "citations": []
+    }
+
+
+def candidate_count() -> int:
+    # Over-fetch when a cross-encoder will pick the final CONTEXT_TOP_K
+    if reranker is None:
+        return CONTEXT_TOP_K
+    return max(CONTEXT_TOP_K, settings.rerank_candidates)
+
+
+def is_relevant(result: dict) -> bool:
+    # A cross-encoder score replaces the cosine cut-off when present
+    if "rerank_score" in result:
+        return result["rerank_score"] >= settings.rerank_min_score
+    if result["score"] >= CONFIDENCE_THRESHOLD:
+        return True
+    # Strong full-text matches (course codes, room names) are kept even when
+    # their cosine score is low: every query token present, or the top
+    # full-text hit above a lower floor. One shared token is not enough.
+    if result.get("lexical_all"):
+        return True
+    return result.get("lexical_rank") == 1 and result["score"] >= settings.lexical_min_score
+
+
+def build_rag_prompt(message: str, results: list[dict]) -> tuple[str, list[dict]]:
+    good_results = [r for r in results if is_relevant(r)]
+
+    if not good_results:
+        return build_prompt_general(message), []
+
+    # Neighbouring chunks are merged and overlap removed, so one citation per span
+    spans, _ = build_context(good_results, settings.context_token_budget)
+    citations = [
+        {
+            "document_id": s["document_id"],
+            "excerpt": s["chunk_text"][:200],
+            "score": round(s["score"], 3),
+            "page_number": s.get("page_number"),
+        }
+        for s in spans
+    ]
+    return build_prompt_with_context(message, spans), citations
+
+
+LLM_UNAVAILABLE_ANSWER = "I'm having trouble connecting right now. Please try again in a moment."
+
+
+def query_rag(message: str, filters: dict | None = None) -> dict:
+    with query_stage("total"):
+        return _query_rag(message, filters)
+
+
+def _query_rag(message: str, filters: dict | None) -> dict:
+    # Step 1 — booking check before any embedding call; when the message
+    # already has every slot, the LLM is skipped too
     if is_booking_intent(message):
-        rooms = get_all_rooms()
-        tool_result = call_groq_with_tools(message, rooms)
-
-        if tool_result["type"] == "booking_request":
-            return {
-                "type": "booking_request",
-                "params": tool_result["params"],
-                "answer": None,
-                "citations": []
-            }
-
-        if tool_result["type"] == "booking_incomplete":
-            return {
-                "type": "text",
-                "answer": tool_result["answer"],
-                "citations": []
-            }
-
-        if tool_result["type"] == "text":
-            # Groq didn't call the tool — ask for booking details directly
-            room_names = ", ".join([r["name"] for r in rooms])
-            return {
-                "type": "text",
-                "answer": (
-                    f"I'd love to help you book a room! Please provide the following details:\n\n"
-                    f"- **Room**: which room you need ({room_names})\n"
-                    f"- **Date**: which date\n"
-                    f"- **Time**: start and end time\n"
-                    f"- **Reason**: purpose of the booking\n\n"
-                    f"For example: *Book LT1 this Friday from 2pm to 4pm for my ML project*"
-                ),
-                "citations": []
-            }
-
-    # Step 2 — normal RAG flow
-    query_embedding = generate_embeddings([message])[0]
-    results = search_similar_chunks(query_embedding, top_k=5)
-    good_results = [r for r in results if r["score"] >= CONFIDENCE_THRESHOLD]
-
-    if good_results:
-        prompt = build_prompt_with_context(message, good_results)
-        citations = [
-            {
-                "document_id": r["document_id"],
-                "excerpt": r["chunk_text"][:200],
-                "score": round(r["score"], 3),
-            }
-            for r in good_results
-        ]
-    else:
-        prompt = build_prompt_general(message)
+        with query_stage("rooms"):
+            catalogue = get_room_catalogue()
+        routed = route_booking(message, catalogue)
+        if routed is not None:
+            count_query("booking_direct")
+            return booking_response(routed, catalogue.rooms)
+        count_query("booking_llm")
+        try:
+            with query_stage("llm"):
+                tool_result = call_groq_with_tools(message, catalogue)
+        except Exception:
+            logger.exception("Booking LLM call failed")
+            tool_result = {"type": "unavailable"}  # Falls back to asking for the details
+        return booking_response(tool_result, catalogue.rooms)
+
+    # Step 2 — normal RAG flow, unless a near-identical question was answered recently
+    with query_stage("embed"):
+        query_embedding = embed_query(message)
+    with query_stage("answer_cache"):
+        generation = get_corpus_generation() if answer_cache.enabled else None
+        cached = answer_cache.lookup(query_embedding, filters, generation)
+    if cached:
+        count_query("answer_cache")
+        return {"type": "text", **cached}
+    count_query("rag")
+
+    with query_stage("retrieve"):
+        results = retrieve(message, query_embedding, top_k=candidate_count(), filters=filters)
+    if reranker is not None:
+        with query_stage("rerank"):
+            results = reranker.rerank(message, results, CONTEXT_TOP_K)
+    with query_stage("context"):
+        prompt, citations = build_rag_prompt(message, results)
+
+    try:
+        llm_start = time.perf_counter()
+        with query_stage("llm"):
+            answer = call_groq(prompt)
+    except Exception:
+        answer = LLM_UNAVAILABLE_ANSWER
         citations = []
+    else:
+        _cache_answer(query_embedding, answer, citations, time.perf_counter() - llm_start, filters, generation)
+
+    return {
+        "type": "text",
+        "answer": answer,
+        "citations": citations
+    }
+
+
+async def aquery_rag(message: str, filters: dict | None = None) -> dict:
+    with query_stage("total"):
+        return await _aquery_rag(message, filters)
+
+
+async def _aquery_rag(message: str, filters: dict | None) -> dict:
+    # Same pipeline as query_rag, but nothing blocks the event loop: encoding
+    # runs on an executor, search and LLM calls use async clients
+    if is_booking_intent(message):
+        with query_stage("rooms"):
+            catalogue = await aget_room_catalogue()
+        routed = route_booking(message, catalogue)
+        if routed is not None:
+            count_query("booking_direct")
+            return booking_response(routed, catalogue.rooms)
+        count_query("booking_llm")
+        try:
+            with query_stage("llm"):
+                tool_result = await acall_groq_with_tools(message, catalogue)
+        except Exception:
+            logger.exception("Booking LLM call failed")
+            tool_result = {"type": "unavailable"}
+        return booking_response(tool_result, catalogue.rooms)
+
+    with query_stage("embed"):
+        query_embedding = await aembed_query(message)
+    with query_stage("answer_cache"):
+        generation = await aget_corpus_generation() if answer_cache.enabled else None
+        cached = answer_cache.lookup(query_embedding, filters, generation)
+    if cached:
+        count_query("answer_cache")
+        return {"type": "text", **cached}
+    count_query("rag")
+
+    with query_stage("retrieve"):
+        results = await aretrieve(message, query_embedding, top_k=candidate_count(), filters=filters)
+    if reranker is not None:
+        with query_stage("rerank"):
+            results = await reranker.arerank(message, results, CONTEXT_TOP_K)
+    with query_stage("context"):
+        prompt, citations = build_rag_prompt(message, results)
 
     try:
-        answer = call_groq(prompt)
+        llm_start = time.perf_counter()
+        with query_stage("llm"):
+            answer = await acall_groq(prompt)
     except Exception:
-        answer = "I'm having trouble connecting right now. Please try again in a moment."
+        answer = LLM_UNAVAILABLE_ANSWER
         citations = []
+    else:
+        _cache_answer(query_embedding, answer, citations, time.perf_counter() - llm_start, filters, generation)
 
     return {
         "type": "text",
         "answer": answer,
         "citations": citations
-    }
\ No newline at end of file
+    }
+
+
+async def astream_query_rag(message: str, filters: dict | None = None):
+    """Streaming variant of aquery_rag.
+
+    Yields (event, data) pairs: "citations" first, then one "token" per
+    answer delta, then "done" with the full result plus ttft_ms/total_ms
+    (or "error" if the LLM stream breaks after tokens were sent).
+    """
+    start = time.perf_counter()
+
+    if is_booking_intent(message):
+        result = await aquery_rag(message, filters)
+        ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+        yield "citations", {"citations": []}
+        if result["answer"]:
+            yield "token", {"text": result["answer"]}
+        yield "done", {**result, "ttft_ms": ttft_ms, "total_ms": ttft_ms}
+        return
+
+    # Stage timers wrap only the awaits before the first yield; the LLM
+    # stream, ttft and total are observed from timestamps
+    with query_stage("embed"):
+        query_embedding = await aembed_query(message)
+    with query_stage("answer_cache"):
+        generation = await aget_corpus_generation() if answer_cache.enabled else None
+        cached = answer_cache.lookup(query_embedding, filters, generation)
+    if cached:
+        count_query("answer_cache")
+        ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+        yield "citations", {"citations": cached["citations"]}
+        yield "token", {"text": cached["answer"]}
+        observe_query_stage("total", ttft_ms / 1000)
+        yield "done", {"type": "text", **cached, "ttft_ms": ttft_ms, "total_ms": ttft_ms}
+        return
+
+    count_query("rag")
+
+    with query_stage("retrieve"):
+        results = await aretrieve(message, query_embedding, top_k=candidate_count(), filters=filters)
+    if reranker is not None:
+        with query_stage("rerank"):
+            results = await reranker.arerank(message, results, CONTEXT_TOP_K)
+    with query_stage("context"):
+        prompt, citations = build_rag_prompt(message, results)
+    yield "citations", {"citations": citations}
+
+    parts = []
+    ttft_ms = None
+    llm_start = time.perf_counter()
+    try:
+        async with aclosing(astream_groq(prompt)) as deltas:
+            async for delta in deltas:
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                parts.append(delta)
+                yield "token", {"text": delta}
+    except Exception:
+        # Only fall back if nothing reached the client yet
+        if parts:
+            yield "error", {"detail": "Answer stream interrupted"}
+            return
+        citations = []
+        parts = [LLM_UNAVAILABLE_ANSWER]
+        ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+        yield "token", {"text": LLM_UNAVAILABLE_ANSWER}
+    else:
+        answer = "".join(parts).strip()
+        if answer:
+            _cache_answer(query_embedding, answer, citations, time.perf_counter() - llm_start, filters, generation)
+
+    total_ms = round((time.perf_counter() - start) * 1000, 1)
+    observe_query_stage("llm", time.perf_counter() - llm_start)
+    if ttft_ms is not None:  # None when the stream ended without any content
+        observe_query_stage("ttft", ttft_ms / 1000)
+    observe_query_stage("total", total_ms / 1000)
+    logger.info("rag stream ttft_ms=%s total_ms=%s", ttft_ms, total_ms)
+    yield "done", {
+        "type": "text",
+        "answer": "".join(parts).strip(),
+        "citations": citations,
+        "ttft_ms": ttft_ms,
+        "total_ms": total_ms,
+    }
@@ -0,0 +1,126 @@
+"""Cross-encoder reranking of over-fetched retrieval candidates.
+
+The bi-encoder search returns a wide candidate list; a small CPU cross-encoder
+scores every (question, chunk) pair in one batch and only the best top_k are
+kept. Reranking cost grows with the number of candidates, so each call checks
+a running estimate of milliseconds per pair against the latency budget: it
+reranks as many leading candidates as fit, or skips reranking entirely when
+not even top_k would. The estimate is seeded by a timed warm-up batch, and
+while reranking is being skipped one top_k batch is let through every
+PROBE_SECONDS to re-measure it, so one slow spell does not switch reranking
+off for good.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    PROBE_SECONDS = 30.0  # While skipping, re-measure this often
+    WARMUP_PAIRS = 8
+
+    def __init__(self, model_name: str, budget_ms: float):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self._model = None
+        self._load_lock = threading.Lock()
+        # Estimate and counters are updated from to_thread workers
+        self._lock = threading.Lock()
+        self._ms_per_pair = None  # Moving average, None until the first timed batch
+        self._measured_at = float("-inf")
+        self.counters = {"reranked": 0, "trimmed": 0, "skipped": 0, "probes": 0}
+
+    def load(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    import torch
+                    from sentence_transformers import CrossEncoder
+
+                    # Sigmoid keeps scores in 0–1 so RERANK_MIN_SCORE reads as a probability
+                    self._model = CrossEncoder(self.model_name, default_activation_function=torch.nn.Sigmoid())
+        return self._model
+
+    def warm_up(self):
+        # Load, then time a warm forward pass: the first one is much slower
+        # and would otherwise seed the estimate
+        model = self.load()
+        pairs = [("warm-up question", "warm-up passage about the department")] * self.WARMUP_PAIRS
+        model.predict(pairs, show_progress_bar=False)
+        start = time.perf_counter()
+        model.predict(pairs, show_progress_bar=False)
+        self._observe(len(pairs), (time.perf_counter() - start) * 1000, replace=True)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _fit(self, candidates: int, top_k: int, budget_ms: float) -> tuple[int, bool]:
+        # How many candidates can be scored inside the budget (0 = skip), and whether it is a probe
+        with self._lock:
+            if self._ms_per_pair is None or budget_ms <= 0:
+                return candidates, False
+            fit = int(budget_ms / self._ms_per_pair)
+            if fit >= min(top_k, candidates):
+                return min(fit, candidates), False
+            now = time.monotonic()
+            if now - self._measured_at < self.PROBE_SECONDS:
+                return 0, False
+            self._measured_at = now  # One probe per interval, however many requests arrive
+            return min(top_k, candidates), True
+
+    def _observe(self, pairs: int, elapsed_ms: float, replace: bool = False):
+        per_pair = elapsed_ms / pairs
+        with self._lock:
+            # A probe replaces the estimate that had reranking switched off
+            if self._ms_per_pair is None or replace:
+                self._ms_per_pair = per_pair
+            else:
+                self._ms_per_pair = 0.8 * self._ms_per_pair + 0.2 * per_pair
+            self._measured_at = time.monotonic()
+
+    def rerank(self, question: str, results: list[dict], top_k: int, budget_ms: float | None = None) -> list[dict]:
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        if not results:
+            return results
+
+        n, probe = self._fit(len(results), top_k, budget_ms)
+        if n == 0:
+            self._count("skipped")
+            logger.info("rerank skipped: %d candidates over %.0f ms budget", len(results), budget_ms)
+            return results[:top_k]
+        if probe:
+            self._count("probes")
+        elif n < len(results):
+            self._count("trimmed")
+
+        model = self.load()
+        head = results[:n]
+        start = time.perf_counter()
+        scores = model.predict([(question, r["chunk_text"]) for r in head], show_progress_bar=False)
+        self._observe(n, (time.perf_counter() - start) * 1000, replace=probe)
+        self._count("reranked")
+
+        scored = [{**r, "rerank_score": float(s)} for r, s in zip(head, scores)]
+        scored.sort(key=lambda r: r["rerank_score"], reverse=True)
+        return scored[:top_k]
+
+    async def arerank(self, question: str, results: list[dict], top_k: int, budget_ms: float | None = None) -> list[dict]:
+        # Scoring is CPU-bound — keep it off the event loop
+        return await asyncio.to_thread(self.rerank, question, results, top_k, budget_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+                "budget_ms": self.budget_ms,
+            }
+
+
+reranker = Reranker(settings.rerank_model, budget_ms=settings.rerank_budget_ms) if settings.rerank_enabled else None
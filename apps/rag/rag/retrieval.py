@@ -0,0 +1,125 @@
+"""Chunk retrieval: vector search, optionally fused with Postgres full-text.
+
+In hybrid mode the vector and lexical result lists are merged with reciprocal
+rank fusion (score = sum of 1 / (k + rank) over the lists a chunk appears
+in). Results keep the usual fields; "score" stays the cosine similarity so
+CONFIDENCE_THRESHOLD means the same thing, and "rrf_score" / "lexical_rank"
+describe the fusion. "lexical_all" marks chunks containing every token of a
+multi-token query, as opposed to sharing just one of them.
+"""
+import asyncio
+import re
+
+import numpy as np
+
+from core.config import settings
+from db.session import async_connection, get_connection, release_connection, to_numbered
+from rag.filters import filter_sql
+from rag.vector_backends import to_result
+from rag.vector_store import asearch_similar_chunks, search_similar_chunks
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the",
+    "to", "was", "what", "when", "where", "which", "who", "why", "will", "with",
+}
+
+LEXICAL_SQL = """
+    SELECT
+        e.document_id,
+        e.chunk_text,
+        1 - (e.embedding <=> %(query)s) AS score,
+        e.page_number,
+        e.chunk_index,
+        e.chunk_tsv @@ to_tsquery('simple', %(tsquery_all)s) AS lexical_all
+    FROM rag.embeddings e
+    WHERE e.chunk_tsv @@ to_tsquery('simple', %(tsquery)s) AND {where}
+    ORDER BY ts_rank_cd(e.chunk_tsv, to_tsquery('simple', %(tsquery)s)) DESC
+    LIMIT %(limit)s
+"""
+
+
+def lexical_tokens(text: str) -> list[str]:
+    return list(dict.fromkeys(t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS))
+
+
+def _lexical_query(message: str, query_embedding: list[float], limit: int, filters: dict | None) -> tuple[str, dict]:
+    tokens = lexical_tokens(message)
+    where, params = filter_sql(filters)
+    # OR of the message's tokens — ts_rank_cd rewards chunks matching more of them
+    params.update(
+        query=np.asarray(query_embedding, dtype=np.float32),
+        tsquery=" | ".join(tokens),
+        tsquery_all=" & ".join(tokens),
+        limit=limit,
+    )
+    return LEXICAL_SQL.format(where=where), params
+
+
+def _lexical_result(row, token_count: int) -> dict:
+    # With a single token, matching "all" of it is no stronger than the OR match
+    return {**to_result(row), "lexical_all": bool(row[5]) and token_count > 1}
+
+
+def search_lexical(message: str, query_embedding: list[float], limit: int, filters: dict | None = None) -> list[dict]:
+    tokens = lexical_tokens(message)
+    if not tokens:
+        return []
+    sql, params = _lexical_query(message, query_embedding, limit, filters)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+        return [_lexical_result(row, len(tokens)) for row in rows]
+    finally:
+        release_connection(conn)
+
+
+async def asearch_lexical(message: str, query_embedding: list[float], limit: int, filters: dict | None = None) -> list[dict]:
+    tokens = lexical_tokens(message)
+    if not tokens:
+        return []
+    sql, args = to_numbered(*_lexical_query(message, query_embedding, limit, filters))
+    async with async_connection() as conn:
+        rows = await conn.fetch(sql, *args)
+    return [_lexical_result(row, len(tokens)) for row in rows]
+
+
+def reciprocal_rank_fusion(vector_results: list[dict], lexical_results: list[dict], k: int, top_k: int) -> list[dict]:
+    fused = {}
+    for source, results in (("vector_rank", vector_results), ("lexical_rank", lexical_results)):
+        for rank, result in enumerate(results, start=1):
+            key = (result["document_id"], result["chunk_index"])
+            entry = fused.setdefault(
+                key, {**result, "rrf_score": 0.0, "vector_rank": None, "lexical_rank": None, "lexical_all": False}
+            )
+            entry["rrf_score"] += 1 / (k + rank)
+            entry[source] = rank
+            entry["lexical_all"] = entry["lexical_all"] or result.get("lexical_all", False)
+    ranked = sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)
+    return ranked[:top_k]
+
+
+def retrieve(message: str, query_embedding: list[float], top_k: int = 5, filters: dict | None = None) -> list[dict]:
+    if settings.retrieval_mode != "hybrid":
+        return search_similar_chunks(query_embedding, top_k=top_k, filters=filters)
+    limit = max(top_k, settings.hybrid_candidates)
+    return reciprocal_rank_fusion(
+        search_similar_chunks(query_embedding, top_k=limit, filters=filters),
+        search_lexical(message, query_embedding, limit, filters),
+        settings.rrf_k,
+        top_k,
+    )
+
+
+async def aretrieve(message: str, query_embedding: list[float], top_k: int = 5, filters: dict | None = None) -> list[dict]:
+    if settings.retrieval_mode != "hybrid":
+        return await asearch_similar_chunks(query_embedding, top_k=top_k, filters=filters)
+    limit = max(top_k, settings.hybrid_candidates)
+    vector_results, lexical_results = await asyncio.gather(
+        asearch_similar_chunks(query_embedding, top_k=limit, filters=filters),
+        asearch_lexical(message, query_embedding, limit, filters),
+    )
+    return reciprocal_rank_fusion(vector_results, lexical_results, settings.rrf_k, top_k)
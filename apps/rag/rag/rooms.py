@@ -1,20 +1,139 @@
-from db.session import get_connection, release_connection
+"""Room catalogue with a TTL cache.
+
+Rooms change rarely (seeded or edited by admins), but every booking message
+needs them. The catalogue is loaded once per ROOM_CACHE_TTL_SECONDS into a
+RoomCatalogue: the rows, the prompt text listing them, and a compiled
+room-name pattern. Each reload that changes the rows, and every explicit
+invalidate_rooms() call (POST /rag/rooms/invalidate), bumps the version.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+
+from core.config import settings
+from db.session import async_connection, get_connection, release_connection
+
+ROOMS_SQL = 'SELECT id, name, location, capacity FROM "Room" ORDER BY name'
+
+
+def _to_room(row) -> dict:
+    return {
+        "id": row[0],
+        "name": row[1],
+        "location": row[2],
+        "capacity": row[3],
+    }
+
+
+class RoomCatalogue:
+    def __init__(self, rooms: list[dict], version: int):
+        self.rooms = rooms
+        self.version = version
+        self.names = [r["name"] for r in rooms]
+        self.text = "\n".join(
+            f"- {r['name']} (ID: {r['id']}, Location: {r['location']}, Capacity: {r['capacity']})"
+            for r in rooms
+        )
+        # Keyed like resolve() looks up: case and runs of whitespace do not matter
+        self.by_name = {" ".join(r["name"].split()).lower(): r for r in rooms}
+        # Longest names first so "LT10" wins over "LT1"; spaces match any whitespace
+        names = sorted(self.names, key=len, reverse=True)
+        alternatives = "|".join(r"\s+".join(map(re.escape, n.split())) for n in names if n.strip())
+        self.pattern = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)", re.IGNORECASE) if alternatives else None
+
+    def match(self, message: str) -> re.Match | None:
+        return self.pattern.search(message) if self.pattern else None
+
+    def finditer(self, message: str) -> list[re.Match]:
+        return list(self.pattern.finditer(message)) if self.pattern else []
+
+    def resolve(self, text: str) -> dict | None:
+        return self.by_name.get(" ".join(text.split()).lower())
+
+
+_catalogue: RoomCatalogue | None = None
+_fingerprint = None
+_loaded_at = 0.0
+_version = 0
+_generation = 0  # Bumped by invalidate_rooms(); a fetch that started before it is not installed
+_lock = threading.Lock()
+_async_lock = asyncio.Lock()
+
+
+def _fresh() -> bool:
+    return _catalogue is not None and time.monotonic() - _loaded_at < settings.room_cache_ttl_seconds
+
+
+def _install(rows: list) -> RoomCatalogue:
+    global _catalogue, _fingerprint, _loaded_at, _version
+    rooms = [_to_room(row) for row in rows]
+    fingerprint = hashlib.sha256(repr(sorted(tuple(r.values()) for r in rooms)).encode()).hexdigest()
+    if _catalogue is None or fingerprint != _fingerprint:
+        _version += 1
+        _catalogue, _fingerprint = RoomCatalogue(rooms, _version), fingerprint
+    _loaded_at = time.monotonic()
+    return _catalogue
+
+
+def get_room_catalogue() -> RoomCatalogue:
+    if _fresh():
+        return _catalogue
+    with _lock:
+        if _fresh():
+            return _catalogue
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(ROOMS_SQL)
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            release_connection(conn)
+        return _install(rows)
+
+
+async def aget_room_catalogue() -> RoomCatalogue:
+    if _fresh():
+        return _catalogue
+    async with _async_lock:
+        if _fresh():
+            return _catalogue
+        # The fetch runs outside _lock, so an invalidate_rooms() can land
+        # meanwhile; its rows may predate the change, so fetch again
+        for _ in range(3):
+            generation = _generation
+            async with async_connection() as conn:
+                rows = await conn.fetch(ROOMS_SQL)
+            with _lock:
+                if generation == _generation:
+                    return _install(rows)
+        # Still being invalidated: answer this caller, cache nothing
+        return RoomCatalogue([_to_room(row) for row in rows], _version)
+
+
+def invalidate_rooms() -> int:
+    # Next lookup reloads; the version moves now so callers can see it took
+    global _catalogue, _fingerprint, _version, _generation
+    with _lock:
+        _catalogue, _fingerprint = None, None
+        _generation += 1
+        _version += 1
+        return _version
+
 
 def get_all_rooms() -> list[dict]:
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute('SELECT id, name, location, capacity FROM "Room"')
-        rows = cur.fetchall()
-        cur.close()
-        return [
-            {
-                "id": row[0],
-                "name": row[1],
-                "location": row[2],
-                "capacity": row[3],
-            }
-            for row in rows
-        ]
-    finally:
-        release_connection(conn)
\ No newline at end of file
+    return get_room_catalogue().rooms
+
+
+async def aget_all_rooms() -> list[dict]:
+    return (await aget_room_catalogue()).rooms
+
+
+def room_cache_stats() -> dict:
+    return {
+        "version": _version,
+        "rooms": len(_catalogue.rooms) if _catalogue is not None else None,
+        "age_seconds": round(time.monotonic() - _loaded_at, 1) if _catalogue is not None else None,
+    }
@@ -0,0 +1,58 @@
+"""Optional OpenTelemetry spans.
+
+Off unless OTEL_ENABLED=true. When on, init_tracing() installs a tracer
+provider that exports over OTLP/HTTP. The standard OTEL_EXPORTER_OTLP_*
+env vars pick the collector, and OTEL_EXPORTER=console prints spans
+instead. span() is a no-op context manager until then, so call sites cost
+nothing when tracing is off.
+"""
+import contextlib
+import logging
+import threading
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_tracer = None
+_lock = threading.Lock()
+
+
+def init_tracing():
+    global _tracer
+    if not settings.otel_enabled or _tracer is not None:
+        return
+    with _lock:
+        if _tracer is not None:
+            return
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+            if settings.otel_exporter == "console":
+                exporter = ConsoleSpanExporter()
+            else:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                exporter = OTLPSpanExporter()
+        except ImportError:
+            logger.error("OTEL_ENABLED is set but opentelemetry-sdk / the OTLP exporter are not installed")
+            return
+        provider = TracerProvider(resource=Resource.create({"service.name": settings.otel_service_name}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("smartassist.rag")
+
+
+def shutdown_tracing():
+    if _tracer is not None:
+        from opentelemetry import trace
+
+        trace.get_tracer_provider().shutdown()
+
+
+def span(name: str, **attributes):
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
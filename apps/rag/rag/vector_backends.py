@@ -0,0 +1,277 @@
+"""Vector search backends.
+
+pgvector runs every query in Postgres. memory keeps all chunk embeddings in a
+NumPy matrix loaded from rag.embeddings at startup and answers with an exact
+(flat) cosine scan in-process; vector_store refreshes it after every write
+by tombstoning the document's old rows and appending its new ones.
+With several uvicorn workers, each one holds its own copy and only sees
+writes made in its own process until restart.
+"""
+import asyncio
+import threading
+
+import numpy as np
+
+from core.config import settings
+from db.session import async_connection, get_connection, release_connection, to_numbered
+from rag.filters import chunk_matches, document_matches, filter_sql
+from rag.vector_index import aget_index_state, get_index_state, search_setting
+
+SEARCH_SQL = """
+    SELECT
+        e.document_id,
+        e.chunk_text,
+        1 - (e.embedding <=> %(query)s) AS score,
+        e.page_number,
+        e.chunk_index
+    FROM rag.embeddings e
+    WHERE {where}
+    ORDER BY e.embedding <=> %(query)s
+    LIMIT %(top_k)s
+"""
+
+
+def to_result(row) -> dict:
+    return {
+        "document_id": row[0],
+        "chunk_text": row[1],
+        "score": float(row[2]),
+        "page_number": row[3],
+        "chunk_index": row[4],
+    }
+
+
+def _search_query(query_embedding: list[float], top_k: int, filters: dict | None) -> tuple[str, dict]:
+    where, params = filter_sql(filters)
+    params.update(query=np.asarray(query_embedding, dtype=np.float32), top_k=top_k)
+    return SEARCH_SQL.format(where=where), params
+
+
+class VectorBackend:
+    name = ""
+
+    def load(self):
+        """Prepare the backend at startup."""
+
+    def ensure_loaded(self):
+        """load() unless that already happened; searches call it too."""
+
+    def refresh_documents(self, document_ids: list[str]):
+        """Called after chunks of these documents were written or deleted."""
+
+    def search(self, query_embedding: list[float], top_k: int, filters: dict | None = None) -> list[dict]:
+        raise NotImplementedError
+
+    async def asearch(self, query_embedding: list[float], top_k: int, filters: dict | None = None) -> list[dict]:
+        raise NotImplementedError
+
+
+class PgVectorBackend(VectorBackend):
+    name = "pgvector"
+
+    def search(self, query_embedding: list[float], top_k: int, filters: dict | None = None) -> list[dict]:
+        sql, params = _search_query(query_embedding, top_k, filters)
+        # ef_search / probes for the recall target (rag/vector_index.py)
+        tuning = search_setting(get_index_state(), top_k, bool(filters))
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if tuning is not None:
+                # Transaction-local; the pool rolls it back with the connection
+                cur.execute("SELECT set_config(%s, %s, true)", (tuning[0], str(tuning[1])))
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            cur.close()
+            return [to_result(row) for row in rows]
+        finally:
+            release_connection(conn)
+
+    async def asearch(self, query_embedding: list[float], top_k: int, filters: dict | None = None) -> list[dict]:
+        sql, args = to_numbered(*_search_query(query_embedding, top_k, filters))
+        tuning = search_setting(await aget_index_state(), top_k, bool(filters))
+        async with async_connection() as conn:
+            if tuning is None:
+                rows = await conn.fetch(sql, *args)
+            else:
+                async with conn.transaction():
+                    await conn.execute("SELECT set_config($1, $2, true)", tuning[0], str(tuning[1]))
+                    rows = await conn.fetch(sql, *args)
+        return [to_result(row) for row in rows]
+
+
+class MemoryBackend(VectorBackend):
+    name = "memory"
+    COMPACT_MIN_DEAD = 1024  # Tombstoned rows tolerated before a rebuild is considered
+
+    ROWS_SQL = """
+        SELECT document_id, chunk_text, embedding, page_number, chunk_index
+        FROM rag.embeddings
+    """
+    DOCUMENTS_SQL = """
+        SELECT document_id, source_filename, mime_type, drive_modified_at, tags
+        FROM rag.documents
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Swapped as one value so searches never see a half-updated index
+        self._index = self._build([])
+        self._documents: dict[str, dict] = {}
+        # Loaded on first use when warm-up has not done it (disabled, failed or still running)
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _fetch(self, document_ids: list[str] | None = None) -> tuple[list[tuple], dict[str, dict]]:
+        scope = "" if document_ids is None else " WHERE document_id = ANY(%(ids)s)"
+        params = {"ids": list(document_ids or [])}
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(self.ROWS_SQL + scope, params)
+            rows = cur.fetchall()
+            cur.execute(self.DOCUMENTS_SQL + scope, params)
+            documents = {
+                r[0]: {"source_filename": r[1], "mime_type": r[2], "drive_modified_at": r[3], "tags": r[4]}
+                for r in cur.fetchall()
+            }
+            cur.close()
+            return rows, documents
+        finally:
+            release_connection(conn)
+
+    @staticmethod
+    def _build(rows: list[tuple]) -> dict:
+        index = {
+            "doc_ids": [], "texts": [], "pages": [], "chunk_indexes": [],
+            "matrix": np.zeros((0, 0), dtype=np.float32),
+            "alive": np.zeros(0, dtype=bool),
+            "size": 0,
+            "dead": 0,
+            "rows_by_doc": {},  # document_id -> row positions; only touched under the lock
+        }
+        return MemoryBackend._append(index, rows, [])
+
+    @staticmethod
+    def _append(index: dict, rows: list[tuple], removed: list[int]) -> dict:
+        # Returns a new snapshot. The lists and the matrix buffer are shared
+        # with the old one and only written past its size, so a search still
+        # holding the old snapshot reads exactly what it read before.
+        size = index["size"]
+        alive = np.concatenate([index["alive"], np.ones(len(rows), dtype=bool)])
+        alive[removed] = False
+        matrix = index["matrix"]
+        if rows:
+            vectors = np.stack([np.asarray(r[2], dtype=np.float32) for r in rows])
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+            needed = size + len(rows)
+            if needed > len(matrix):
+                # Doubling keeps appends amortised O(rows written)
+                grown = np.empty((max(needed, 2 * len(matrix)), vectors.shape[1]), dtype=np.float32)
+                if size:
+                    grown[:size] = matrix[:size]
+                matrix = grown
+            matrix[size:needed] = vectors
+            for n, r in enumerate(rows, start=size):
+                index["doc_ids"].append(r[0])
+                index["texts"].append(r[1])
+                index["pages"].append(r[3])
+                index["chunk_indexes"].append(r[4])
+                index["rows_by_doc"].setdefault(r[0], []).append(n)
+        return {
+            **index,
+            "matrix": matrix,
+            "alive": alive,
+            "size": size + len(rows),
+            "dead": index["dead"] + len(removed),
+        }
+
+    @staticmethod
+    def _compact(index: dict) -> dict:
+        live = np.flatnonzero(index["alive"])
+        return MemoryBackend._build([
+            (index["doc_ids"][i], index["texts"][i], index["matrix"][i], index["pages"][i], index["chunk_indexes"][i])
+            for i in live
+        ])
+
+    def load(self):
+        rows, documents = self._fetch()
+        index = self._build(rows)
+        with self._lock:
+            self._index, self._documents = index, documents
+        self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.load()
+
+    def refresh_documents(self, document_ids: list[str]):
+        # Loading reads these documents too; refreshing an unloaded index would
+        # leave it holding only them
+        self.ensure_loaded()
+        fresh_rows, fresh_documents = self._fetch(document_ids)
+        changed = set(document_ids)
+        with self._lock:
+            index = self._index
+            removed = [n for doc_id in changed for n in index["rows_by_doc"].pop(doc_id, [])]
+            index = self._append(index, fresh_rows, removed)
+            # Tombstoned rows still cost scan time; rebuild once they outnumber the live ones
+            if index["dead"] > max(self.COMPACT_MIN_DEAD, index["size"] - index["dead"]):
+                index = self._compact(index)
+            documents = {k: v for k, v in self._documents.items() if k not in changed}
+            documents.update(fresh_documents)
+            self._index, self._documents = index, documents
+
+    def search(self, query_embedding: list[float], top_k: int, filters: dict | None = None) -> list[dict]:
+        self.ensure_loaded()
+        index, documents = self._index, self._documents
+        size = index["size"]
+        if size == index["dead"]:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = index["matrix"][:size] @ query
+
+        mask = index["alive"]
+        if filters:
+            allowed = {d for d, meta in documents.items() if document_matches(meta, filters)}
+            doc_ids, pages = index["doc_ids"], index["pages"]
+            mask = mask & np.array([
+                doc_ids[i] in allowed and chunk_matches(doc_ids[i], pages[i], filters)
+                for i in range(size)
+            ], dtype=bool)
+        scores = np.where(mask, scores, -np.inf)
+
+        k = min(top_k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = [i for i in top[np.argsort(-scores[top])] if np.isfinite(scores[i])]
+        return [
+            to_result((index["doc_ids"][i], index["texts"][i], scores[i], index["pages"][i], index["chunk_indexes"][i]))
+            for i in top
+        ]
+
+    async def asearch(self, query_embedding: list[float], top_k: int, filters: dict | None = None) -> list[dict]:
+        return await asyncio.to_thread(self.search, query_embedding, top_k, filters)
+
+
+BACKENDS = {
+    PgVectorBackend.name: PgVectorBackend,
+    MemoryBackend.name: MemoryBackend,
+}
+
+_backend: VectorBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> VectorBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_cls = BACKENDS.get(settings.vector_backend)
+                if backend_cls is None:
+                    raise ValueError(f"Unknown VECTOR_BACKEND: {settings.vector_backend}")
+                _backend = backend_cls()
+    return _backend
@@ -0,0 +1,562 @@
+"""pgvector index management for rag.embeddings.
+
+Migration 001 built an ivfflat index (lists = 100) on an empty table, and
+searches ran with the default ivfflat.probes = 1, so recall and latency
+drifted as documents were added. This module owns that index instead:
+
+- choose: HNSW up to VECTOR_INDEX_HNSW_MAX_ROWS rows, ivfflat above that
+  (lists = rows / 1000, sqrt(rows) past 1M rows), where HNSW build time and
+  memory get too large
+- rebuild: CREATE INDEX CONCURRENTLY under a temporary name, then swap it
+  in, so searches keep an index and writes are never blocked. Ingest jobs
+  and the backfill trigger it once the row count has moved by
+  VECTOR_INDEX_REBUILD_GROWTH since the last build
+- drop: below VECTOR_INDEX_MIN_ROWS an ivfflat index (above all the
+  untrained one from migration 001) is dropped, so searches scan exactly
+  instead of probing centroids that describe no data; until then, searches
+  bypass an uncalibrated ivfflat index the manager did not build
+- calibrate: recall@k against exact scans for a sweep of hnsw.ef_search /
+  ivfflat.probes values, saved as a curve
+- search_setting(): per query, the smallest value on the curve that reaches
+  VECTOR_RECALL_TARGET (rule-of-thumb defaults until calibrated)
+
+Build time, size, rows at build and the curve live in rag.vector_index_state
+(migration 006).
+
+Usage (from apps/rag):
+    python -m rag.vector_index status
+    python -m rag.vector_index rebuild [--type hnsw|ivfflat] [--no-calibrate]
+    python -m rag.vector_index calibrate [--target 0.95] [--queries 100] [--k 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import statistics
+import threading
+import time
+
+import numpy as np
+import psycopg2
+
+from core.config import settings
+from db.session import async_connection, get_connection, release_connection
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "idx_rag_embeddings_vector"
+BUILD_NAME = INDEX_NAME + "_new"
+REBUILD_LOCK_KEY = 0x7261_6769  # pg advisory lock: one rebuild at a time across processes
+SEARCH_GUCS = {"hnsw": "hnsw.ef_search", "ivfflat": "ivfflat.probes"}
+HNSW_MAX_EF_SEARCH = 1000  # pgvector's upper bound
+HNSW_EF_SWEEP = (10, 20, 40, 64, 100, 150, 200, 300, 400, 600, 800, 1000)
+STATE_TTL_SECONDS = 60
+CHECK_INTERVAL_SECONDS = 60
+
+STATE_SQL = """
+    SELECT am.amname, c.reloptions, pg_relation_size(c.oid), s.rows_at_build, s.build_seconds,
+           s.built_at, s.curve, s.curve_k, s.calibrated_at
+    FROM pg_class c
+    JOIN pg_am am ON am.oid = c.relam
+    LEFT JOIN rag.vector_index_state s ON s.index_type = am.amname
+    WHERE c.oid = to_regclass('rag.{name}')
+""".format(name=INDEX_NAME)
+
+SAVE_BUILD_SQL = """
+    INSERT INTO rag.vector_index_state (index_type, params, rows_at_build, build_seconds, size_bytes, built_at)
+    VALUES (%s, %s, %s, %s, %s, now())
+    ON CONFLICT (id) DO UPDATE
+    SET index_type = EXCLUDED.index_type,
+        params = EXCLUDED.params,
+        rows_at_build = EXCLUDED.rows_at_build,
+        build_seconds = EXCLUDED.build_seconds,
+        size_bytes = EXCLUDED.size_bytes,
+        built_at = EXCLUDED.built_at,
+        curve = NULL,
+        curve_k = NULL,
+        calibrated_at = NULL
+"""
+
+SAVE_CURVE_SQL = """
+    INSERT INTO rag.vector_index_state (index_type, params, size_bytes, curve, curve_k, calibrated_at)
+    VALUES (%s, %s, %s, %s, %s, now())
+    ON CONFLICT (id) DO UPDATE
+    SET curve = EXCLUDED.curve,
+        curve_k = EXCLUDED.curve_k,
+        calibrated_at = EXCLUDED.calibrated_at,
+        -- The live index replaced the recorded one outside the manager
+        rows_at_build = CASE WHEN vector_index_state.index_type = EXCLUDED.index_type
+                             THEN vector_index_state.rows_at_build END,
+        index_type = EXCLUDED.index_type,
+        params = EXCLUDED.params,
+        size_bytes = EXCLUDED.size_bytes
+"""
+
+
+# ─── Choosing the index ──────────────────────────────────────────────────────
+
+def choose_index(rows: int, index_type: str | None = None) -> tuple[str, dict]:
+    index_type = index_type or settings.vector_index_type
+    if index_type == "auto":
+        index_type = "hnsw" if rows <= settings.vector_index_hnsw_max_rows else "ivfflat"
+    if index_type == "hnsw":
+        return "hnsw", {"m": settings.vector_index_hnsw_m, "ef_construction": settings.vector_index_hnsw_ef_construction}
+    if index_type == "ivfflat":
+        # pgvector's guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond
+        lists = rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows))
+        return "ivfflat", {"lists": max(lists, 10)}
+    raise ValueError(f"Unknown VECTOR_INDEX_TYPE: {index_type}")
+
+
+def index_ddl(name: str, index_type: str, params: dict) -> str:
+    # Index names cannot be schema-qualified; it lands in rag with the table
+    options = ", ".join(f"{key} = {int(value)}" for key, value in params.items())
+    return (
+        f"CREATE INDEX CONCURRENTLY {name} ON rag.embeddings "
+        f"USING {index_type} (embedding vector_cosine_ops) WITH ({options})"
+    )
+
+
+def needs_drop(state: dict | None, rows: int) -> str | None:
+    """Why the index should be dropped in favour of exact scans, or None."""
+    if rows >= settings.vector_index_min_rows or state is None or state["index_type"] != "ivfflat":
+        return None
+    # ivfflat centroids are trained at build time; on a table this small an exact
+    # scan is cheap and always right. HNSW needs no training and stays
+    return f"{rows} rows are below VECTOR_INDEX_MIN_ROWS for ivfflat"
+
+
+def needs_rebuild(state: dict | None, rows: int) -> str | None:
+    """Why the index should be rebuilt for `rows` rows, or None."""
+    if rows < settings.vector_index_min_rows:
+        return None
+    if state is None:
+        return "no vector index"
+    if state["rows_at_build"] is None:
+        return "index was not built by the index manager"
+    index_type, params = choose_index(rows)
+    if index_type != state["index_type"]:
+        return f"{rows} rows call for {index_type}"
+    built = max(state["rows_at_build"], 1)
+    if abs(rows - built) / built >= settings.vector_index_rebuild_growth:
+        return f"row count moved from {state['rows_at_build']} to {rows}"
+    return None
+
+
+# ─── Index state (cached) ────────────────────────────────────────────────────
+
+_state = {"value": None, "loaded_at": float("-inf")}
+_state_lock = threading.Lock()
+_state_alock = asyncio.Lock()
+_warned = False
+
+
+def _parse_state(row) -> dict | None:
+    if row is None:
+        return None
+    index_type, reloptions, size, rows_at_build, build_seconds, built_at, curve, curve_k, calibrated_at = row
+    params = {}
+    for option in reloptions or []:
+        key, _, value = option.partition("=")
+        params[key] = int(value) if value.isdigit() else value
+    if isinstance(curve, str):
+        curve = json.loads(curve)  # asyncpg returns jsonb as text
+    return {
+        "index_type": index_type,
+        "params": params,
+        "size_bytes": size,
+        "rows_at_build": rows_at_build,
+        "build_seconds": build_seconds,
+        "built_at": built_at.isoformat() if built_at else None,
+        "curve": curve,
+        "curve_k": curve_k,
+        "calibrated_at": calibrated_at.isoformat() if calibrated_at else None,
+    }
+
+
+def _state_failed(e: Exception):
+    global _warned
+    if not _warned:
+        logger.warning("Could not read the vector index state (is migration 006 applied?): %s", e)
+        _warned = True
+
+
+def _fresh() -> bool:
+    return time.monotonic() - _state["loaded_at"] < STATE_TTL_SECONDS
+
+
+def _store(value: dict | None) -> dict | None:
+    _state["value"], _state["loaded_at"] = value, time.monotonic()
+    return value
+
+
+def load_index_state() -> dict | None:
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(STATE_SQL)
+        row = cur.fetchone()
+        cur.close()
+        return _parse_state(row)
+    finally:
+        release_connection(conn)
+
+
+def get_index_state() -> dict | None:
+    if _fresh():
+        return _state["value"]
+    with _state_lock:
+        if _fresh():
+            return _state["value"]
+        try:
+            return _store(load_index_state())
+        except psycopg2.Error as e:
+            _state_failed(e)
+            return _store(None)
+
+
+async def aget_index_state() -> dict | None:
+    if _fresh():
+        return _state["value"]
+    async with _state_alock:
+        if _fresh():
+            return _state["value"]
+        try:
+            async with async_connection() as conn:
+                return _store(_parse_state(await conn.fetchrow(STATE_SQL)))
+        except Exception as e:
+            _state_failed(e)
+            return _store(None)
+
+
+def invalidate_index_state():
+    _state["loaded_at"] = float("-inf")
+
+
+# ─── Per-query search settings ───────────────────────────────────────────────
+
+def pick_from_curve(curve: list | None, target: float) -> int | None:
+    if not curve:
+        return None
+    for value, recall, _ in curve:
+        if recall >= target:
+            return int(value)
+    return int(curve[-1][0])  # Target out of reach: the best measured
+
+
+def default_search_value(index_type: str, params: dict, target: float) -> int:
+    # Rules of thumb until `calibrate` has measured this index
+    if index_type == "hnsw":
+        return 40 if target <= 0.9 else 100 if target <= 0.95 else 200 if target <= 0.98 else 400
+    lists = params.get("lists", 100)
+    factor = 1 if target <= 0.9 else 2 if target <= 0.95 else 4 if target <= 0.98 else 8
+    return min(lists, math.ceil(math.sqrt(lists) * factor))
+
+
+def search_setting(state: dict | None, top_k: int, filtered: bool = False,
+                   target: float | None = None) -> tuple[str, int | str] | None:
+    """(GUC, value) to SET LOCAL before a vector search, or None for no index."""
+    if state is None or state["index_type"] not in SEARCH_GUCS:
+        return None
+    if state["index_type"] == "ivfflat" and state["rows_at_build"] is None and not state["curve"]:
+        # Probably migration 001's index, trained on an empty table: no probes
+        # value gives usable recall, so scan exactly until it is rebuilt or dropped
+        return "enable_indexscan", "off"
+    target = settings.vector_recall_target if target is None else target
+    index_type = state["index_type"]
+    value = pick_from_curve(state["curve"], target) or default_search_value(index_type, state["params"], target)
+    if filtered:
+        # Filters drop rows after the index scan, so scan further to still fill top_k
+        value *= settings.vector_filtered_search_factor
+    if index_type == "hnsw":
+        return SEARCH_GUCS[index_type], min(max(value, top_k), HNSW_MAX_EF_SEARCH)
+    return SEARCH_GUCS[index_type], min(value, state["params"].get("lists", value))
+
+
+def index_stats() -> dict | None:
+    # Cached state only — no database round trip for /rag/ingest/status
+    state = _state["value"]
+    if state is None:
+        return None
+    setting = search_setting(state, top_k=settings.hybrid_candidates)
+    return {
+        **{k: v for k, v in state.items() if k != "curve"},
+        "calibrated": bool(state["curve"]),
+        "recall_target": settings.vector_recall_target,
+        "search": {setting[0]: setting[1]} if setting else None,
+    }
+
+
+# ─── Rebuild ─────────────────────────────────────────────────────────────────
+
+def _corpus_rows() -> int:
+    from rag.vector_store import get_corpus_counts
+
+    return get_corpus_counts()["total_chunks"]
+
+
+def rebuild(index_type: str | None = None) -> dict:
+    """Build a fresh index concurrently and swap it in. Returns the build report."""
+    rows = _corpus_rows()
+    index_type, params = choose_index(rows, index_type)
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run in a transaction, and a build can
+    # take minutes, so it gets its own autocommit connection rather than a pool slot
+    conn = psycopg2.connect(settings.database_url)
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (REBUILD_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            raise RuntimeError("another vector index rebuild is running")
+        if settings.vector_index_maintenance_work_mem:
+            cur.execute("SET maintenance_work_mem = %s", (settings.vector_index_maintenance_work_mem,))
+
+        # A failed concurrent build leaves an INVALID index behind
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS rag.{BUILD_NAME}")
+        logger.info("Building %s index %s on %d rows", index_type, params, rows)
+        start = time.perf_counter()
+        cur.execute(index_ddl(BUILD_NAME, index_type, params))
+        build_seconds = time.perf_counter() - start
+
+        # Searches use whichever index exists during the swap
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS rag.{INDEX_NAME}")
+        cur.execute(f"ALTER INDEX rag.{BUILD_NAME} RENAME TO {INDEX_NAME}")
+        cur.execute(f"SELECT pg_relation_size('rag.{INDEX_NAME}')")
+        size_bytes = cur.fetchone()[0]
+        cur.execute(SAVE_BUILD_SQL, (index_type, json.dumps(params), rows, build_seconds, size_bytes))
+        cur.close()
+    finally:
+        conn.close()  # Also releases the advisory lock
+
+    invalidate_index_state()
+    report = {
+        "index_type": index_type,
+        "params": params,
+        "rows": rows,
+        "build_seconds": round(build_seconds, 2),
+        "size_bytes": size_bytes,
+    }
+    logger.info("Vector index rebuilt: %s", report)
+    return report
+
+
+def drop_index() -> None:
+    conn = psycopg2.connect(settings.database_url)
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (REBUILD_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            raise RuntimeError("another vector index rebuild is running")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS rag.{INDEX_NAME}")
+        cur.execute("DELETE FROM rag.vector_index_state")
+        cur.close()
+    finally:
+        conn.close()
+    invalidate_index_state()
+    logger.info("Vector index dropped; searches scan exactly")
+
+
+def maybe_rebuild(calibrate_after: bool = True) -> dict | None:
+    """Rebuild or drop the index when the row count calls for it. None when neither."""
+    rows = _corpus_rows()
+    state = load_index_state()
+    reason = needs_drop(state, rows)
+    if reason is not None:
+        logger.info("Dropping the vector index: %s", reason)
+        drop_index()
+        return {"reason": reason, "dropped": True, "rows": rows}
+    reason = needs_rebuild(state, rows)
+    if reason is None:
+        return None
+    logger.info("Rebuilding the vector index: %s", reason)
+    report = {"reason": reason, **rebuild()}
+    if calibrate_after:
+        report["calibration"] = calibrate()
+    return report
+
+
+_check_lock = threading.Lock()
+_last_check = 0.0
+
+
+def schedule_check():
+    # Called after ingest jobs; at most one check per CHECK_INTERVAL_SECONDS,
+    # in a background thread so the job worker is not held up by a build
+    global _last_check
+    if not settings.vector_index_auto_rebuild or settings.vector_backend != "pgvector":
+        return
+    if time.monotonic() - _last_check < CHECK_INTERVAL_SECONDS or not _check_lock.acquire(blocking=False):
+        return
+    _last_check = time.monotonic()
+    threading.Thread(target=_check, name="vector-index-check", daemon=True).start()
+
+
+def _check():
+    try:
+        maybe_rebuild()
+    except Exception:
+        logger.exception("Vector index check failed")
+    finally:
+        _check_lock.release()
+
+
+# ─── Calibration ─────────────────────────────────────────────────────────────
+
+NEIGHBOURS_SQL = "SELECT id FROM rag.embeddings ORDER BY embedding <=> %s LIMIT %s"
+
+
+def _search_ids(cur, query: np.ndarray, k: int, setup: tuple[str, str]) -> tuple[set, float]:
+    cur.execute("SELECT set_config(%s, %s, true)", setup)
+    start = time.perf_counter()
+    cur.execute(NEIGHBOURS_SQL, (query, k))
+    elapsed = (time.perf_counter() - start) * 1000
+    ids = {r[0] for r in cur.fetchall()}
+    cur.connection.rollback()  # Ends the transaction, dropping the local setting
+    return ids, elapsed
+
+
+def sweep_values(state: dict, k: int) -> list[int]:
+    if state["index_type"] == "hnsw":
+        return [v for v in HNSW_EF_SWEEP if v >= k] or [HNSW_MAX_EF_SEARCH]
+    lists = state["params"].get("lists", 100)
+    values = [2 ** i for i in range(int(math.log2(lists)) + 1)]
+    return values + ([lists] if values[-1] != lists else [])
+
+
+def calibrate(target: float | None = None, queries: int = 100, k: int = 20, noise: float = 0.05) -> dict:
+    """Measure recall@k of the live index against exact scans and save the curve.
+
+    Queries are stored chunk embeddings with a little noise, so each has
+    close neighbours like a real question. k defaults to the hybrid
+    candidate count, which is what the vector half of a query fetches.
+    """
+    target = settings.vector_recall_target if target is None else target
+    state = load_index_state()
+    if state is None or state["index_type"] not in SEARCH_GUCS:
+        raise RuntimeError("no vector index to calibrate — run `python -m rag.vector_index rebuild` first")
+    guc = SEARCH_GUCS[state["index_type"]]
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT embedding FROM rag.embeddings ORDER BY random() LIMIT %s", (queries,))
+        rng = np.random.default_rng(0)
+        samples = [np.asarray(r[0], dtype=np.float32) for r in cur.fetchall()]
+        conn.rollback()
+        if not samples:
+            raise RuntimeError("rag.embeddings is empty")
+        vectors = [s + rng.normal(0, noise, s.shape).astype(np.float32) for s in samples]
+
+        exact, exact_ms = [], []
+        for q in vectors:
+            ids, ms = _search_ids(cur, q, k, ("enable_indexscan", "off"))
+            exact.append(ids)
+            exact_ms.append(ms)
+
+        curve = []
+        for value in sweep_values(state, k):
+            recalls, latencies = [], []
+            for q, truth in zip(vectors, exact):
+                ids, ms = _search_ids(cur, q, k, (guc, str(value)))
+                recalls.append(len(ids & truth) / len(truth) if truth else 1.0)
+                latencies.append(ms)
+            curve.append([value, round(statistics.mean(recalls), 4), round(statistics.median(latencies), 3)])
+            if curve[-1][1] >= 0.999:
+                break  # Larger values only cost latency
+
+        cur.execute(SAVE_CURVE_SQL, (state["index_type"], json.dumps(state["params"]), state["size_bytes"],
+                                     json.dumps(curve), k))
+        conn.commit()
+        cur.close()
+    finally:
+        release_connection(conn)
+
+    invalidate_index_state()
+    return {
+        "index_type": state["index_type"],
+        "queries": len(vectors),
+        "k": k,
+        "target": target,
+        "setting": {guc: pick_from_curve(curve, target)},
+        "exact_p50_ms": round(statistics.median(exact_ms), 3),
+        "curve": curve,
+    }
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+
+def _megabytes(size: int | None) -> str:
+    return f"{size / 2**20:.1f} MB" if size is not None else "-"
+
+
+def print_status():
+    rows = _corpus_rows()
+    state = load_index_state()
+    wanted, wanted_params = choose_index(rows)
+    print(f"rows          {rows}")
+    if state is None:
+        print("index         none (exact scans)")
+    else:
+        print(f"index         {state['index_type']} {state['params']}, {_megabytes(state['size_bytes'])}")
+        if state["rows_at_build"] is not None:
+            print(f"built         {state['built_at']} on {state['rows_at_build']} rows in {state['build_seconds']:.1f} s")
+        else:
+            print("built         outside the index manager (e.g. migration 001)")
+        setting = search_setting(state, top_k=settings.hybrid_candidates)
+        source = f"calibrated {state['calibrated_at']}, k={state['curve_k']}" if state["curve"] else "not calibrated, rule of thumb"
+        print(f"search        {setting[0]} = {setting[1]} for recall {settings.vector_recall_target} ({source})")
+        for value, recall, p50 in state["curve"] or []:
+            print(f"  {value:>6}  recall {recall:.3f}  p50 {p50:.2f} ms")
+    print(f"recommended   {wanted} {wanted_params}")
+    drop = needs_drop(state, rows)
+    print(f"rebuild       {f'drop ({drop})' if drop else needs_rebuild(state, rows) or 'not needed'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Index type, size, build and search settings")
+    rebuild_cmd = commands.add_parser("rebuild", help="Build a new index concurrently and swap it in")
+    rebuild_cmd.add_argument("--type", choices=["auto", "hnsw", "ivfflat"], default=None)
+    rebuild_cmd.add_argument("--if-needed", action="store_true", help="Only when the row count calls for it")
+    rebuild_cmd.add_argument("--no-calibrate", action="store_true")
+    calibrate_cmd = commands.add_parser("calibrate", help="Measure recall per ef_search / probes value")
+    calibrate_cmd.add_argument("--target", type=float, default=None)
+    calibrate_cmd.add_argument("--queries", type=int, default=100)
+    calibrate_cmd.add_argument("--k", type=int, default=settings.hybrid_candidates)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "status":
+        print_status()
+        return
+    if args.command == "rebuild":
+        if args.if_needed:
+            report = maybe_rebuild(calibrate_after=not args.no_calibrate)
+            if report is None:
+                print("rebuild not needed")
+                return
+            if report.get("dropped"):
+                print(f"dropped the vector index ({report['reason']}); searches scan exactly")
+                return
+        else:
+            report = rebuild(args.type)
+            if not args.no_calibrate:
+                report["calibration"] = calibrate()
+        print(f"built {report['index_type']} {report['params']} on {report['rows']} rows "
+              f"in {report['build_seconds']} s, {_megabytes(report['size_bytes'])}")
+        calibration = report.get("calibration")
+    else:
+        calibration = calibrate(args.target, args.queries, args.k)
+    if calibration:
+        print(f"{'value':>6} {'recall@k':>9} {'p50 ms':>8}   (exact scan p50 {calibration['exact_p50_ms']} ms)")
+        for value, recall, p50 in calibration["curve"]:
+            print(f"{value:>6} {recall:>9.3f} {p50:>8.2f}")
+        print(f"recall target {calibration['target']}: {calibration['setting']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,267 @@
-from db.session import get_connection, release_connection
+import logging
+import time
+from itertools import islice
+from typing import Iterable
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+from db.session import async_connection, get_connection, release_connection
+from rag.answer_cache import answer_cache
+from rag.chunker import hash_chunk
+from rag.vector_backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Rows per multi-row INSERT statement sent by execute_values
+INSERT_PAGE_SIZE = 500
+
+CORPUS_GENERATION_SQL = "SELECT generation FROM rag.corpus_stats"
+_generation_warned = False
+
+
+def search_similar_chunks(query_embedding: list[float], top_k: int = 5, filters: dict | None = None) -> list[dict]:
+    return get_backend().search(query_embedding, top_k, filters)
+
+
+async def asearch_similar_chunks(query_embedding: list[float], top_k: int = 5, filters: dict | None = None) -> list[dict]:
+    return await get_backend().asearch(query_embedding, top_k, filters)
+
+
+def _after_write(document_ids: list[str], content_changed: bool = True, refresh_backend: bool = True):
+    if content_changed:
+        answer_cache.invalidate_documents(document_ids)
+    if refresh_backend:
+        get_backend().refresh_documents(document_ids)
+
+
+def _upsert_document(cur, document_id: str, metadata: dict | None):
+    # Document-level metadata (see filters.py) — one row per document
+    metadata = metadata or {}
+    if not metadata:
+        cur.execute(
+            "INSERT INTO rag.documents (document_id) VALUES (%s) ON CONFLICT (document_id) DO NOTHING",
+            (document_id,),
+        )
+        return
+    cur.execute(
+        """
+        INSERT INTO rag.documents (document_id, source_filename, mime_type, drive_modified_at, tags, updated_at)
+        VALUES (%s, %s, %s, %s, %s, now())
+        ON CONFLICT (document_id) DO UPDATE
+        SET source_filename = EXCLUDED.source_filename,
+            mime_type = EXCLUDED.mime_type,
+            drive_modified_at = EXCLUDED.drive_modified_at,
+            tags = EXCLUDED.tags,
+            updated_at = now()
+        """,
+        (
+            document_id,
+            metadata.get("source_filename"),
+            metadata.get("mime_type"),
+            metadata.get("drive_modified_at"),
+            list(metadata.get("tags") or []),
+        ),
+    )
+
+
+def _insert_rows(cur, document_id: str, rows: list[tuple]):
+    # rows are (chunk_index, chunk_text, content_hash, embedding, page_number).
+    # Embeddings go over as numpy arrays — register_vector adapts them to
+    # pgvector natively. chunk_tsv backs the lexical half of hybrid retrieval
+    # and is built here so the GIN index stays in step with every write.
+    execute_values(
+        cur,
+        """
+        INSERT INTO rag.embeddings
+            (document_id, chunk_index, chunk_text, content_hash, embedding, page_number, chunk_tsv)
+        VALUES %s
+        """,
+        [
+            (document_id, idx, chunk, content_hash, np.asarray(embedding, dtype=np.float32), page, chunk)
+            for idx, chunk, content_hash, embedding, page in rows
+        ],
+        template="(%s, %s, %s, %s, %s, %s, to_tsvector('simple', %s))",
+        page_size=INSERT_PAGE_SIZE,
+    )
+
+
+def save_chunks(
+    document_id: str,
+    chunks: list[str],
+    embeddings: list[list[float]],
+    metadata: dict | None = None,
+    pages: list[int | None] | None = None,
+) -> dict:
+    pages = pages or [None] * len(chunks)
+    rows = [
+        (idx, chunk, hash_chunk(chunk), embedding, page)
+        for idx, (chunk, embedding, page) in enumerate(zip(chunks, embeddings, pages))
+    ]
 
-def search_similar_chunks(query_embedding: list[float], top_k: int = 5) -> list[dict]:
+    conn = get_connection()
+    try:
+        start = time.perf_counter()
+        cur = conn.cursor()
+        cur.execute("DELETE FROM rag.embeddings WHERE document_id = %s", (document_id,))
+        _upsert_document(cur, document_id, metadata)
+        _insert_rows(cur, document_id, rows)
+        conn.commit()
+        cur.close()
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        release_connection(conn)
+
+    _after_write([document_id])
+    return {
+        "rows": len(rows),
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def get_chunk_hashes(document_id: str) -> list[tuple[int, int, str | None, int | None]]:
+    """(id, chunk_index, content_hash, page_number) for every stored chunk of a document."""
     conn = get_connection()
     try:
         cur = conn.cursor()
-        
-        # Convert to string format pgvector understands
-        embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
-        
         cur.execute(
-            """
-            SELECT
-                document_id,
-                chunk_text,
-                1 - (embedding <=> %s::vector) AS score
-            FROM rag.embeddings
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-            """,
-            (embedding_str, embedding_str, top_k)
+            "SELECT id, chunk_index, content_hash, page_number FROM rag.embeddings WHERE document_id = %s",
+            (document_id,),
         )
         rows = cur.fetchall()
         cur.close()
-        return [
-            {
-                "document_id": row[0],
-                "chunk_text": row[1],
-                "score": float(row[2])
-            }
-            for row in rows
-        ]
+        return rows
     finally:
         release_connection(conn)
 
-def save_chunks(document_id: str, chunks: list[str], embeddings: list[list[float]]):
+
+def apply_chunk_diff(
+    document_id: str,
+    inserts: Iterable[tuple[int, str, str, list[float], int | None]],
+    reindex: list[tuple[int, int, int | None]],
+    delete_ids: list[int],
+    metadata: dict | None = None,
+    refresh_backend: bool = True,
+) -> dict:
+    """Apply an incremental re-ingest in one transaction.
+
+    inserts are (chunk_index, chunk_text, content_hash, embedding, page_number)
+    for new or changed chunks (any iterable, consumed in pages of
+    INSERT_PAGE_SIZE — embed before calling, not lazily, or the transaction
+    and its locks stay open for the whole encode), reindex are (row id, chunk_index, page_number)
+    for unchanged chunks whose position moved, and delete_ids are rows whose
+    content is gone. refresh_backend=False skips the search backend refresh,
+    for bulk writers that do not search (rag.backfill).
+    """
     conn = get_connection()
     try:
+        start = time.perf_counter()
         cur = conn.cursor()
-        cur.execute("DELETE FROM rag.embeddings WHERE document_id = %s", (document_id,))
-
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
-            cur.execute(
+        _upsert_document(cur, document_id, metadata)
+        if delete_ids:
+            cur.execute("DELETE FROM rag.embeddings WHERE id = ANY(%s)", (delete_ids,))
+        if reindex:
+            execute_values(
+                cur,
                 """
-                INSERT INTO rag.embeddings (document_id, chunk_index, chunk_text, embedding)
-                VALUES (%s, %s, %s, %s::vector)
+                UPDATE rag.embeddings AS e
+                SET chunk_index = v.chunk_index, page_number = v.page_number
+                FROM (VALUES %s) AS v (id, chunk_index, page_number)
+                WHERE e.id = v.id
                 """,
-                (document_id, idx, chunk, embedding_str)
+                reindex,
+                template="(%s, %s, %s::int)",
+                page_size=INSERT_PAGE_SIZE,
             )
+        inserted = 0
+        rows = iter(inserts)
+        while batch := list(islice(rows, INSERT_PAGE_SIZE)):
+            _insert_rows(cur, document_id, batch)
+            inserted += len(batch)
+        conn.commit()
+        cur.close()
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        release_connection(conn)
+
+    _after_write([document_id], content_changed=bool(inserted or reindex or delete_ids), refresh_backend=refresh_backend)
+    return {
+        "rows": inserted,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(inserted / elapsed, 1) if elapsed > 0 and inserted else None,
+    }
+
 
+def delete_documents(document_ids: list[str]) -> int:
+    if not document_ids:
+        return 0
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM rag.embeddings WHERE document_id = ANY(%s)", (list(document_ids),))
+        deleted = cur.rowcount
+        cur.execute("DELETE FROM rag.documents WHERE document_id = ANY(%s)", (list(document_ids),))
         conn.commit()
         cur.close()
     except Exception as e:
         conn.rollback()
         raise e
     finally:
-        release_connection(conn)
\ No newline at end of file
+        release_connection(conn)
+
+    _after_write(list(document_ids))
+    return deleted
+
+
+def get_corpus_counts() -> dict:
+    # Kept up to date by triggers on rag.embeddings (migration 005) — no table scan
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT total_chunks, total_documents FROM rag.corpus_stats")
+        row = cur.fetchone() or (0, 0)
+        cur.close()
+        return {"total_chunks": row[0], "total_documents": row[1]}
+    finally:
+        release_connection(conn)
+
+
+def _generation_failed(e: Exception) -> None:
+    global _generation_warned
+    if not _generation_warned:
+        logger.warning("Could not read the corpus generation (is migration 007 applied?): %s", e)
+        _generation_warned = True
+
+
+def get_corpus_generation() -> int | None:
+    # Bumped by triggers on rag.embeddings (migration 007), so every process's
+    # answer cache sees writes made by the others. None when unavailable
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(CORPUS_GENERATION_SQL)
+        row = cur.fetchone()
+        cur.close()
+        return row[0] if row else None
+    except psycopg2.Error as e:
+        _generation_failed(e)
+        return None
+    finally:
+        release_connection(conn)
+
+
+async def aget_corpus_generation() -> int | None:
+    try:
+        async with async_connection() as conn:
+            return await conn.fetchval(CORPUS_GENERATION_SQL)
+    except Exception as e:
+        _generation_failed(e)
+        return None
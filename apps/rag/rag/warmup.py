@@ -0,0 +1,106 @@
+"""Startup warm-up and readiness state.
+
+Nothing heavy is loaded at import time, so the app starts serving /health
+immediately. The lifespan then runs warm_up() in the background: each
+component is initialised and timed, and /ready answers 503 until all of
+them are up. Failed steps are retried every WARMUP_RETRY_SECONDS (and
+requests still initialise things lazily in the meantime).
+"""
+import asyncio
+import logging
+import time
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_components: dict[str, dict] = {}
+
+
+def _load_embedding_model():
+    from rag.embeddings import generate_embeddings
+
+    generate_embeddings(["warm-up"])  # Loads the engine and runs one forward pass
+
+
+def _load_llm_clients():
+    from rag.llm import get_async_client, get_client
+
+    get_client()
+    get_async_client()
+
+
+def _open_db_pool():
+    from db.session import get_pool
+
+    get_pool()
+
+
+async def _open_async_db_pool():
+    from db.session import get_async_pool
+
+    await get_async_pool()
+
+
+def _load_vector_backend():
+    from rag.vector_backends import get_backend
+
+    get_backend().ensure_loaded()
+
+
+def _load_reranker():
+    from rag.rerank import reranker
+
+    if reranker is not None:
+        reranker.warm_up()  # Load and time a forward pass to seed the latency estimate
+
+
+# Run in order; sync steps go to a thread so the event loop keeps serving
+STEPS = [
+    ("db_pool", _open_db_pool),
+    ("async_db_pool", _open_async_db_pool),
+    ("vector_backend", _load_vector_backend),
+    ("llm_clients", _load_llm_clients),
+    ("embedding_model", _load_embedding_model),
+    ("reranker", _load_reranker),
+]
+
+
+async def _run(name: str, step):
+    start = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(step):
+            await step()
+        else:
+            await asyncio.to_thread(step)
+        _components[name] = {"status": "ok", "seconds": round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        logger.exception("Warm-up step %s failed", name)
+        _components[name] = {
+            "status": "error",
+            "seconds": round(time.perf_counter() - start, 3),
+            "error": " ".join(str(e).split()),
+        }
+
+
+async def warm_up():
+    for name, _ in STEPS:
+        _components[name] = {"status": "pending"}
+    pending = STEPS
+    while True:
+        for name, step in pending:
+            await _run(name, step)
+        logger.info("Warm-up: %s", {k: v["status"] for k, v in _components.items()})
+        pending = [(name, step) for name, step in pending if _components[name]["status"] != "ok"]
+        if not pending:
+            return
+        # e.g. the database was briefly unreachable — keep /ready honest until it is back
+        await asyncio.sleep(settings.warmup_retry_seconds)
+
+
+def readiness() -> dict:
+    if not settings.warmup_on_startup:
+        # Components load lazily on first request — nothing to wait for
+        return {"ready": True, "components": {}}
+    ready = bool(_components) and all(c["status"] == "ok" for c in _components.values())
+    return {"ready": ready, "components": dict(_components)}
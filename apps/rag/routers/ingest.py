@@ -1,6 +1,17 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from rag.ingest import ingest_file
-from db.session import get_connection, release_connection
+from fastapi.concurrency import run_in_threadpool
+from rag.embeddings import cache_stats
+from rag.answer_cache import answer_cache
+from rag.rerank import reranker
+from rag.context import context_stats
+from rag.intent import booking_router_stats
+from rag.llm_gateway import gateway
+from rag.rooms import room_cache_stats
+from rag.jobs import enqueue_file, enqueue_sync, get_job
+from rag.metrics import set_corpus_counts
+from rag.vector_index import index_stats
+from rag.vector_store import get_corpus_counts
+from db.session import pool_stats
 import mimetypes
 
 router = APIRouter()
@@ -11,10 +22,11 @@ SUPPORTED_TYPES = [
     "text/plain",
 ]
 
-@router.post("/ingest/file")
+@router.post("/ingest/file", status_code=202)
 async def ingest_file_endpoint(
     file: UploadFile = File(...),
-    document_id: str = Form(...)
+    document_id: str = Form(...),
+    tags: str = Form("")  # Comma-separated, e.g. "timetable,2025-sem2"
 ):
     # Detect from filename if content_type is generic
     content_type = file.content_type
@@ -28,41 +40,48 @@ async def ingest_file_endpoint(
             detail=f"Unsupported file type: {content_type}"
         )
 
-    file_bytes = await file.read()
+    # Parsing, embedding and DB writes happen in the job workers
+    metadata = {
+        "source_filename": file.filename,
+        "tags": [t.strip() for t in tags.split(",") if t.strip()],
+    }
+    job_id = await run_in_threadpool(enqueue_file, file.file, content_type, document_id, metadata)
+    return {
+        "job_id": job_id,
+        "document_id": document_id,
+        "status": "queued"
+    }
 
-    try:
-        result = ingest_file(file_bytes, content_type, document_id)
-        return result
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
-
-@router.post("/ingest/sync")
+@router.post("/ingest/sync", status_code=202)
 async def sync_endpoint():
-    try:
-        from rag.drive_sync import sync_drive_folder
-        result = sync_drive_folder()
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job_id = await run_in_threadpool(enqueue_sync)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/ingest/jobs/{job_id}")
+async def job_endpoint(job_id: str):
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @router.get("/ingest/status")
 async def status_endpoint():
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM rag.embeddings")
-        total_chunks = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(DISTINCT document_id) FROM rag.embeddings")
-        total_docs = cur.fetchone()[0]
-        cur.close()
-        return {
-            "total_documents": total_docs,
-            "total_chunks": total_chunks,
-            "status": "ok"
-        }
-    finally:
-        release_connection(conn)
\ No newline at end of file
+    counts = await run_in_threadpool(get_corpus_counts)
+    set_corpus_counts(counts["total_chunks"], counts["total_documents"])
+    return {
+        "total_documents": counts["total_documents"],
+        "total_chunks": counts["total_chunks"],
+        "embedding_cache": cache_stats(),
+        "answer_cache": answer_cache.stats(),
+        "reranker": reranker.stats() if reranker is not None else None,
+        "context": context_stats(),
+        "db_pool": pool_stats(),
+        "rooms": room_cache_stats(),
+        "booking_router": booking_router_stats(),
+        "llm": gateway.stats(),
+        "vector_index": index_stats(),
+        "status": "ok"
+    }
@@ -1,15 +1,58 @@
+import json
+from contextlib import aclosing
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from rag.query import query_rag
+from rag.query import aquery_rag, astream_query_rag
 
 router = APIRouter()
 
+
+class QueryFilters(BaseModel):
+    # Pushed down into the search query — see rag/filters.py
+    document_ids: list[str] | None = None
+    mime_types: list[str] | None = None
+    source_filenames: list[str] | None = None
+    tags: list[str] | None = None  # Matches documents with any of these tags
+    modified_after: datetime | None = None
+    modified_before: datetime | None = None
+    page_from: int | None = None
+    page_to: int | None = None
+
+
 class QueryRequest(BaseModel):
     message: str
+    filters: QueryFilters | None = None
+
+    def filter_dict(self) -> dict | None:
+        if self.filters is None:
+            return None
+        return {k: v for k, v in self.filters.model_dump().items() if v not in (None, [])} or None
+
 
 @router.post("/query")
 async def query_endpoint(body: QueryRequest):
     if not body.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
-    result = query_rag(body.message)
-    return result
\ No newline at end of file
+    result = await aquery_rag(body.message, body.filter_dict())
+    return result
+
+
+@router.post("/query/stream")
+async def query_stream_endpoint(body: QueryRequest):
+    if not body.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    async def events():
+        # Closing the generator on disconnect also closes the Groq stream
+        async with aclosing(astream_query_rag(body.message, body.filter_dict())) as stream:
+            async for event, data in stream:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
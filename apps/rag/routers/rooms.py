@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from rag.rooms import invalidate_rooms
+
+router = APIRouter()
+
+
+@router.post("/rooms/invalidate")
+async def invalidate_rooms_endpoint():
+    # Called by the web app (and the seed script) after rooms change
+    version = await run_in_threadpool(invalidate_rooms)
+    return {"status": "ok", "version": version}
+
@@ -0,0 +1,54 @@
+"""Booking router decisions on the labelled corpus in bench/data/booking_intents.jsonl.
+
+Run from apps/rag: python -m pytest tests
+"""
+import json
+from datetime import date, datetime, time
+from pathlib import Path
+
+import pytest
+
+from bench.bench_intent_router import SEED_ROOMS, same
+from rag.intent import REQUIRED_SLOTS, direct_booking, extract_booking, is_booking_intent, missing_slots
+from rag.rooms import RoomCatalogue
+
+CORPUS = Path(__file__).resolve().parent.parent / "bench" / "data" / "booking_intents.jsonl"
+TODAY = date(2026, 10, 18)  # The date the corpus labels were written against
+NOW = datetime.combine(TODAY, time.min)
+
+CASES = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+@pytest.fixture(scope="module")
+def catalogue():
+    return RoomCatalogue(SEED_ROOMS, version=1)
+
+
+@pytest.mark.parametrize("case", CASES, ids=[c["message"][:50] for c in CASES])
+def test_booking_intent(case):
+    assert is_booking_intent(case["message"]) == case["booking"]
+
+
+BOOKINGS = [c for c in CASES if c["booking"]]
+
+
+@pytest.mark.parametrize("case", BOOKINGS, ids=[c["message"][:50] for c in BOOKINGS])
+def test_extracted_slots(case, catalogue):
+    # The reason is only used when the LLM is skipped; messages it handles
+    # (alternatives, several bookings) may leave joining words in it
+    got = extract_booking(case["message"], catalogue, TODAY)
+    for slot in REQUIRED_SLOTS:
+        if slot != "reason":
+            assert same(case["slots"][slot], got[slot]), slot
+
+
+@pytest.mark.parametrize("case", BOOKINGS, ids=[c["message"][:50] for c in BOOKINGS])
+def test_direct_booking(case, catalogue):
+    # Skips the LLM only for a complete, plain request; "direct": false marks
+    # complete messages that must still go to the LLM
+    should_skip = case.get("direct", not missing_slots(case["slots"]))
+    routed = direct_booking(case["message"], catalogue, NOW)
+    assert (routed is not None) == should_skip
+    if routed is not None:
+        for slot in REQUIRED_SLOTS:
+            assert same(case["slots"][slot], routed[slot]), slot
@@ -86,10 +86,14 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: "Ingestion failed", detail: errorMessage }, { status: 500 });
     }
 
-    await prisma.document.update({
-      where: { id: document.id },
-      data: { ingestionStatus: "DONE", ingestedAt: new Date() },
-    });
+    // 202 = queued as a background job; the RAG worker moves the document
+    // through PROCESSING to DONE/FAILED itself
+    if (ragResponse.status !== 202) {
+      await prisma.document.update({
+        where: { id: document.id },
+        data: { ingestionStatus: "DONE", ingestedAt: new Date() },
+      });
+    }
 
     logger.logApi("response", "/api/admin/upload", {
       documentId: document.id,
@@ -0,0 +1,8 @@
+-- Content hash per chunk so re-ingest only embeds and writes what changed.
+-- Rows ingested before this migration have a NULL hash and are replaced on
+-- their next re-ingest.
+
+ALTER TABLE rag.embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_rag_embeddings_document
+  ON rag.embeddings (document_id);
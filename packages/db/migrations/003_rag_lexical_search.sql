@@ -0,0 +1,14 @@
+-- Full-text column for hybrid (lexical + vector) retrieval. The 'simple'
+-- config keeps tokens like course codes ("cs", "f213") and room names
+-- ("a604") intact instead of stemming them. Maintained by the RAG service
+-- on every chunk insert.
+
+ALTER TABLE rag.embeddings ADD COLUMN IF NOT EXISTS chunk_tsv tsvector;
+
+UPDATE rag.embeddings
+SET chunk_tsv = to_tsvector('simple', chunk_text)
+WHERE chunk_tsv IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_rag_embeddings_tsv
+  ON rag.embeddings
+  USING gin (chunk_tsv);
@@ -0,0 +1,32 @@
+-- Document metadata for filtered / document-scoped search. Document-level
+-- fields live in rag.documents (one row per document, so a Drive re-sync
+-- updates one row instead of every chunk); page_number is per chunk.
+
+CREATE TABLE IF NOT EXISTS rag.documents (
+  document_id       TEXT PRIMARY KEY,
+  source_filename   TEXT,
+  mime_type         TEXT,
+  drive_modified_at TIMESTAMPTZ,
+  tags              TEXT[] NOT NULL DEFAULT '{}',
+  updated_at        TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_rag_documents_mime_type ON rag.documents (mime_type);
+CREATE INDEX IF NOT EXISTS idx_rag_documents_filename ON rag.documents (source_filename);
+CREATE INDEX IF NOT EXISTS idx_rag_documents_modified ON rag.documents (drive_modified_at);
+CREATE INDEX IF NOT EXISTS idx_rag_documents_tags ON rag.documents USING gin (tags);
+
+ALTER TABLE rag.embeddings ADD COLUMN IF NOT EXISTS page_number INT;
+
+CREATE INDEX IF NOT EXISTS idx_rag_embeddings_document_page
+  ON rag.embeddings (document_id, page_number);
+
+INSERT INTO rag.documents (document_id)
+SELECT DISTINCT document_id FROM rag.embeddings
+ON CONFLICT (document_id) DO NOTHING;
+
+-- Drive files: filename and last sync come from the sync log
+UPDATE rag.documents d
+SET source_filename = l.filename
+FROM rag.drive_sync_log l
+WHERE l.drive_file_id = d.document_id AND d.source_filename IS NULL;
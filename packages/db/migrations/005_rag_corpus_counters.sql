@@ -0,0 +1,119 @@
+-- Corpus counters maintained by statement-level triggers on rag.embeddings,
+-- so /rag/ingest/status and /metrics read one row instead of running
+-- COUNT(*) / COUNT(DISTINCT document_id) over every chunk.
+--
+-- rag.document_chunk_counts has one row per document with chunks (the row
+-- is removed when its count reaches zero); rag.corpus_stats is a single row
+-- of totals. Writers serialise briefly on that row until they commit.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS rag.document_chunk_counts (
+  document_id TEXT PRIMARY KEY,
+  chunks      BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS rag.corpus_stats (
+  id              BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  total_chunks    BIGINT NOT NULL DEFAULT 0,
+  total_documents BIGINT NOT NULL DEFAULT 0,
+  updated_at      TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION rag.count_inserted_chunks() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+  added_chunks BIGINT;
+  added_documents BIGINT;
+BEGIN
+  SELECT count(*) INTO added_chunks FROM inserted_rows;
+  IF added_chunks = 0 THEN
+    RETURN NULL;
+  END IF;
+
+  -- xmax = 0 marks rows the upsert inserted (a document's first chunks)
+  WITH upserted AS (
+    INSERT INTO rag.document_chunk_counts AS c (document_id, chunks)
+    SELECT document_id, count(*) FROM inserted_rows GROUP BY document_id
+    ON CONFLICT (document_id) DO UPDATE SET chunks = c.chunks + EXCLUDED.chunks
+    RETURNING (xmax = 0) AS is_new
+  )
+  SELECT count(*) FILTER (WHERE is_new) INTO added_documents FROM upserted;
+
+  UPDATE rag.corpus_stats
+  SET total_chunks = total_chunks + added_chunks,
+      total_documents = total_documents + added_documents,
+      updated_at = now();
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION rag.count_deleted_chunks() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+  removed_chunks BIGINT;
+  removed_documents BIGINT;
+BEGIN
+  SELECT count(*) INTO removed_chunks FROM deleted_rows;
+  IF removed_chunks = 0 THEN
+    RETURN NULL;
+  END IF;
+
+  UPDATE rag.document_chunk_counts c
+  SET chunks = c.chunks - d.n
+  FROM (SELECT document_id, count(*) AS n FROM deleted_rows GROUP BY document_id) d
+  WHERE c.document_id = d.document_id;
+
+  DELETE FROM rag.document_chunk_counts
+  WHERE chunks <= 0 AND document_id IN (SELECT DISTINCT document_id FROM deleted_rows);
+  GET DIAGNOSTICS removed_documents = ROW_COUNT;
+
+  UPDATE rag.corpus_stats
+  SET total_chunks = total_chunks - removed_chunks,
+      total_documents = total_documents - removed_documents,
+      updated_at = now();
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION rag.reset_chunk_counts() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  DELETE FROM rag.document_chunk_counts;
+  UPDATE rag.corpus_stats SET total_chunks = 0, total_documents = 0, updated_at = now();
+  RETURN NULL;
+END;
+$$;
+
+-- Backfill under a lock so no write slips between the counts and the triggers
+LOCK TABLE rag.embeddings IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_embeddings_count_insert ON rag.embeddings;
+DROP TRIGGER IF EXISTS trg_embeddings_count_delete ON rag.embeddings;
+DROP TRIGGER IF EXISTS trg_embeddings_count_truncate ON rag.embeddings;
+
+CREATE TRIGGER trg_embeddings_count_insert
+  AFTER INSERT ON rag.embeddings
+  REFERENCING NEW TABLE AS inserted_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.count_inserted_chunks();
+
+CREATE TRIGGER trg_embeddings_count_delete
+  AFTER DELETE ON rag.embeddings
+  REFERENCING OLD TABLE AS deleted_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.count_deleted_chunks();
+
+CREATE TRIGGER trg_embeddings_count_truncate
+  AFTER TRUNCATE ON rag.embeddings
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.reset_chunk_counts();
+
+DELETE FROM rag.document_chunk_counts;
+INSERT INTO rag.document_chunk_counts (document_id, chunks)
+SELECT document_id, count(*) FROM rag.embeddings GROUP BY document_id;
+
+INSERT INTO rag.corpus_stats (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+UPDATE rag.corpus_stats
+SET total_chunks = (SELECT coalesce(sum(chunks), 0) FROM rag.document_chunk_counts),
+    total_documents = (SELECT count(*) FROM rag.document_chunk_counts),
+    updated_at = now();
+
+COMMIT;
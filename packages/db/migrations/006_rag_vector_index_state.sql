@@ -0,0 +1,21 @@
+-- State of the managed vector index (apps/rag/rag/vector_index.py).
+--
+-- 001 built idx_rag_embeddings_vector as ivfflat (lists = 100) on an empty
+-- table, so its centroids describe no data. The index manager rebuilds it
+-- (HNSW or ivfflat, sized from the row count) with CREATE INDEX
+-- CONCURRENTLY and records the build here, together with the recall curve
+-- measured by `python -m rag.vector_index calibrate`, which picks
+-- hnsw.ef_search / ivfflat.probes per query.
+
+CREATE TABLE IF NOT EXISTS rag.vector_index_state (
+  id             BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  index_type     TEXT NOT NULL,            -- hnsw | ivfflat
+  params         JSONB NOT NULL,           -- {"m": 16, "ef_construction": 64} or {"lists": 120}
+  rows_at_build  BIGINT,                   -- NULL when the index was not built by the manager
+  build_seconds  DOUBLE PRECISION,
+  size_bytes     BIGINT,
+  built_at       TIMESTAMPTZ,
+  curve          JSONB,                    -- [[ef_search | probes, recall@k, p50 ms], ...]
+  curve_k        INT,
+  calibrated_at  TIMESTAMPTZ
+);
@@ -0,0 +1,55 @@
+-- Corpus generation for the answer cache (apps/rag/rag/answer_cache.py).
+--
+-- Each API process keeps its own answer cache, so dropping entries when a
+-- document is re-ingested only reached the process that ran the ingest.
+-- rag.corpus_stats.generation is bumped by every statement that changes
+-- rows of rag.embeddings; each process reads it on lookup and drops its
+-- cached answers once it has moved. Needs migration 005 (rag.corpus_stats).
+
+BEGIN;
+
+ALTER TABLE rag.corpus_stats ADD COLUMN IF NOT EXISTS generation BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION rag.bump_corpus_generation() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- Statement triggers also fire when nothing matched (e.g. the delete of a
+  -- document's old chunks on its first ingest); those change no answers
+  IF TG_OP <> 'TRUNCATE' THEN
+    IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+      RETURN NULL;
+    END IF;
+  END IF;
+
+  UPDATE rag.corpus_stats SET generation = generation + 1, updated_at = now();
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_embeddings_generation_insert ON rag.embeddings;
+DROP TRIGGER IF EXISTS trg_embeddings_generation_update ON rag.embeddings;
+DROP TRIGGER IF EXISTS trg_embeddings_generation_delete ON rag.embeddings;
+DROP TRIGGER IF EXISTS trg_embeddings_generation_truncate ON rag.embeddings;
+
+CREATE TRIGGER trg_embeddings_generation_insert
+  AFTER INSERT ON rag.embeddings
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.bump_corpus_generation();
+
+CREATE TRIGGER trg_embeddings_generation_update
+  AFTER UPDATE ON rag.embeddings
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.bump_corpus_generation();
+
+CREATE TRIGGER trg_embeddings_generation_delete
+  AFTER DELETE ON rag.embeddings
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.bump_corpus_generation();
+
+CREATE TRIGGER trg_embeddings_generation_truncate
+  AFTER TRUNCATE ON rag.embeddings
+  FOR EACH STATEMENT EXECUTE FUNCTION rag.bump_corpus_generation();
+
+INSERT INTO rag.corpus_stats (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+COMMIT;
@@ -72,6 +72,17 @@ async function main() {
 
   await prisma.room.createMany({ data: rooms });
 
+  // The RAG service caches the room list — tell it to reload (skipped if it is not running).
+  const ragUrl = process.env.RAG_SERVICE_URL ?? "http://localhost:8000";
+  try {
+    await fetch(`${ragUrl}/rag/rooms/invalidate`, {
+      method: "POST",
+      headers: { "x-internal-secret": process.env.INTERNAL_SECRET ?? "" },
+    });
+  } catch {
+    console.log("RAG service not reachable; its room cache refreshes on its own TTL.");
+  }
+
   console.log("Seed done: 3 test users, 5 rooms.");
 }
 